@@ -0,0 +1,207 @@
+"""
+HTTP/1.1 mínimo sobre los streams de asyncio: lo justo para el servicio de
+``api.servidor`` (peticiones con ``Content-Length``, conexiones persistentes
+y cuerpos leídos por partes), sin dependencias externas.
+"""
+import json
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+MOTIVOS = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+}
+
+# Tamaño de cada parte al leer o enviar cuerpos grandes
+TAMANO_TROZO = 64 * 1024
+
+
+class ErrorHTTP(Exception):
+    """
+    Error que se informa al cliente con un código de estado y un mensaje.
+    """
+
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+class Peticion:
+    """
+    Petición HTTP recibida. El cuerpo no se lee al recibirla: se pide con
+    ``leer_json`` o se recorre por partes con ``trozos``.
+    """
+
+    def __init__(self, lector, metodo: str, destino: str, version: str, encabezados: dict):
+        """
+        Args:
+            lector (asyncio.StreamReader): Conexión de la que leer el cuerpo.
+            metodo (str): Método HTTP, en mayúsculas.
+            destino (str): Ruta con la consulta (ej. "/pacientes?limite=10").
+            version (str): Versión HTTP ("HTTP/1.1").
+            encabezados (dict): Encabezados con el nombre en minúsculas.
+        """
+        partes = urlsplit(destino)
+        self.lector = lector
+        self.metodo = metodo
+        self.ruta = unquote(partes.path)
+        self.consulta = dict(parse_qsl(partes.query))
+        self.version = version
+        self.encabezados = encabezados
+        try:
+            self.largo = int(encabezados.get("content-length", 0))
+        except ValueError:
+            raise ErrorHTTP(400, "Content-Length inválido.")
+        if self.largo < 0:
+            raise ErrorHTTP(400, "Content-Length inválido.")
+        self.restante = self.largo
+
+    @property
+    def mantener_conexion(self) -> bool:
+        """
+        Indica si la conexión sigue abierta después de responder.
+
+        Returns:
+            bool: True salvo que el cliente pida cerrarla (o use HTTP/1.0).
+        """
+        conexion = self.encabezados.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return conexion == "keep-alive"
+        return conexion != "close"
+
+    async def trozos(self, tamano: int = TAMANO_TROZO):
+        """
+        Recorre el cuerpo por partes, sin tenerlo entero en memoria.
+
+        Args:
+            tamano (int): Bytes máximos de cada parte.
+
+        Yields:
+            bytes: Partes del cuerpo, en orden.
+        """
+        while self.restante > 0:
+            trozo = await self.lector.read(min(tamano, self.restante))
+            if not trozo:
+                raise ConnectionResetError("El cliente cerró la conexión a mitad del cuerpo.")
+            self.restante -= len(trozo)
+            yield trozo
+
+    async def leer_json(self, maximo: int = 1024 * 1024):
+        """
+        Lee el cuerpo completo y lo interpreta como JSON.
+
+        Args:
+            maximo (int): Tamaño máximo aceptado, en bytes.
+
+        Returns:
+            object: Cuerpo decodificado.
+        """
+        if self.largo > maximo:
+            raise ErrorHTTP(413, "El cuerpo es demasiado grande.")
+        cuerpo = b"".join([trozo async for trozo in self.trozos()])
+        try:
+            return json.loads(cuerpo or b"{}")
+        except ValueError:
+            raise ErrorHTTP(400, "El cuerpo no es JSON válido.")
+
+    async def descartar_cuerpo(self, maximo: int = 1024 * 1024) -> bool:
+        """
+        Lee y descarta lo que quede del cuerpo, para poder atender la
+        siguiente petición de la misma conexión.
+
+        Args:
+            maximo (int): Bytes que vale la pena descartar; si queda más,
+                conviene cerrar la conexión.
+
+        Returns:
+            bool: True si la conexión quedó lista para otra petición.
+        """
+        if self.restante > maximo:
+            return False
+        async for _ in self.trozos():
+            pass
+        return True
+
+
+async def leer_peticion(lector, maximo_encabezados: int = 100):
+    """
+    Lee la línea de petición y los encabezados de la próxima petición.
+
+    Args:
+        lector (asyncio.StreamReader): Conexión del cliente.
+        maximo_encabezados (int): Cantidad máxima de encabezados.
+
+    Returns:
+        Peticion or None: La petición, o None si el cliente cerró la conexión.
+    """
+    linea = await lector.readline()
+    if not linea:
+        return None
+    try:
+        metodo, destino, version = linea.decode("latin-1").split()
+    except ValueError:
+        raise ErrorHTTP(400, "Línea de petición inválida.")
+
+    encabezados = {}
+    while True:
+        linea = await lector.readline()
+        if linea in (b"\r\n", b"\n", b""):
+            break
+        if len(encabezados) >= maximo_encabezados:
+            raise ErrorHTTP(400, "Demasiados encabezados.")
+        nombre, separador, valor = linea.decode("latin-1").partition(":")
+        if not separador:
+            raise ErrorHTTP(400, "Encabezado inválido.")
+        encabezados[nombre.strip().lower()] = valor.strip()
+    if "chunked" in encabezados.get("transfer-encoding", "").lower():
+        raise ErrorHTTP(411, "Se requiere Content-Length.")
+    return Peticion(lector, metodo.upper(), destino, version, encabezados)
+
+
+def encabezado_respuesta(estado: int, largo: int, tipo: str = "application/json",
+                         mantener: bool = True) -> bytes:
+    """
+    Arma la línea de estado y los encabezados de una respuesta.
+
+    Args:
+        estado (int): Código de estado.
+        largo (int): Largo del cuerpo, en bytes.
+        tipo (str): Content-Type del cuerpo.
+        mantener (bool): Si es False se anuncia el cierre de la conexión.
+
+    Returns:
+        bytes: Encabezado listo para enviar.
+    """
+    lineas = [
+        f"HTTP/1.1 {estado} {MOTIVOS.get(estado, '')}",
+        f"Content-Length: {largo}",
+        f"Connection: {'keep-alive' if mantener else 'close'}",
+    ]
+    if largo:
+        lineas.append(f"Content-Type: {tipo}")
+    return ("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1")
+
+
+async def responder_json(escritor, estado: int, datos=None, mantener: bool = True):
+    """
+    Envía una respuesta con cuerpo JSON (o vacía si ``datos`` es None).
+
+    Args:
+        escritor (asyncio.StreamWriter): Conexión del cliente.
+        estado (int): Código de estado.
+        datos (object, opcional): Cuerpo a serializar.
+        mantener (bool): Si es False se anuncia el cierre de la conexión.
+    """
+    cuerpo = b"" if datos is None else json.dumps(datos, ensure_ascii=False).encode("utf-8")
+    escritor.write(encabezado_respuesta(estado, len(cuerpo), "application/json; charset=utf-8",
+                                        mantener) + cuerpo)
+    await escritor.drain()
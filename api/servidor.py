@@ -0,0 +1,565 @@
+"""
+Servicio HTTP/JSON sobre asyncio para pacientes, diagnósticos e imágenes,
+sin dependencias externas.
+
+Rutas:
+    GET    /pacientes                 ?id_desde ?id_hasta ?genero ?limite ?cursor
+    POST   /pacientes                 {"nombre", "edad", "genero"}
+    GET    /pacientes/{id}
+    PATCH  /pacientes/{id}            {"nombre", "edad", "genero"} (parcial)
+    DELETE /pacientes/{id}            (con sus diagnósticos e imágenes)
+    GET    /diagnosticos              ?id_paciente ?tipo ?fecha_desde ?fecha_hasta ...
+    POST   /diagnosticos              {"id_paciente", "fecha", "dioptria_1", ...}
+    GET    /diagnosticos/{id}
+    DELETE /diagnosticos/{id}         (con sus imágenes)
+    GET    /imagenes                  ?id_diagnostico ?tipo_ojo ?fecha_desde ...
+    POST   /imagenes                  ?id_diagnostico ?tipo_ojo ?descripcion
+                                      ?fecha_captura, cuerpo: el JPEG
+    GET    /imagenes/{id}
+    DELETE /imagenes/{id}
+    GET    /imagenes/{id}/archivo
+    GET    /imagenes/{id}/vista_previa ?tamano
+
+Los listados devuelven como mucho ``limite`` registros (100 por defecto) y
+el campo "siguiente", que se pasa como ``cursor`` para pedir la página
+siguiente. Mientras corre, el servidor barre de a poco los datos huérfanos
+(ver ``gestor.integridad.BarredorHuerfanos``).
+
+Uso:
+    python -m api.servidor [--host 127.0.0.1] [--puerto 8080] [--modo json]
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from api.http import TAMANO_TROZO, ErrorHTTP, encabezado_respuesta, leer_peticion, responder_json
+from gestor.integridad import BarredorHuerfanos
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+RECURSOS = {
+    # recurso: (gestor del menú, método de consulta, filtros, baja)
+    "pacientes": ("gestor_pacientes", "consultar_pacientes",
+                  ("id_desde", "id_hasta", "genero"), "integridad.eliminar_paciente"),
+    "diagnosticos": ("gestor_diagnosticos", "consultar_diagnosticos",
+                     ("id_paciente", "tipo", "fecha_desde", "fecha_hasta", "id_desde", "id_hasta"),
+                     "integridad.eliminar_diagnostico"),
+    "imagenes": ("gestor_imagenes", "consultar_imagenes",
+                 ("id_diagnostico", "tipo_ojo", "fecha_desde", "fecha_hasta", "id_desde", "id_hasta"),
+                 "gestor_imagenes.eliminar_imagen"),
+}
+
+CAMPOS_SUBIDA = ("id_diagnostico", "tipo_ojo", "descripcion", "fecha_captura")
+
+
+class RespuestaArchivo:
+    """
+    Respuesta cuyo cuerpo es un archivo, que se envía por partes.
+    """
+
+    def __init__(self, ruta: str, tipo: str = "image/jpeg"):
+        """
+        Args:
+            ruta (str): Archivo a enviar.
+            tipo (str): Content-Type de la respuesta.
+        """
+        self.ruta = ruta
+        self.tipo = tipo
+
+
+class ServidorPapilas:
+    """
+    Servicio HTTP sobre las tablas de un ``MenuSistema``.
+
+    Las tablas viven en diccionarios que no admiten acceso concurrente, así
+    que toda lectura y escritura de los gestores corre en un único hilo de
+    datos; el bucle de eventos solo atiende conexiones. Las altas y bajas
+    pasan además por una cola que vacía una sola tarea escritora: las altas
+    consecutivas del mismo recurso se agrupan en una llamada a
+    ``registrar_*_batch``, con una única escritura de la tabla. La lectura y
+    escritura de archivos (subidas, descargas, vistas previas) usa otro pool
+    de hilos, para no frenar ni al bucle ni al hilo de datos.
+    """
+
+    def __init__(self, sistema, trabajadores: int = 4, max_imagen: int = 50 * 1024 * 1024,
+                 lote_maximo: int = 256, barrido: float = 60.0):
+        """
+        Inicializa el servidor sin empezar a escuchar.
+
+        Args:
+            sistema (MenuSistema): Sistema con los gestores a exponer.
+            trabajadores (int): Hilos para la E/S de archivos y para copiar
+                las imágenes subidas.
+            max_imagen (int): Tamaño máximo de una imagen subida, en bytes.
+            lote_maximo (int): Escrituras encoladas que se atienden juntas.
+            barrido (float): Segundos entre pasos del barrido de huérfanos;
+                0 lo desactiva.
+        """
+        self.sistema = sistema
+        self.trabajadores = trabajadores
+        self.max_imagen = max_imagen
+        self.lote_maximo = lote_maximo
+        self.barrido = barrido
+        self._barredor = None
+        self._tarea_barrido = None
+        self._datos = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-datos")
+        self._es = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="api-es")
+        self._subidas = tempfile.mkdtemp(prefix="papilas_subidas_")
+        self._cola = None
+        self._tarea_escritora = None
+        self._servidor = None
+        self._altas = {
+            "pacientes": lambda filas: sistema.gestor_pacientes.registrar_pacientes_batch(filas),
+            "diagnosticos": lambda filas: sistema.gestor_diagnosticos.registrar_diagnosticos_batch(filas),
+            "imagenes": lambda filas: sistema.gestor_imagenes.registrar_imagenes_batch(
+                filas, self.trabajadores),
+        }
+
+    # ----- ciclo de vida -----
+
+    async def iniciar(self, host: str = "127.0.0.1", puerto: int = 8080):
+        """
+        Empieza a escuchar conexiones y arranca la tarea escritora.
+
+        Args:
+            host (str): Dirección donde escuchar.
+            puerto (int): Puerto; 0 elige uno libre.
+
+        Returns:
+            int: Puerto en el que quedó escuchando.
+        """
+        self._cola = asyncio.Queue()
+        self._tarea_escritora = asyncio.create_task(self._escritor())
+        if self.barrido:
+            self._tarea_barrido = asyncio.create_task(self._barrer())
+        self._servidor = await asyncio.start_server(self._atender, host, puerto)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def detener(self):
+        """
+        Deja de aceptar conexiones, termina las escrituras encoladas y
+        cierra el sistema.
+        """
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        if self._tarea_barrido is not None:
+            self._tarea_barrido.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._tarea_barrido
+        if self._tarea_escritora is not None:
+            await self._cola.put(None)
+            await self._tarea_escritora
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._datos, self.sistema.cerrar)
+        self._datos.shutdown()
+        self._es.shutdown()
+        shutil.rmtree(self._subidas, ignore_errors=True)
+
+    # ----- escrituras -----
+
+    async def _encolar(self, clase, carga):
+        """
+        Encola una escritura y espera su resultado.
+
+        Args:
+            clase (str or None): Recurso, si es un alta que puede agruparse
+                con otras; None para cualquier otra escritura.
+            carga (dict or callable): Fila del alta, o la función a ejecutar.
+
+        Returns:
+            object: Entrada del reporte del alta, o lo que devuelva la función.
+        """
+        futuro = asyncio.get_running_loop().create_future()
+        await self._cola.put((clase, carga, futuro))
+        return await futuro
+
+    async def _escritor(self):
+        """
+        Tarea escritora: atiende la cola de a tandas, en el hilo de datos.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            trabajos = [await self._cola.get()]
+            while len(trabajos) < self.lote_maximo and not self._cola.empty():
+                trabajos.append(self._cola.get_nowait())
+            pendientes = [trabajo for trabajo in trabajos if trabajo is not None]
+            if pendientes:
+                resultados = await loop.run_in_executor(
+                    self._datos, self._ejecutar_tanda, [(clase, carga) for clase, carga, _ in pendientes]
+                )
+                for (_, _, futuro), (resultado, error) in zip(pendientes, resultados):
+                    if futuro.cancelled():
+                        continue
+                    if error is not None:
+                        futuro.set_exception(error)
+                    else:
+                        futuro.set_result(resultado)
+            if None in trabajos:
+                return
+
+    def _ejecutar_tanda(self, trabajos: list) -> list:
+        """
+        Ejecuta una tanda de escrituras en orden. Se ejecuta en el hilo de
+        datos.
+
+        Args:
+            trabajos (list): Pares (clase, carga) de ``_encolar``.
+
+        Returns:
+            list: Un par (resultado, excepción) por trabajo.
+        """
+        resultados = []
+        for clase, grupo in itertools.groupby(trabajos, key=lambda trabajo: trabajo[0]):
+            cargas = [carga for _, carga in grupo]
+            if clase is None:
+                for funcion in cargas:
+                    try:
+                        resultados.append((funcion(), None))
+                    except Exception as e:
+                        resultados.append((None, e))
+                continue
+            try:
+                reporte = self._altas[clase](cargas)
+                resultados.extend((entrada, None) for entrada in reporte)
+            except Exception as e:
+                resultados.extend((None, e) for _ in cargas)
+        return resultados
+
+    async def _barrer(self):
+        """
+        Da un paso del barrido de huérfanos cada ``barrido`` segundos. Pasa
+        por la cola de escrituras como cualquier otra baja.
+        """
+        while True:
+            await asyncio.sleep(self.barrido)
+            if self._barredor is None:
+                self._barredor = await self._en_datos(
+                    lambda: BarredorHuerfanos(self.sistema.integridad))
+            try:
+                await self._encolar(None, self._barredor.paso)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    async def _en_datos(self, funcion, *args):
+        """
+        Ejecuta una lectura en el hilo de datos.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._datos, funcion, *args)
+
+    async def _en_es(self, funcion, *args):
+        """
+        Ejecuta una operación de archivos en el pool de E/S.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._es, funcion, *args)
+
+    # ----- conexiones -----
+
+    async def _atender(self, lector, escritor):
+        """
+        Atiende las peticiones de una conexión, una tras otra.
+        """
+        try:
+            while True:
+                try:
+                    peticion = await leer_peticion(lector)
+                except ErrorHTTP as e:
+                    await responder_json(escritor, e.estado, {"error": e.mensaje}, mantener=False)
+                    return
+                if peticion is None:
+                    return
+                mantener = peticion.mantener_conexion
+                try:
+                    respuesta = await self._despachar(peticion)
+                except ErrorHTTP as e:
+                    respuesta = (e.estado, {"error": e.mensaje})
+                except ConnectionError:
+                    raise
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+                    respuesta = (500, {"error": "Error interno del servidor."})
+
+                if isinstance(respuesta, RespuestaArchivo):
+                    await self._enviar_archivo(escritor, respuesta, mantener)
+                else:
+                    await responder_json(escritor, respuesta[0], respuesta[1], mantener)
+                if not mantener or not await peticion.descartar_cuerpo():
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _enviar_archivo(self, escritor, respuesta: RespuestaArchivo, mantener: bool):
+        """
+        Envía un archivo por partes, leyéndolo en el pool de E/S.
+        """
+        try:
+            archivo = await self._en_es(open, respuesta.ruta, "rb")
+        except OSError:
+            await responder_json(escritor, 404, {"error": "Archivo no encontrado."}, mantener)
+            return
+        try:
+            largo = os.fstat(archivo.fileno()).st_size
+            escritor.write(encabezado_respuesta(200, largo, respuesta.tipo, mantener))
+            enviados = 0
+            while enviados < largo:
+                trozo = await self._en_es(archivo.read, min(TAMANO_TROZO, largo - enviados))
+                if not trozo:
+                    # El archivo se achicó: ya no se puede cumplir el largo
+                    # anunciado, así que se corta la conexión
+                    raise ConnectionResetError("El archivo cambió durante el envío.")
+                escritor.write(trozo)
+                enviados += len(trozo)
+                await escritor.drain()
+            await escritor.drain()
+        finally:
+            archivo.close()
+
+    async def _despachar(self, peticion):
+        """
+        Elige el manejador según la ruta y el método.
+
+        Returns:
+            tuple or RespuestaArchivo: (estado, cuerpo JSON) o un archivo.
+        """
+        partes = peticion.ruta.strip("/").split("/")
+        recurso = partes[0]
+        if recurso not in RECURSOS or len(partes) > 3:
+            raise ErrorHTTP(404, "Ruta no encontrada.")
+
+        if len(partes) == 1:
+            manejadores = {"GET": self._listar, "POST": self._crear}
+        elif len(partes) == 2:
+            manejadores = {"GET": self._obtener, "DELETE": self._eliminar}
+            if recurso == "pacientes":
+                manejadores["PATCH"] = self._modificar_paciente
+        elif recurso == "imagenes" and partes[2] == "archivo":
+            manejadores = {"GET": self._descargar_imagen}
+        elif recurso == "imagenes" and partes[2] == "vista_previa":
+            manejadores = {"GET": self._vista_previa}
+        else:
+            raise ErrorHTTP(404, "Ruta no encontrada.")
+
+        manejador = manejadores.get(peticion.metodo)
+        if manejador is None:
+            raise ErrorHTTP(405, f"Método no permitido. Se admite: {', '.join(manejadores)}.")
+        return await manejador(peticion, *partes)
+
+    # ----- manejadores -----
+
+    def _gestor(self, recurso: str):
+        return getattr(self.sistema, RECURSOS[recurso][0])
+
+    async def _listar(self, peticion, recurso):
+        _, consultar, filtros, _ = RECURSOS[recurso]
+        consulta = dict(peticion.consulta)
+        cursor = consulta.pop("cursor", None)
+        try:
+            limite = int(consulta.pop("limite", LIMITE_POR_DEFECTO))
+        except ValueError:
+            raise ErrorHTTP(400, "El límite debe ser un número entero.")
+        if not 1 <= limite <= LIMITE_MAXIMO:
+            raise ErrorHTTP(400, f"El límite debe estar entre 1 y {LIMITE_MAXIMO}.")
+        desconocidos = set(consulta) - set(filtros)
+        if desconocidos:
+            raise ErrorHTTP(400, f"Filtros desconocidos: {', '.join(sorted(desconocidos))}.")
+        for nombre, valor in (("cursor", cursor), ("id_desde", consulta.get("id_desde")),
+                              ("id_hasta", consulta.get("id_hasta"))):
+            if valor not in (None, "") and not valor.isdecimal():
+                raise ErrorHTTP(400, f"El parámetro {nombre} debe ser un ID numérico.")
+
+        def leer():
+            metodo = getattr(self._gestor(recurso), consultar)
+            return [registro.to_dict() for registro in metodo(limite=limite, cursor=cursor, **consulta)]
+
+        registros = await self._en_datos(leer)
+        siguiente = registros[-1]["id"] if len(registros) == limite else None
+        return 200, {recurso: registros, "siguiente": siguiente}
+
+    async def _obtener(self, peticion, recurso, id_registro):
+        def leer():
+            registro = self._gestor(recurso).db.get(id_registro)
+            return registro.to_dict() if registro is not None else None
+
+        datos = await self._en_datos(leer)
+        if datos is None:
+            raise ErrorHTTP(404, "Registro no encontrado.")
+        return 200, datos
+
+    async def _crear(self, peticion, recurso):
+        if recurso == "imagenes":
+            entrada = await self._subir_imagen(peticion)
+        else:
+            fila = await peticion.leer_json()
+            if not isinstance(fila, dict):
+                raise ErrorHTTP(400, "El cuerpo debe ser un objeto JSON.")
+            entrada = await self._encolar(recurso, fila)
+        if entrada["estado"] == "error":
+            raise ErrorHTTP(400, entrada["error"])
+        return 201, {"id": entrada["id"]}
+
+    async def _subir_imagen(self, peticion) -> dict:
+        """
+        Recibe un JPEG por partes en un archivo temporal y lo registra.
+
+        Returns:
+            dict: Entrada del reporte de ``registrar_imagenes_batch``.
+        """
+        if "content-length" not in peticion.encabezados:
+            raise ErrorHTTP(411, "Se requiere Content-Length.")
+        if peticion.largo == 0:
+            raise ErrorHTTP(400, "Falta la imagen en el cuerpo.")
+        if peticion.largo > self.max_imagen:
+            raise ErrorHTTP(413, f"La imagen supera los {self.max_imagen} bytes.")
+        tipo = peticion.encabezados.get("content-type", "image/jpeg").split(";")[0].strip()
+        if tipo not in ("image/jpeg", "application/octet-stream"):
+            raise ErrorHTTP(415, "La imagen debe enviarse como image/jpeg.")
+        desconocidos = set(peticion.consulta) - set(CAMPOS_SUBIDA)
+        if desconocidos:
+            raise ErrorHTTP(400, f"Campos desconocidos: {', '.join(sorted(desconocidos))}.")
+
+        descriptor, ruta = tempfile.mkstemp(suffix=".jpg", dir=self._subidas)
+        archivo = os.fdopen(descriptor, "wb")
+        try:
+            async for trozo in peticion.trozos():
+                await self._en_es(archivo.write, trozo)
+            await self._en_es(archivo.close)
+            return await self._encolar("imagenes", dict(peticion.consulta, ruta_origen=ruta))
+        finally:
+            archivo.close()
+            with contextlib.suppress(OSError):
+                os.remove(ruta)
+
+    async def _modificar_paciente(self, peticion, recurso, id_paciente):
+        cambios = await peticion.leer_json()
+        if not isinstance(cambios, dict) or set(cambios) - {"nombre", "edad", "genero"}:
+            raise ErrorHTTP(400, "Solo se pueden modificar nombre, edad y genero.")
+        edad = cambios.get("edad")
+        if edad is not None and (isinstance(edad, bool) or not isinstance(edad, int)):
+            raise ErrorHTTP(400, "La edad debe ser un número entero.")
+
+        def modificar():
+            gestor = self.sistema.gestor_pacientes
+            if id_paciente not in gestor.db:
+                return None
+            gestor.modificar_paciente(id_paciente, cambios.get("nombre"), edad, cambios.get("genero"))
+            return gestor.db[id_paciente].to_dict()
+
+        datos = await self._encolar(None, modificar)
+        if datos is None:
+            raise ErrorHTTP(404, "Registro no encontrado.")
+        return 200, datos
+
+    async def _eliminar(self, peticion, recurso, id_registro):
+        def eliminar():
+            gestor = self._gestor(recurso)
+            if id_registro not in gestor.db:
+                return False
+            atributo, metodo = RECURSOS[recurso][3].split(".")
+            getattr(getattr(self.sistema, atributo), metodo)(id_registro)
+            return True
+
+        if not await self._encolar(None, eliminar):
+            raise ErrorHTTP(404, "Registro no encontrado.")
+        return 204, None
+
+    async def _ruta_imagen(self, id_imagen: str) -> str:
+        def resolver():
+            gestor = self.sistema.gestor_imagenes
+            imagen = gestor.db.get(id_imagen)
+            return os.path.join(gestor.carpeta_imagenes, imagen.archivo) if imagen else None
+
+        ruta = await self._en_datos(resolver)
+        if ruta is None:
+            raise ErrorHTTP(404, "Imagen no encontrada.")
+        return ruta
+
+    async def _descargar_imagen(self, peticion, recurso, id_imagen, _):
+        return RespuestaArchivo(await self._ruta_imagen(id_imagen))
+
+    async def _vista_previa(self, peticion, recurso, id_imagen, _):
+        try:
+            tamano = int(peticion.consulta.get("tamano", 256))
+        except ValueError:
+            raise ErrorHTTP(400, "El tamaño debe ser un número entero.")
+        ruta = await self._ruta_imagen(id_imagen)
+        miniaturas = self.sistema.gestor_imagenes.miniaturas
+        if not miniaturas.disponible():
+            raise ErrorHTTP(501, "Las vistas previas requieren Pillow (pip install pillow).")
+        if tamano not in miniaturas.tamanos:
+            raise ErrorHTTP(400, f"Tamaños admitidos: {', '.join(map(str, miniaturas.tamanos))}.")
+        try:
+            return RespuestaArchivo(await self._en_es(miniaturas.obtener, ruta, tamano))
+        except OSError:
+            raise ErrorHTTP(404, "Archivo no encontrado.")
+
+
+async def servir(sistema, host: str, puerto: int, trabajadores: int = 4, barrido: float = 60.0):
+    """
+    Corre el servidor hasta recibir SIGINT o SIGTERM.
+
+    Args:
+        sistema (MenuSistema): Sistema con los gestores a exponer.
+        host (str): Dirección donde escuchar.
+        puerto (int): Puerto; 0 elige uno libre.
+        trabajadores (int): Hilos de E/S de archivos.
+        barrido (float): Segundos entre pasos del barrido de huérfanos.
+    """
+    servidor = ServidorPapilas(sistema, trabajadores, barrido=barrido)
+    puerto = await servidor.iniciar(host, puerto)
+    # Se informa por stderr para que se vea aunque la salida estándar esté
+    # silenciada; quien lance el servidor con el puerto 0 lo lee de aquí
+    print(f"✅ Servidor escuchando en http://{host}:{puerto}", file=sys.stderr, flush=True)
+
+    fin = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError, AttributeError):
+            loop.add_signal_handler(senal, fin.set)
+    try:
+        await fin.wait()
+    finally:
+        await servidor.detener()
+
+
+def main(argumentos=None):
+    """
+    Punto de entrada de ``python -m api.servidor``.
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON de papilas.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080, help="Puerto; 0 elige uno libre.")
+    parser.add_argument("--modo", default="json", help="Modo de almacenamiento: json, diario, binario o sqlite.")
+    parser.add_argument("--imagenes-por-contenido", action="store_true",
+                        help="Guarda las imágenes deduplicadas por su SHA-256.")
+    parser.add_argument("--sincronizar", action="store_true", help="Fuerza a disco cada escritura.")
+    parser.add_argument("--trabajadores", type=int, default=4, help="Hilos de E/S de archivos.")
+    parser.add_argument("--barrido", type=float, default=60.0,
+                        help="Segundos entre pasos del barrido de huérfanos; 0 lo desactiva.")
+    parser.add_argument("--silencioso", action="store_true",
+                        help="No muestra los mensajes de los gestores.")
+    args = parser.parse_args(argumentos)
+
+    from menu.menu import MenuSistema
+    sistema = MenuSistema(args.modo, args.imagenes_por_contenido, args.sincronizar)
+    with open(os.devnull, "w", encoding="utf-8") as nulo, \
+            contextlib.redirect_stdout(nulo if args.silencioso else sys.stdout):
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(servir(sistema, args.host, args.puerto, args.trabajadores, args.barrido))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Mide cuánto tarda ``MenuSistema`` en estar listo sobre una clínica
+sintética grande, comparando el arranque diferido con el arranque anterior
+(cargar e indexar las tres tablas y recorrer todas las claves para obtener
+el último ID).
+
+Cada escenario corre en un proceso nuevo, así ninguno aprovecha lo que
+cargó el anterior.
+
+Uso:
+    python -m benchmarks.arranque [--escala 1m] [--modo json] [--salida arranque.json]
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ESCENARIOS = (
+    # (nombre, descripción)
+    ("anterior", "crear los tres gestores cargando, indexando y recorriendo cada tabla"),
+    ("diferido_sin_manifiesto", "menú listo y último ID de pacientes, sin manifiestos"),
+    ("diferido", "menú listo y último ID de pacientes, con manifiestos vigentes"),
+    ("menu_listo", "solo crear MenuSistema"),
+    ("alta_de_un_paciente", "menú listo y un paciente registrado"),
+)
+
+
+def ejecutar_escenario(escenario: str, modo: str) -> dict:
+    """
+    Corre un escenario en el proceso actual (que debe estar en la carpeta
+    de la clínica) y mide su duración.
+
+    Args:
+        escenario (str): Nombre del escenario.
+        modo (str): Modo de almacenamiento.
+
+    Returns:
+        dict: Duración y pico de memoria.
+    """
+    if escenario == "diferido_sin_manifiesto":
+        for ruta in glob.glob(os.path.join("data", "*.manifiesto")):
+            os.remove(ruta)
+
+    inicio = time.perf_counter()
+    from menu.menu import MenuSistema
+    sistema = MenuSistema(modo)
+    if escenario == "anterior":
+        for gestor in (sistema.gestor_pacientes, sistema.gestor_diagnosticos, sistema.gestor_imagenes):
+            gestor.db  # lectura de la tabla e índices
+            max(int(clave) for clave in gestor.db.keys())
+    elif escenario in ("diferido", "diferido_sin_manifiesto"):
+        sistema.gestor_pacientes.ultimo_id
+    elif escenario == "alta_de_un_paciente":
+        with open(os.devnull, "w", encoding="utf-8") as nulo:
+            salida, sys.stdout = sys.stdout, nulo
+            try:
+                sistema.gestor_pacientes.registrar_paciente("Paciente Nuevo", 40, "F")
+            finally:
+                sys.stdout = salida
+    segundos = time.perf_counter() - inicio
+    sistema.cerrar()
+
+    from benchmarks.rendimiento import rss_pico_mb
+    return {"segundos": round(segundos, 4), "rss_pico_mb": rss_pico_mb()}
+
+
+def main(argumentos=None):
+    """
+    Genera la clínica, corre cada escenario en un proceso aparte e imprime
+    los resultados como JSON.
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del menú.")
+    parser.add_argument("--escala", default="1m", help="1k, 100k, 1m o un número (por defecto 1m).")
+    parser.add_argument("--modo", default="json", help="Modo de almacenamiento: json, diario, binario o sqlite.")
+    parser.add_argument("--salida", help="Archivo donde guardar el JSON de resultados.")
+    parser.add_argument("--escenario", help=argparse.SUPPRESS)
+    args = parser.parse_args(argumentos)
+
+    if args.escenario:
+        print(json.dumps(ejecutar_escenario(args.escenario, args.modo)))
+        return
+
+    from benchmarks.datos_sinteticos import interpretar_escala
+    cantidad = interpretar_escala(args.escala)
+    carpeta = tempfile.mkdtemp(prefix="papilas_arranque_")
+    informe = {"escala": cantidad, "modo": args.modo, "escenarios": {}}
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    try:
+        # La generación también va en otro proceso: el pico de memoria de
+        # Linux se hereda al crear procesos hijos y falsearía las mediciones
+        subprocess.run([sys.executable, "-m", "benchmarks.datos_sinteticos", carpeta,
+                        str(cantidad), "10"], env=entorno, capture_output=True, check=True)
+        if args.modo in ("sqlite", "binario"):
+            subprocess.run([sys.executable, "-m", "gestor.migracion", os.path.join(carpeta, "data"),
+                            "--formato", args.modo],
+                           env=entorno, capture_output=True, check=True)
+        for escenario, descripcion in ESCENARIOS:
+            proceso = subprocess.run(
+                [sys.executable, "-m", "benchmarks.arranque", "--escenario", escenario,
+                 "--modo", args.modo],
+                cwd=carpeta, env=entorno, capture_output=True, text=True, check=True
+            )
+            resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+            resultado["descripcion"] = descripcion
+            informe["escenarios"][escenario] = resultado
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    anterior = informe["escenarios"]["anterior"]["segundos"]
+    diferido = informe["escenarios"]["diferido"]["segundos"]
+    informe["aceleracion"] = round(anterior / diferido, 1) if diferido else None
+
+    texto = json.dumps(informe, indent=4, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
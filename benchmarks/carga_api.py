@@ -0,0 +1,250 @@
+"""
+Prueba de carga del servicio HTTP (``api.servidor``) sobre una clínica
+sintética: varias conexiones persistentes hacen a la vez una mezcla de
+lecturas, altas y descargas de imágenes, y se informan peticiones por
+segundo y latencias p50/p99 por tipo de petición.
+
+Sin ``--url`` se genera la clínica en una carpeta temporal y se levanta el
+servidor en otro proceso; con ``--url`` se prueba un servidor ya en marcha
+(las altas quedan en su base de datos).
+
+Uso:
+    python -m benchmarks.carga_api [--escala 1k] [--modo json] [--conexiones 32]
+        [--peticiones 5000] [--url http://127.0.0.1:8080] [--salida carga.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.rendimiento import percentil
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (tipo de petición, peso en la mezcla)
+MEZCLA = (
+    ("obtener_paciente", 40),
+    ("diagnosticos_de_paciente", 30),
+    ("registrar_paciente", 20),
+    ("descargar_imagen", 10),
+)
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP/1.1 mínimo sobre una conexión persistente.
+    """
+
+    def __init__(self, host: str, puerto: int):
+        self.host = host
+        self.puerto = puerto
+        self._lector = None
+        self._escritor = None
+
+    async def pedir(self, metodo: str, ruta: str, cuerpo: bytes = b"",
+                    tipo: str = "application/json") -> tuple:
+        """
+        Hace una petición, abriendo la conexión si hace falta.
+
+        Returns:
+            tuple: (estado, cuerpo de la respuesta).
+        """
+        if self._escritor is None:
+            self._lector, self._escritor = await asyncio.open_connection(self.host, self.puerto)
+        encabezado = f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(cuerpo)}\r\n"
+        if cuerpo:
+            encabezado += f"Content-Type: {tipo}\r\n"
+        self._escritor.write(encabezado.encode("latin-1") + b"\r\n" + cuerpo)
+        await self._escritor.drain()
+
+        estado = int((await self._lector.readline()).split()[1])
+        largo = 0
+        cerrar = False
+        while True:
+            linea = await self._lector.readline()
+            if linea in (b"\r\n", b""):
+                break
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            if nombre.lower() == "content-length":
+                largo = int(valor)
+            elif nombre.lower() == "connection" and valor.strip().lower() == "close":
+                cerrar = True
+        respuesta = await self._lector.readexactly(largo)
+        if cerrar:
+            self.cerrar()
+        return estado, respuesta
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+
+async def _conexion(host: str, puerto: int, tareas: list, cantidad: int, azar: random.Random,
+                    tiempos: dict, errores: dict):
+    """
+    Corre peticiones de la mezcla por una conexión hasta agotar ``tareas``.
+    """
+    cliente = ClienteHTTP(host, puerto)
+    tipos = [tipo for tipo, _ in MEZCLA]
+    pesos = [peso for _, peso in MEZCLA]
+    try:
+        while tareas:
+            tareas.pop()
+            tipo = azar.choices(tipos, pesos)[0]
+            id_azar = str(azar.randint(1, cantidad)).zfill(3)
+            if tipo == "obtener_paciente":
+                peticion = ("GET", f"/pacientes/{id_azar}", b"")
+            elif tipo == "diagnosticos_de_paciente":
+                peticion = ("GET", f"/diagnosticos?id_paciente={id_azar}&limite=20", b"")
+            elif tipo == "registrar_paciente":
+                cuerpo = {"nombre": "Paciente Carga", "edad": azar.randint(1, 99),
+                          "genero": azar.choice("MF")}
+                peticion = ("POST", "/pacientes", json.dumps(cuerpo).encode("utf-8"))
+            else:
+                peticion = ("GET", f"/imagenes/{str(azar.randint(1, min(cantidad, 10))).zfill(3)}/archivo", b"")
+
+            inicio = time.perf_counter()
+            try:
+                estado, _ = await cliente.pedir(*peticion)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                cliente.cerrar()
+                estado = None
+            tiempos[tipo].append(time.perf_counter() - inicio)
+            if estado is None or estado >= 400:
+                errores[tipo] = errores.get(tipo, 0) + 1
+    finally:
+        cliente.cerrar()
+
+
+async def cargar(host: str, puerto: int, cantidad: int, conexiones: int, peticiones: int,
+                 semilla: int = 9) -> dict:
+    """
+    Lanza la carga contra el servidor y resume los resultados.
+
+    Args:
+        host (str): Dirección del servidor.
+        puerto (int): Puerto del servidor.
+        cantidad (int): Registros por tabla de la clínica.
+        conexiones (int): Conexiones simultáneas.
+        peticiones (int): Peticiones en total.
+        semilla (int): Semilla de la mezcla de peticiones.
+
+    Returns:
+        dict: Peticiones por segundo, latencias y errores.
+    """
+    tareas = list(range(peticiones))
+    tiempos = {tipo: [] for tipo, _ in MEZCLA}
+    errores = {}
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        _conexion(host, puerto, tareas, cantidad, random.Random(semilla + i), tiempos, errores)
+        for i in range(conexiones)
+    ))
+    segundos = time.perf_counter() - inicio
+
+    todas = [t for lista in tiempos.values() for t in lista]
+    informe = dict({"conexiones": conexiones, "segundos": round(segundos, 3)},
+                   **_resumir(todas, segundos))
+    informe["errores"] = errores
+    informe["por_tipo"] = {tipo: _resumir(lista, segundos) for tipo, lista in tiempos.items() if lista}
+    return informe
+
+
+def _resumir(tiempos: list, segundos: float) -> dict:
+    """
+    Resume las peticiones de un tipo. Como corren en paralelo, el ritmo se
+    calcula sobre la duración total de la carga y no sobre la suma de las
+    latencias.
+    """
+    ordenados = sorted(tiempos)
+    return {
+        "peticiones": len(ordenados),
+        "peticiones_por_s": round(len(ordenados) / segundos, 1) if segundos else None,
+        "p50_ms": round(percentil(ordenados, 50) * 1000, 3),
+        "p99_ms": round(percentil(ordenados, 99) * 1000, 3),
+    }
+
+
+def levantar_servidor(carpeta: str, modo: str) -> tuple:
+    """
+    Levanta ``api.servidor`` en otro proceso, en un puerto libre.
+
+    Returns:
+        tuple: (proceso, puerto).
+    """
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "api.servidor", "--puerto", "0", "--modo", modo, "--silencioso"],
+        cwd=carpeta, env=dict(os.environ, PYTHONPATH=RAIZ),
+        stderr=subprocess.PIPE, text=True, encoding="utf-8"
+    )
+    linea = proceso.stderr.readline()
+    if "http://" not in linea:
+        proceso.kill()
+        raise RuntimeError(f"El servidor no arrancó: {linea}{proceso.stderr.read()}")
+    # El resto de su stderr (errores internos) se reenvía, para que el
+    # servidor no se bloquee con la tubería llena
+    threading.Thread(target=shutil.copyfileobj, args=(proceso.stderr, sys.stderr), daemon=True).start()
+    return proceso, int(linea.rsplit(":", 1)[1])
+
+
+def main(argumentos=None):
+    """
+    Prepara la clínica y el servidor (si no se indica ``--url``), corre la
+    carga e imprime los resultados como JSON.
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio HTTP.")
+    parser.add_argument("--escala", default="1k", help="1k, 100k, 1m o un número (por defecto 1k).")
+    parser.add_argument("--modo", default="json", help="Modo de almacenamiento: json, diario, binario o sqlite.")
+    parser.add_argument("--conexiones", type=int, default=32)
+    parser.add_argument("--peticiones", type=int, default=5000)
+    parser.add_argument("--url", help="Servidor ya en marcha; por defecto se levanta uno.")
+    parser.add_argument("--semilla", type=int, default=9)
+    parser.add_argument("--salida", help="Archivo donde guardar el JSON de resultados.")
+    args = parser.parse_args(argumentos)
+
+    from benchmarks.datos_sinteticos import generar_clinica, interpretar_escala
+    cantidad = interpretar_escala(args.escala)
+    carpeta = proceso = None
+    try:
+        if args.url:
+            partes = urlsplit(args.url)
+            host, puerto = partes.hostname, partes.port or 80
+        else:
+            carpeta = tempfile.mkdtemp(prefix="papilas_carga_")
+            rutas = generar_clinica(carpeta, cantidad, args.semilla, max_jpegs=10)
+            if args.modo in ("sqlite", "binario"):
+                from gestor.migracion import MIGRACIONES
+                MIGRACIONES[args.modo]([rutas["pacientes"], rutas["diagnosticos"], rutas["imagenes"]])
+            proceso, puerto = levantar_servidor(carpeta, args.modo)
+            host = "127.0.0.1"
+        informe = asyncio.run(cargar(host, puerto, cantidad, args.conexiones,
+                                     args.peticiones, args.semilla))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+        if carpeta is not None:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    informe = dict({"escala": cantidad, "modo": args.modo}, **informe)
+    texto = json.dumps(informe, indent=4, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
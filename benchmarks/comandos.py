@@ -0,0 +1,132 @@
+"""
+Mide el modo de comandos de ``main.py`` sobre una clínica sintética: una
+mezcla de altas, consultas y bajas entrelazadas enviada al modo lote (un
+solo proceso, tablas cargadas una vez y escrituras por tanda), comparada
+con ejecutar cada comando como un subcomando en un proceso aparte.
+
+Uso:
+    python -m benchmarks.comandos [--escala 100k] [--comandos 20000] [--modo json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(RAIZ, "main.py")
+
+
+def generar_comandos(cantidad: int, pacientes: int, semilla: int = 9) -> list:
+    """
+    Genera una mezcla de comandos sobre la clínica: 40 % altas de pacientes,
+    30 % altas de diagnósticos, 20 % consultas y 10 % bajas de diagnósticos,
+    entrelazados al azar.
+
+    Args:
+        cantidad (int): Cantidad de comandos.
+        pacientes (int): Pacientes de la clínica (IDs válidos 001..N).
+        semilla (int): Semilla del generador aleatorio.
+
+    Returns:
+        list: Comandos (dict).
+    """
+    azar = random.Random(semilla)
+    comandos = []
+    for _ in range(cantidad):
+        sorteo = azar.random()
+        id_azar = str(azar.randint(1, pacientes)).zfill(3)
+        if sorteo < 0.4:
+            comandos.append({"accion": "agregar", "recurso": "pacientes",
+                             "datos": {"nombre": f"Paciente {azar.randint(1, 10 ** 6)}",
+                                       "edad": azar.randint(0, 99), "genero": azar.choice("FM")}})
+        elif sorteo < 0.7:
+            comandos.append({"accion": "agregar", "recurso": "diagnosticos",
+                             "datos": {"id_paciente": id_azar, "fecha": "2024-06-01",
+                                       "dioptria_1": azar.randint(-24, 24) * 0.25,
+                                       "dioptria_2": azar.randint(-24, 24) * 0.25,
+                                       "astigmatismo": azar.randint(0, 180),
+                                       "tipo": azar.choice(("OD", "OS"))}})
+        elif sorteo < 0.8:
+            comandos.append({"accion": "obtener", "recurso": "pacientes", "id": id_azar})
+        elif sorteo < 0.9:
+            comandos.append({"accion": "listar", "recurso": "diagnosticos",
+                             "filtros": {"id_paciente": id_azar}, "limite": 10})
+        else:
+            comandos.append({"accion": "eliminar", "recurso": "diagnosticos", "id": id_azar})
+    return comandos
+
+
+def main(argumentos=None):
+    """
+    Genera la clínica y los comandos, mide ambos modos e imprime los
+    resultados como JSON.
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark del modo de comandos de main.py.")
+    parser.add_argument("--escala", default="100k", help="1k, 100k, 1m o un número (por defecto 100k).")
+    parser.add_argument("--comandos", type=int, default=20000, help="Comandos del modo lote.")
+    parser.add_argument("--subcomandos", type=int, default=20,
+                        help="Comandos que se ejecutan de a uno, como subcomandos.")
+    parser.add_argument("--modo", default="json", help="Modo de almacenamiento: json, diario, binario o sqlite.")
+    parser.add_argument("--salida", help="Archivo donde guardar el JSON de resultados.")
+    args = parser.parse_args(argumentos)
+
+    from benchmarks.datos_sinteticos import interpretar_escala
+    cantidad = interpretar_escala(args.escala)
+    carpeta = tempfile.mkdtemp(prefix="papilas_comandos_")
+    entorno = dict(os.environ, PYTHONPATH=RAIZ, PAPILAS_ALMACEN=args.modo)
+    informe = {"escala": cantidad, "modo": args.modo}
+    try:
+        subprocess.run([sys.executable, "-m", "benchmarks.datos_sinteticos", carpeta,
+                        str(cantidad), "10"], env=entorno, capture_output=True, check=True)
+        if args.modo in ("sqlite", "binario"):
+            subprocess.run([sys.executable, "-m", "gestor.migracion", os.path.join(carpeta, "data"),
+                            "--formato", args.modo], env=entorno, capture_output=True, check=True)
+        comandos = generar_comandos(args.comandos, cantidad)
+        entrada = "".join(json.dumps(comando) + "\n" for comando in comandos)
+
+        inicio = time.perf_counter()
+        proceso = subprocess.run([sys.executable, MAIN, "lote"], input=entrada, cwd=carpeta,
+                                 env=entorno, capture_output=True, text=True)
+        segundos = time.perf_counter() - inicio
+        resultados = [json.loads(linea) for linea in proceso.stdout.splitlines()]
+        informe["lote"] = {
+            "comandos": len(comandos),
+            "resultados": len(resultados),
+            "errores": sum(1 for resultado in resultados if resultado["estado"] == "error"),
+            "segundos": round(segundos, 3),
+            "comandos_por_segundo": round(len(comandos) / segundos),
+        }
+
+        # Los mismos comandos, cada uno en su proceso (carga de tablas incluida)
+        inicio = time.perf_counter()
+        for comando in comandos[:args.subcomandos]:
+            subprocess.run([sys.executable, MAIN, "lote", "--lote", "1"], input=json.dumps(comando),
+                           cwd=carpeta, env=entorno, capture_output=True, text=True)
+        segundos = time.perf_counter() - inicio
+        informe["de_a_uno"] = {
+            "comandos": args.subcomandos,
+            "segundos": round(segundos, 3),
+            "comandos_por_segundo": round(args.subcomandos / segundos, 2),
+        }
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    informe["aceleracion"] = round(informe["lote"]["comandos_por_segundo"]
+                                   / informe["de_a_uno"]["comandos_por_segundo"], 1)
+    texto = json.dumps(informe, indent=4, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
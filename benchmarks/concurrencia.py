@@ -0,0 +1,191 @@
+"""
+Prueba de carga con varios procesos escribiendo a la vez sobre la misma
+carpeta ``data/``, como varias terminales de recepción abiertas sobre la
+misma clínica. Cada proceso (con uno o más hilos) da de alta pacientes y un
+diagnóstico por paciente; al terminar se relee la clínica y se verifica que
+no se perdió ninguna escritura ni se repitió ningún ID.
+
+Uso:
+    python -m benchmarks.concurrencia [--procesos 8] [--operaciones 200]
+        [--hilos 1] [--modo diario] [--sincronizar] [--salida concurrencia.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def escribir(carpeta: str, modo: str, operaciones: int, hilos: int, sincronizar: bool,
+             inicio: float) -> dict:
+    """
+    Trabajo de un proceso escritor: espera a la hora de inicio común y da de
+    alta ``operaciones`` pacientes con su diagnóstico desde cada hilo.
+
+    Args:
+        carpeta (str): Carpeta de la clínica.
+        modo (str): Modo de almacenamiento.
+        operaciones (int): Altas por hilo.
+        hilos (int): Hilos escritores del proceso.
+        sincronizar (bool): Si es True cada escritura hace fsync.
+        inicio (float): Hora (``time.time``) a la que empiezan todos.
+
+    Returns:
+        dict: IDs obtenidos y duración de cada alta.
+    """
+    from gestor.gestor_diagnosticos import GestorDiagnosticos
+    from gestor.gestor_pacientes import GestorPacientes
+    from gestor.repositorio import Repositorio
+
+    ruta_pacientes = os.path.join(carpeta, "data", "db_pacientes.json")
+    ruta_diagnosticos = os.path.join(carpeta, "data", "db_diagnostico.json")
+    repositorio = Repositorio(modo, sincronizar)
+    gp = GestorPacientes(ruta_pacientes, repositorio)
+    gd = GestorDiagnosticos(ruta_diagnosticos, ruta_pacientes, repositorio)
+    resultado = {"pacientes": [], "diagnosticos": [], "tiempos": []}
+    cerrojo = threading.Lock()
+
+    def trabajar():
+        propios = {"pacientes": [], "diagnosticos": [], "tiempos": []}
+        for numero in range(operaciones):
+            comienzo = time.perf_counter()
+            id_paciente = gp.registrar_paciente(f"Paciente {os.getpid()}-{numero}", 40, "F")
+            id_diagnostico = gd.registrar_diagnostico(id_paciente, "2025-06-01", -1.0, -0.5, 90, "OD")
+            propios["tiempos"].append(time.perf_counter() - comienzo)
+            propios["pacientes"].append(id_paciente)
+            propios["diagnosticos"].append(id_diagnostico)
+        with cerrojo:
+            for clave, valores in propios.items():
+                resultado[clave].extend(valores)
+
+    time.sleep(max(0.0, inicio - time.time()))
+    with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+        trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        repositorio.cerrar()
+    return resultado
+
+
+def verificar(carpeta: str, modo: str, iniciales: int, escritores: list) -> dict:
+    """
+    Relee la clínica desde cero y compara con lo que informaron los
+    escritores.
+
+    Args:
+        carpeta (str): Carpeta de la clínica.
+        modo (str): Modo de almacenamiento.
+        iniciales (int): Registros por tabla antes de la prueba.
+        escritores (list): Resultados de ``escribir``.
+
+    Returns:
+        dict: Por tabla, registros esperados, encontrados, IDs repetidos
+        entre escritores y altas confirmadas que no están en disco.
+    """
+    from gestor.repositorio import Repositorio
+
+    repositorio = Repositorio(modo)
+    informe = {}
+    for clave, archivo in (("pacientes", "db_pacientes.json"), ("diagnosticos", "db_diagnostico.json")):
+        tabla = repositorio.tabla(os.path.join(carpeta, "data", archivo))
+        ids = [id_registro for escritor in escritores for id_registro in escritor[clave]]
+        informe[clave] = {
+            "esperados": iniciales + len(ids),
+            "encontrados": len(tabla),
+            "ids_repetidos": len(ids) - len(set(ids)),
+            "altas_perdidas": sum(1 for id_registro in set(ids) if id_registro not in tabla),
+        }
+    repositorio.cerrar()
+    return informe
+
+
+def main(argumentos=None):
+    """
+    Lanza los procesos escritores a la vez, verifica la clínica e imprime
+    el resultado como JSON.
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Prueba de carga con varios procesos escritores.")
+    parser.add_argument("--procesos", type=int, default=8, help="Procesos escritores.")
+    parser.add_argument("--operaciones", type=int, default=200, help="Altas por hilo.")
+    parser.add_argument("--hilos", type=int, default=1, help="Hilos escritores por proceso.")
+    parser.add_argument("--modo", default="diario", help="Modo de almacenamiento: json, diario, binario o sqlite.")
+    parser.add_argument("--sincronizar", action="store_true", help="fsync de cada escritura.")
+    parser.add_argument("--iniciales", type=int, default=1000, help="Registros por tabla al empezar.")
+    parser.add_argument("--salida", help="Archivo donde guardar el JSON de resultados.")
+    parser.add_argument("--carpeta", help=argparse.SUPPRESS)
+    parser.add_argument("--inicio", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args(argumentos)
+
+    if args.carpeta:
+        print(json.dumps(escribir(args.carpeta, args.modo, args.operaciones, args.hilos,
+                                  args.sincronizar, args.inicio)))
+        return
+
+    from benchmarks.datos_sinteticos import generar_clinica
+    from benchmarks.rendimiento import resumir_tiempos
+    from gestor.migracion import MIGRACIONES
+
+    carpeta = tempfile.mkdtemp(prefix="papilas_concurrencia_")
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    try:
+        rutas = generar_clinica(carpeta, args.iniciales, max_jpegs=0)
+        if args.modo in ("sqlite", "binario"):
+            MIGRACIONES[args.modo]([rutas["pacientes"], rutas["diagnosticos"], rutas["imagenes"]])
+
+        # Todos arrancan a la misma hora, una vez terminadas las importaciones
+        inicio = time.time() + 1.0 + 0.1 * args.procesos
+        comando = [sys.executable, "-m", "benchmarks.concurrencia", "--carpeta", carpeta,
+                   "--inicio", repr(inicio), "--modo", args.modo,
+                   "--operaciones", str(args.operaciones), "--hilos", str(args.hilos)]
+        if args.sincronizar:
+            comando.append("--sincronizar")
+        procesos = [subprocess.Popen(comando, env=entorno, stdout=subprocess.PIPE, text=True)
+                    for _ in range(args.procesos)]
+        escritores = [json.loads(proceso.communicate()[0].strip().splitlines()[-1])
+                      for proceso in procesos]
+        segundos = time.time() - inicio
+        verificacion = verificar(carpeta, args.modo, args.iniciales, escritores)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    tiempos = [tiempo for escritor in escritores for tiempo in escritor["tiempos"]]
+    altas = len(tiempos)
+    informe = {
+        "modo": args.modo,
+        "sincronizar": args.sincronizar,
+        "procesos": args.procesos,
+        "hilos_por_proceso": args.hilos,
+        "altas": altas,
+        "segundos": round(segundos, 3),
+        # Cada alta escribe dos tablas: un paciente y un diagnóstico
+        "escrituras_por_s": round(2 * altas / segundos, 1) if segundos else None,
+        "latencia_alta": resumir_tiempos(tiempos),
+        "verificacion": verificacion,
+        "correcto": all(
+            tabla["esperados"] == tabla["encontrados"]
+            and not tabla["ids_repetidos"] and not tabla["altas_perdidas"]
+            for tabla in verificacion.values()
+        ),
+    }
+
+    texto = json.dumps(informe, indent=4, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Generador determinista de una clínica sintética: pacientes, diagnósticos e
+imágenes con valores realistas, más capturas JPEG de relleno.
+
+La misma semilla produce siempre los mismos registros y las mismas
+imágenes, así que dos corridas de los benchmarks trabajan sobre datos
+idénticos.
+
+Uso:
+    python -m benchmarks.datos_sinteticos carpeta [cantidad] [max_jpegs]
+"""
+import base64
+import json
+import os
+import random
+import sys
+
+try:
+    from PIL import Image, ImageDraw, ImageFilter
+except ImportError:  # Pillow es opcional: sin él se usa una plantilla fija
+    Image = None
+
+ESCALAS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+NOMBRES = ("Ana", "Carlos", "Lucía", "Jorge", "María", "Pedro", "Sofía", "Diego",
+           "Valentina", "Martín", "Camila", "Andrés", "Paula", "Luis", "Elena", "Tomás")
+APELLIDOS = ("Rodríguez", "Gómez", "Pérez", "Fernández", "López", "Díaz", "Martínez",
+             "Sánchez", "Romero", "Torres", "Álvarez", "Ruiz", "Castro", "Vargas")
+DESCRIPCIONES = ("", "Control anual", "Papila normal", "Excavación aumentada",
+                 "Bordes difusos", "Sospecha de glaucoma", "Seguimiento")
+
+# JPEG de 16x16 usado como plantilla cuando Pillow no está instalado; cada
+# copia lleva un comentario distinto para que su contenido sea único.
+PLANTILLA_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAA0JCgsKCA0LCgsODg0PEyAVExISEyccHhcgLikxMC4pLSwzOko+"
+    "MzZGNywtQFdBRkxOUlNSMj5aYVpQYEpRUk//2wBDAQ4ODhMREyYVFSZPNS01T09PT09PT09PT09PT09PT09P"
+    "T09PT09PT09PT09PT09PT09PT09PT09PT09PT09PT0//wAARCAAQABADASIAAhEBAxEB/8QAHwAAAQUBAQEB"
+    "AQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKB"
+    "kaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1"
+    "dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi4+Tl"
+    "5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcF"
+    "BAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5"
+    "OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0"
+    "tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIRAxEAPwDCtLWa8uUt"
+    "7ZN8r52rkDOBnv8ASi7tZrO5e3uU2SpjcuQcZGe31otLqazuUuLZ9kqZ2tgHGRjv9aLu6mvLl7i5ffK+NzYA"
+    "zgY7fSvOPf1v5H//2Q=="
+)
+
+
+def interpretar_escala(texto: str) -> int:
+    """
+    Convierte una escala ("1k", "100k", "1m" o un número) en cantidad.
+
+    Args:
+        texto (str): Escala indicada por el usuario.
+
+    Returns:
+        int: Cantidad de registros por tabla.
+    """
+    return ESCALAS.get(texto.lower()) or int(texto)
+
+
+def _fecha(azar: random.Random) -> str:
+    return f"{azar.randint(2019, 2025)}-{azar.randint(1, 12):02d}-{azar.randint(1, 28):02d}"
+
+
+def generar_pacientes(cantidad: int, semilla: int = 9):
+    """
+    Genera pacientes con edades sesgadas hacia adultos mayores, como en una
+    consulta oftalmológica.
+
+    Args:
+        cantidad (int): Cantidad de pacientes.
+        semilla (int): Semilla del generador aleatorio.
+
+    Yields:
+        dict: Un paciente serializado.
+    """
+    azar = random.Random(semilla)
+    for i in range(1, cantidad + 1):
+        yield {
+            "id": str(i).zfill(3),
+            "nombre": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+            "edad": min(99, max(1, int(azar.gauss(58, 18)))),
+            "genero": azar.choice(("M", "F")),
+        }
+
+
+def generar_diagnosticos(cantidad: int, pacientes: int, semilla: int = 9):
+    """
+    Genera diagnósticos con dioptrías en pasos de 0,25 y astigmatismo en
+    grados, repartidos al azar entre los pacientes.
+
+    Args:
+        cantidad (int): Cantidad de diagnósticos.
+        pacientes (int): Cantidad de pacientes existentes.
+        semilla (int): Semilla del generador aleatorio.
+
+    Yields:
+        dict: Un diagnóstico serializado.
+    """
+    azar = random.Random(semilla + 1)
+    for i in range(1, cantidad + 1):
+        yield {
+            "id": str(i).zfill(3),
+            "id_paciente": str(azar.randint(1, pacientes)).zfill(3),
+            "fecha": _fecha(azar),
+            "dioptria_1": azar.randint(-40, 24) * 0.25,
+            "dioptria_2": azar.randint(-40, 24) * 0.25,
+            "astigmatismo": azar.randint(0, 180),
+            "tipo": azar.choice(("OD", "OS")),
+        }
+
+
+def generar_imagenes(diagnosticos: dict, semilla: int = 9):
+    """
+    Genera una imagen por diagnóstico, con el nombre de archivo que usa
+    ``GestorImagenes`` (RET{paciente}{ojo}.jpg).
+
+    Args:
+        diagnosticos (dict): Diagnósticos serializados, indexados por ID.
+        semilla (int): Semilla del generador aleatorio.
+
+    Yields:
+        dict: Una imagen serializada.
+    """
+    azar = random.Random(semilla + 2)
+    for i, diagnostico in enumerate(diagnosticos.values(), start=1):
+        yield {
+            "id": str(i).zfill(3),
+            "id_diagnostico": diagnostico["id"],
+            "archivo": f"RET{diagnostico['id_paciente']}{diagnostico['tipo']}.jpg",
+            "descripcion": azar.choice(DESCRIPCIONES),
+            "tipo_ojo": diagnostico["tipo"],
+            "fecha_captura": diagnostico["fecha"],
+        }
+
+
+def escribir_jpeg(ruta: str, numero: int, semilla: int = 9):
+    """
+    Escribe una captura de relleno. Con Pillow se dibuja un fondo de ojo
+    simplificado (retina, papila y vasos) con variaciones por imagen; sin
+    él se copia la plantilla fija.
+
+    Args:
+        ruta (str): Ruta del archivo a crear.
+        numero (int): Número de la imagen; define sus variaciones.
+        semilla (int): Semilla del generador aleatorio.
+    """
+    if Image is None:
+        comentario = f"papila sintetica {semilla}-{numero}".encode("ascii")
+        segmento = b"\xff\xfe" + (len(comentario) + 2).to_bytes(2, "big") + comentario
+        with open(ruta, "wb") as f:
+            f.write(PLANTILLA_JPEG[:2] + segmento + PLANTILLA_JPEG[2:])
+        return
+
+    azar = random.Random(semilla * 1_000_003 + numero)
+    lado = 256
+    imagen = Image.new("RGB", (lado, lado), (0, 0, 0))
+    dibujo = ImageDraw.Draw(imagen)
+    rojo = azar.randint(150, 210)
+    dibujo.ellipse((8, 8, lado - 8, lado - 8), fill=(rojo, rojo // 3, 20))
+    cx, cy = azar.randint(80, 176), azar.randint(90, 166)
+    radio = azar.randint(14, 24)
+    for _ in range(6):
+        angulo_x, angulo_y = azar.randint(-120, 120), azar.randint(-120, 120)
+        dibujo.line((cx, cy, cx + angulo_x, cy + angulo_y), fill=(rojo // 2, 10, 10), width=3)
+    dibujo.ellipse((cx - radio, cy - radio, cx + radio, cy + radio), fill=(250, 225, 160))
+    imagen = imagen.filter(ImageFilter.GaussianBlur(azar.uniform(0.5, 2.5)))
+    imagen.save(ruta, "JPEG", quality=85)
+
+
+def _escribir_tabla(ruta: str, registros) -> int:
+    """
+    Escribe una tabla con el mismo formato que ``AlmacenJSON``.
+
+    Returns:
+        int: Cantidad de registros escritos.
+    """
+    tabla = {registro["id"]: registro for registro in registros}
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(tabla, f, indent=4)
+    return len(tabla)
+
+
+def generar_clinica(carpeta: str, cantidad: int, semilla: int = 9, max_jpegs: int = 1000) -> dict:
+    """
+    Crea una clínica sintética completa: ``data/`` con las tres tablas y
+    ``imagenes/`` con las capturas de relleno.
+
+    Cada tabla tiene ``cantidad`` registros. Para no llenar el disco a gran
+    escala solo se escriben en ``imagenes/`` los primeros ``max_jpegs``
+    archivos; además se dejan otros tantos en ``origen/`` para usar como
+    imágenes a registrar.
+
+    Args:
+        carpeta (str): Carpeta de destino.
+        cantidad (int): Registros por tabla.
+        semilla (int): Semilla del generador aleatorio.
+        max_jpegs (int): Máximo de capturas a escribir en cada carpeta.
+
+    Returns:
+        dict: Rutas de las tablas y carpetas generadas.
+    """
+    rutas = {
+        "pacientes": os.path.join(carpeta, "data", "db_pacientes.json"),
+        "diagnosticos": os.path.join(carpeta, "data", "db_diagnostico.json"),
+        "imagenes": os.path.join(carpeta, "data", "db_imagen.json"),
+        "carpeta_imagenes": os.path.join(carpeta, "imagenes"),
+        "carpeta_origen": os.path.join(carpeta, "origen"),
+    }
+    for clave in ("carpeta_imagenes", "carpeta_origen"):
+        os.makedirs(rutas[clave], exist_ok=True)
+    os.makedirs(os.path.dirname(rutas["pacientes"]), exist_ok=True)
+
+    _escribir_tabla(rutas["pacientes"], generar_pacientes(cantidad, semilla))
+    diagnosticos = {d["id"]: d for d in generar_diagnosticos(cantidad, cantidad, semilla)}
+    _escribir_tabla(rutas["diagnosticos"], diagnosticos.values())
+
+    archivos = {}
+
+    def registrar_archivo(imagen):
+        if len(archivos) < max_jpegs:
+            archivos.setdefault(imagen["archivo"], len(archivos))
+        return imagen
+
+    _escribir_tabla(rutas["imagenes"],
+                    map(registrar_archivo, generar_imagenes(diagnosticos, semilla)))
+    del diagnosticos
+
+    for archivo, numero in archivos.items():
+        escribir_jpeg(os.path.join(rutas["carpeta_imagenes"], archivo), numero, semilla)
+    for numero in range(min(cantidad, max_jpegs)):
+        escribir_jpeg(os.path.join(rutas["carpeta_origen"], f"captura_{numero:05d}.jpg"),
+                      max_jpegs + numero, semilla)
+    return rutas
+
+
+if __name__ == "__main__":
+    destino = sys.argv[1] if len(sys.argv) > 1 else "clinica_sintetica"
+    total = interpretar_escala(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    generar_clinica(destino, total, max_jpegs=int(sys.argv[3]) if len(sys.argv) > 3 else 1000)
+    print(f"✅ Clínica sintética de {total} registros por tabla en {destino}")
@@ -0,0 +1,143 @@
+"""
+Compara las instantáneas JSON con las binarias (``gestor.binario``) sobre
+una clínica sintética: tiempo y pico de memoria de la carga en frío de las
+tres tablas, lectura de un solo registro por ID y tamaño de los archivos.
+
+Cada escenario corre en un proceso nuevo, así ninguno aprovecha lo que
+cargó el anterior.
+
+Uso:
+    python -m benchmarks.instantaneas [--escala 1m] [--salida instantaneas.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ESCENARIOS = (
+    # (nombre, descripción)
+    ("carga_json", "cargar las tres tablas como objetos desde los JSON"),
+    ("carga_binario", "cargar las tres tablas como objetos desde los .bin"),
+    ("registro_json", "leer un diagnóstico por ID analizando su JSON completo"),
+    ("registro_binario", "leer un diagnóstico por ID con mmap y el índice del .bin"),
+)
+
+
+def ejecutar_escenario(escenario: str, id_registro: str) -> dict:
+    """
+    Corre un escenario en el proceso actual (que debe estar en la carpeta
+    de la clínica) y mide su duración.
+
+    Args:
+        escenario (str): Nombre del escenario.
+        id_registro (str): ID del diagnóstico que se lee en los escenarios
+            de un registro.
+
+    Returns:
+        dict: Duración y pico de memoria.
+    """
+    from gestor.almacenamiento import crear_almacen
+    from gestor.binario import TablaBinaria
+    from gestor.migracion import ARCHIVOS_TABLAS
+    from modelos.diagnostico import Diagnostico
+    from modelos.imagen import ImagenPapila
+    from modelos.paciente import Paciente
+
+    modelos = (Paciente, Diagnostico, ImagenPapila)
+    rutas = [os.path.join("data", nombre) for nombre in ARCHIVOS_TABLAS]
+    resultado = {}
+
+    inicio = time.perf_counter()
+    if escenario.startswith("carga_"):
+        registros = 0
+        for ruta, modelo in zip(rutas, modelos):
+            almacen = crear_almacen(ruta, escenario[len("carga_"):], modelo)
+            registros += len(almacen.cargar())
+            almacen.cerrar()
+        resultado["registros"] = registros
+    elif escenario == "registro_json":
+        with open(rutas[1], "r", encoding="utf-8") as f:
+            resultado["encontrado"] = id_registro in json.load(f)
+    elif escenario == "registro_binario":
+        with TablaBinaria(os.path.splitext(rutas[1])[0] + ".bin") as tabla:
+            resultado["encontrado"] = tabla.buscar(id_registro) is not None
+    resultado["segundos"] = round(time.perf_counter() - inicio, 4)
+
+    from benchmarks.rendimiento import rss_pico_mb
+    resultado["rss_pico_mb"] = rss_pico_mb()
+    return resultado
+
+
+def main(argumentos=None):
+    """
+    Genera la clínica, la convierte al formato binario, corre cada escenario
+    en un proceso aparte e imprime los resultados como JSON.
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de instantáneas JSON y binarias.")
+    parser.add_argument("--escala", default="1m", help="1k, 100k, 1m o un número (por defecto 1m).")
+    parser.add_argument("--salida", help="Archivo donde guardar el JSON de resultados.")
+    parser.add_argument("--escenario", help=argparse.SUPPRESS)
+    parser.add_argument("--id", help=argparse.SUPPRESS)
+    args = parser.parse_args(argumentos)
+
+    if args.escenario:
+        print(json.dumps(ejecutar_escenario(args.escenario, args.id)))
+        return
+
+    from benchmarks.datos_sinteticos import interpretar_escala
+    from gestor.migracion import ARCHIVOS_TABLAS
+    cantidad = interpretar_escala(args.escala)
+    carpeta = tempfile.mkdtemp(prefix="papilas_instantaneas_")
+    informe = {"escala": cantidad, "escenarios": {}, "tamanos_mb": {}}
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    try:
+        # Generación y conversión en otros procesos: el pico de memoria de
+        # Linux se hereda al crear procesos hijos y falsearía las mediciones
+        subprocess.run([sys.executable, "-m", "benchmarks.datos_sinteticos", carpeta,
+                        str(cantidad), "10"], env=entorno, capture_output=True, check=True)
+        subprocess.run([sys.executable, "-m", "gestor.migracion", os.path.join(carpeta, "data"),
+                        "--formato", "binario"], env=entorno, capture_output=True, check=True)
+        for nombre in ARCHIVOS_TABLAS:
+            ruta = os.path.join(carpeta, "data", nombre)
+            informe["tamanos_mb"][nombre] = {
+                "json": round(os.path.getsize(ruta) / 2 ** 20, 1),
+                "binario": round(os.path.getsize(os.path.splitext(ruta)[0] + ".bin") / 2 ** 20, 1),
+            }
+
+        # Un ID de la mitad de la tabla
+        id_registro = str(cantidad // 2).zfill(3)
+        for escenario, descripcion in ESCENARIOS:
+            proceso = subprocess.run(
+                [sys.executable, "-m", "benchmarks.instantaneas", "--escenario", escenario,
+                 "--id", id_registro],
+                cwd=carpeta, env=entorno, capture_output=True, text=True, check=True
+            )
+            resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+            resultado["descripcion"] = descripcion
+            informe["escenarios"][escenario] = resultado
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    escenarios = informe["escenarios"]
+    for prueba in ("carga", "registro"):
+        binario = escenarios[f"{prueba}_binario"]["segundos"]
+        informe[f"aceleracion_{prueba}"] = round(escenarios[f"{prueba}_json"]["segundos"] / binario, 1) if binario else None
+
+    texto = json.dumps(informe, indent=4, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
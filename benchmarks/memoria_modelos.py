@@ -0,0 +1,122 @@
+"""
+Compara la memoria que ocupa una tabla de diagnósticos guardada como
+diccionario de diccionarios (lo que devuelve ``json.load``) con la misma
+tabla guardada como objetos ``Diagnostico`` con ``__slots__``.
+
+Uso:
+    python -m benchmarks.memoria_modelos [cantidad]
+"""
+import gc
+import json
+import random
+import sys
+import tracemalloc
+
+from modelos.diagnostico import Diagnostico
+from modelos.paciente import Paciente
+
+
+def generar_registros(cantidad: int, semilla: int = 9):
+    """
+    Genera diagnósticos sintéticos con valores realistas (dioptrías en
+    pasos de 0,25 y astigmatismo entero).
+
+    Args:
+        cantidad (int): Cantidad de diagnósticos.
+        semilla (int): Semilla del generador aleatorio.
+
+    Yields:
+        dict: Un diagnóstico serializado.
+    """
+    azar = random.Random(semilla)
+    for i in range(1, cantidad + 1):
+        yield {
+            "id": str(i).zfill(3),
+            "id_paciente": str(azar.randint(1, cantidad // 4 or 1)).zfill(3),
+            "fecha": f"2025-{azar.randint(1, 12):02d}-{azar.randint(1, 28):02d}",
+            "dioptria_1": azar.randint(-24, 24) * 0.25,
+            "dioptria_2": azar.randint(-24, 24) * 0.25,
+            "astigmatismo": azar.randint(0, 180),
+            "tipo": azar.choice(("OD", "OS")),
+        }
+
+
+def comprobar_tipos(registros: list):
+    """
+    Comprueba que compartir los valores numéricos no cambie su tipo: un
+    entero y un real iguales (3 y 3.0) se comparten por separado, y los
+    diagnósticos vuelven a ``to_dict`` tal como se leyeron.
+
+    Args:
+        registros (list): Diagnósticos serializados.
+
+    Raises:
+        AssertionError: Si algún valor vuelve con otro tipo.
+    """
+    for real, entero in ((3.0, 3), (0.0, 0), (90, 90.0)):
+        Diagnostico("900", "001", "2025-01-01", real, real, real, "OD")
+        edad = Paciente("900", "Control", entero, "F").to_dict()["edad"]
+        assert type(edad) is type(entero), f"edad {entero!r} volvió como {edad!r}"
+    for datos in registros:
+        vuelta = Diagnostico.from_dict(datos).to_dict()
+        assert all(type(vuelta[c]) is type(v) for c, v in datos.items()), f"{datos} volvió como {vuelta}"
+
+
+def medir(construir) -> int:
+    """
+    Mide los bytes que quedan asignados después de construir una tabla.
+
+    Args:
+        construir (callable): Función que arma y devuelve la tabla.
+
+    Returns:
+        int: Bytes asignados por la tabla.
+    """
+    gc.collect()
+    tracemalloc.start()
+    tabla = construir()
+    gc.collect()
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tabla
+    return actual
+
+
+def main(cantidad: int):
+    """
+    Ejecuta la comparación e imprime el resultado en JSON.
+
+    Args:
+        cantidad (int): Cantidad de diagnósticos a generar.
+    """
+    # Se parte del texto JSON, igual que al leer db_diagnostico.json, para
+    # que ambas representaciones paguen el costo real de sus objetos.
+    registros = list(generar_registros(cantidad))
+    comprobar_tipos(registros)
+    texto = json.dumps({r["id"]: r for r in registros})
+    del registros
+
+    def como_dicts():
+        return json.loads(texto)
+
+    def como_objetos():
+        tabla = {}
+        for datos in json.loads(texto).values():
+            diagnostico = Diagnostico.from_dict(datos)
+            tabla[diagnostico.id] = diagnostico
+        return tabla
+
+    bytes_dicts = medir(como_dicts)
+    bytes_objetos = medir(como_objetos)
+    print(json.dumps({
+        "diagnosticos": cantidad,
+        "dict_de_dicts_mb": round(bytes_dicts / 2 ** 20, 1),
+        "objetos_slots_mb": round(bytes_objetos / 2 ** 20, 1),
+        "bytes_por_registro_dicts": round(bytes_dicts / cantidad),
+        "bytes_por_registro_slots": round(bytes_objetos / cantidad),
+        "ahorro": f"{100 * (1 - bytes_objetos / bytes_dicts):.0f}%",
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,294 @@
+"""
+Mide el rendimiento de los gestores sobre una clínica sintética: carga en
+frío, alta individual, alta por lotes, consultas filtradas y bajas.
+
+Cada escala corre en un proceso aparte, para que el pico de memoria (RSS)
+informado sea el de esa escala. El resultado es un JSON con latencias p50 y
+p99, operaciones por segundo y pico de memoria, pensado para comparar
+corridas entre sí.
+
+Uso:
+    python -m benchmarks.rendimiento [--escalas 1k,100k,1m] [--modo json]
+        [--operaciones 50] [--salida resultados.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no se informa el pico de memoria
+    resource = None
+
+from benchmarks.datos_sinteticos import generar_clinica, interpretar_escala
+from gestor.gestor_diagnosticos import GestorDiagnosticos
+from gestor.gestor_imagenes import GestorImagenes
+from gestor.gestor_pacientes import GestorPacientes
+from gestor.migracion import MIGRACIONES
+from gestor.repositorio import Repositorio
+
+
+def rss_pico_mb():
+    """
+    Obtiene el pico de memoria residente del proceso actual.
+
+    Returns:
+        float or None: Megabytes, o None si el sistema no lo informa.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo informa en KiB y macOS en bytes
+    return round(pico / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def percentil(ordenados: list, p: float) -> float:
+    """
+    Percentil por el método del rango más cercano.
+
+    Args:
+        ordenados (list): Valores ordenados de menor a mayor.
+        p (float): Percentil (0 a 100).
+
+    Returns:
+        float: Valor del percentil.
+    """
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def resumir_tiempos(tiempos: list, elementos: int = None) -> dict:
+    """
+    Resume una serie de mediciones.
+
+    Args:
+        tiempos (list): Duración de cada operación, en segundos.
+        elementos (int, opcional): Registros procesados en total, si cada
+            operación procesa más de uno (altas por lotes).
+
+    Returns:
+        dict: Cantidad, total, throughput y latencias p50/p99 en ms.
+    """
+    ordenados = sorted(tiempos)
+    total = sum(ordenados)
+    procesados = elementos if elementos is not None else len(ordenados)
+    return {
+        "operaciones": len(ordenados),
+        "registros": procesados,
+        "total_s": round(total, 6),
+        "registros_por_s": round(procesados / total, 1) if total else None,
+        "p50_ms": round(percentil(ordenados, 50) * 1000, 3),
+        "p99_ms": round(percentil(ordenados, 99) * 1000, 3),
+    }
+
+
+def cronometrar(funcion, argumentos) -> list:
+    """
+    Ejecuta una función una vez por cada juego de argumentos, midiendo cada
+    llamada por separado.
+
+    Args:
+        funcion (callable): Operación a medir.
+        argumentos (iterable): Tuplas de argumentos.
+
+    Returns:
+        list: Duración de cada llamada, en segundos.
+    """
+    tiempos = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def consumir(generador) -> int:
+    """
+    Recorre un generador de consulta hasta el final.
+
+    Returns:
+        int: Cantidad de registros recibidos.
+    """
+    return sum(1 for _ in generador)
+
+
+def medir_escala(cantidad: int, modo: str = "json", operaciones: int = 50,
+                 semilla: int = 9, carpeta: str = None) -> dict:
+    """
+    Genera una clínica sintética y mide todas las operaciones sobre ella.
+
+    Args:
+        cantidad (int): Registros por tabla.
+        modo (str): Modo de almacenamiento del repositorio.
+        operaciones (int): Repeticiones de cada operación individual.
+        semilla (int): Semilla de los datos y de la elección de registros.
+        carpeta (str, opcional): Carpeta de trabajo; por defecto una
+            temporal que se borra al terminar.
+
+    Returns:
+        dict: Resultados de la escala.
+    """
+    temporal = carpeta is None
+    carpeta = carpeta or tempfile.mkdtemp(prefix="papilas_bench_")
+    azar = random.Random(semilla)
+    resultados = {"escala": cantidad, "modo": modo, "operaciones": {}}
+    medidas = resultados["operaciones"]
+    try:
+        inicio = time.perf_counter()
+        rutas = generar_clinica(carpeta, cantidad, semilla)
+        if modo in ("sqlite", "binario"):
+            MIGRACIONES[modo]([rutas["pacientes"], rutas["diagnosticos"], rutas["imagenes"]])
+        resultados["generacion_s"] = round(time.perf_counter() - inicio, 3)
+        origenes = sorted(
+            os.path.join(rutas["carpeta_origen"], nombre)
+            for nombre in os.listdir(rutas["carpeta_origen"])
+        )
+
+        # Los gestores informan cada operación por consola; se descarta
+        with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+            repositorio = Repositorio(modo)
+            inicio = time.perf_counter()
+            gp = GestorPacientes(rutas["pacientes"], repositorio)
+            medidas["carga_en_frio_pacientes"] = resumir_tiempos([time.perf_counter() - inicio], cantidad)
+            inicio = time.perf_counter()
+            gd = GestorDiagnosticos(rutas["diagnosticos"], rutas["pacientes"], repositorio)
+            medidas["carga_en_frio_diagnosticos"] = resumir_tiempos([time.perf_counter() - inicio], cantidad)
+            inicio = time.perf_counter()
+            gi = GestorImagenes(rutas["imagenes"], rutas["carpeta_imagenes"],
+                                rutas["diagnosticos"], rutas["pacientes"], repositorio)
+            medidas["carga_en_frio_imagenes"] = resumir_tiempos([time.perf_counter() - inicio], cantidad)
+
+            def id_al_azar():
+                return str(azar.randint(1, cantidad)).zfill(3)
+
+            # Altas individuales
+            medidas["registrar_paciente"] = resumir_tiempos(cronometrar(
+                gp.registrar_paciente,
+                [("Paciente Prueba", azar.randint(1, 99), azar.choice("MF")) for _ in range(operaciones)]
+            ))
+            medidas["registrar_diagnostico"] = resumir_tiempos(cronometrar(
+                gd.registrar_diagnostico,
+                [(id_al_azar(), "2025-06-01", -1.25, -0.5, 90.0, azar.choice(("OD", "OS")))
+                 for _ in range(operaciones)]
+            ))
+            medidas["registrar_imagen"] = resumir_tiempos(cronometrar(
+                gi.registrar_imagen,
+                [(id_al_azar(), azar.choice(origenes), "", azar.choice(("OD", "OS")), "2025-06-01")
+                 for _ in range(operaciones)]
+            ))
+
+            # Altas por lotes
+            lote = max(1, min(cantidad // 10, 10_000))
+            filas_pacientes = [
+                {"nombre": "Paciente Lote", "edad": azar.randint(1, 99), "genero": azar.choice("MF")}
+                for _ in range(lote)
+            ]
+            filas_diagnosticos = [
+                {"id_paciente": id_al_azar(), "fecha": "2025-07-01", "dioptria_1": 0.5,
+                 "dioptria_2": -0.75, "astigmatismo": 45, "tipo": azar.choice(("OD", "OS"))}
+                for _ in range(lote)
+            ]
+            filas_imagenes = [
+                {"id_diagnostico": id_al_azar(), "ruta_origen": azar.choice(origenes),
+                 "tipo_ojo": azar.choice(("OD", "OS")), "fecha_captura": "2025-07-01"}
+                for _ in range(min(lote, len(origenes)))
+            ]
+            medidas["registrar_pacientes_batch"] = resumir_tiempos(
+                cronometrar(gp.registrar_pacientes_batch, [(filas_pacientes,)]), lote
+            )
+            medidas["registrar_diagnosticos_batch"] = resumir_tiempos(
+                cronometrar(gd.registrar_diagnosticos_batch, [(filas_diagnosticos,)]), lote
+            )
+            medidas["registrar_imagenes_batch"] = resumir_tiempos(
+                cronometrar(gi.registrar_imagenes_batch, [(filas_imagenes,)]), len(filas_imagenes)
+            )
+
+            # Consultas filtradas: se mide el recorrido completo del resultado
+            medidas["consultar_diagnosticos_por_paciente"] = resumir_tiempos(cronometrar(
+                lambda pid: consumir(gd.consultar_diagnosticos(id_paciente=pid)),
+                [(id_al_azar(),) for _ in range(operaciones)]
+            ))
+            medidas["consultar_diagnosticos_por_fecha"] = resumir_tiempos(cronometrar(
+                lambda mes: consumir(gd.consultar_diagnosticos(
+                    fecha_desde=f"2024-{mes:02d}-01", fecha_hasta=f"2024-{mes:02d}-28", limite=100
+                )),
+                [(azar.randint(1, 12),) for _ in range(operaciones)]
+            ))
+            medidas["consultar_imagenes_por_ojo"] = resumir_tiempos(cronometrar(
+                lambda ojo, cursor: consumir(gi.consultar_imagenes(tipo_ojo=ojo, limite=100,
+                                                                   cursor=cursor)),
+                [(azar.choice(("OD", "OS")), id_al_azar()) for _ in range(operaciones)]
+            ))
+            medidas["listar_diagnosticos_por_paciente"] = resumir_tiempos(cronometrar(
+                gd.listar_diagnosticos, [(id_al_azar(),) for _ in range(operaciones)]
+            ))
+
+            # Bajas: IDs distintos, para que cada una borre un registro real
+            def ids_a_borrar():
+                return [(str(i).zfill(3),) for i in azar.sample(range(1, cantidad + 1),
+                                                                min(operaciones, cantidad))]
+
+            medidas["eliminar_imagen"] = resumir_tiempos(cronometrar(gi.eliminar_imagen, ids_a_borrar()))
+            medidas["eliminar_diagnostico"] = resumir_tiempos(
+                cronometrar(gd.eliminar_diagnostico, ids_a_borrar())
+            )
+            medidas["eliminar_paciente"] = resumir_tiempos(cronometrar(gp.eliminar_paciente, ids_a_borrar()))
+            repositorio.cerrar()
+    finally:
+        if temporal:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    resultados["rss_pico_mb"] = rss_pico_mb()
+    return resultados
+
+
+def main(argumentos=None):
+    """
+    Corre los benchmarks pedidos e imprime (y opcionalmente guarda) el JSON.
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks de los gestores de papilas.")
+    parser.add_argument("--escalas", default="1k",
+                        help="Escalas separadas por coma: 1k, 100k, 1m o un número (por defecto 1k).")
+    parser.add_argument("--modo", default="json", help="Modo de almacenamiento: json, diario, binario o sqlite.")
+    parser.add_argument("--operaciones", type=int, default=50,
+                        help="Repeticiones de cada operación individual.")
+    parser.add_argument("--semilla", type=int, default=9)
+    parser.add_argument("--salida", help="Archivo donde guardar el JSON de resultados.")
+    args = parser.parse_args(argumentos)
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "semilla": args.semilla,
+        "escalas": [],
+    }
+    for escala in args.escalas.split(","):
+        # Un proceso nuevo por escala: el pico de RSS no arrastra la anterior
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            informe["escalas"].append(pool.submit(
+                medir_escala, interpretar_escala(escala.strip()), args.modo,
+                args.operaciones, args.semilla
+            ).result())
+
+    texto = json.dumps(informe, indent=4, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,926 @@
+import json
+import os
+import sqlite3
+import threading
+
+from gestor.binario import escribir_tabla, leer_tabla
+from gestor.bloqueo import CerrojoArchivo
+
+
+def _como_dict(registro) -> dict:
+    """
+    Convierte un registro en memoria (objeto del modelo o dict) a dict.
+    También se usa como ``default`` de ``json.dump``, para serializar los
+    objetos sin armar antes una copia de toda la tabla.
+    """
+    return registro if isinstance(registro, dict) else registro.to_dict()
+
+
+class AlmacenJSON:
+    """
+    Persistencia clásica de una tabla: el archivo JSON completo se reescribe
+    en cada cambio.
+
+    Si se indica un modelo, los registros se mantienen en memoria como
+    objetos de ese modelo y solo se convierten a dict al leer o escribir.
+
+    Las lecturas y escrituras toman el cerrojo de archivo ``<ruta_db>.lock``
+    (compartido y exclusivo), y el archivo se reemplaza de forma atómica:
+    un proceso que se corta a mitad de la escritura no deja la tabla
+    truncada.
+    """
+
+    def __init__(self, ruta_db: str, modelo=None, sincronizar: bool = False):
+        """
+        Inicializa el almacén.
+
+        Args:
+            ruta_db (str): Ruta al archivo JSON de la tabla.
+            modelo (type, opcional): Clase con ``from_dict``/``to_dict``
+                (Paciente, Diagnostico o ImagenPapila). Sin modelo los
+                registros se devuelven como dict.
+            sincronizar (bool): Si es True se hace ``fsync`` de cada
+                escritura antes de darla por terminada.
+        """
+        self.ruta_db = ruta_db
+        self.modelo = modelo
+        self.sincronizar = sincronizar
+        self.cerrojo = CerrojoArchivo(ruta_db + ".lock")
+        self._firma = None
+
+    def _desde_dict(self, datos: dict):
+        """
+        Convierte un registro leído de disco al formato en memoria.
+
+        Args:
+            datos (dict): Registro serializado.
+
+        Returns:
+            object: Objeto del modelo, o el mismo dict si no hay modelo.
+        """
+        return self.modelo.from_dict(datos) if self.modelo else datos
+
+    def _a_tabla(self, datos: dict) -> dict:
+        """
+        Convierte una tabla leída de disco al formato en memoria.
+
+        Args:
+            datos (dict): Registros serializados, indexados por ID.
+
+        Returns:
+            dict: Registros en memoria, indexados por ID.
+        """
+        if self.modelo is None:
+            return datos
+        tabla = {}
+        for registro in datos.values():
+            objeto = self.modelo.from_dict(registro)
+            # La clave reutiliza el ID del objeto: una sola cadena por registro
+            tabla[objeto.id] = objeto
+        return tabla
+
+    def _archivos(self):
+        """
+        Archivos en disco que componen la tabla.
+
+        Returns:
+            tuple: Rutas de los archivos.
+        """
+        return (self.ruta_db,)
+
+    def firma(self) -> tuple:
+        """
+        Calcula la firma (mtime y tamaño) de los archivos de la tabla.
+
+        Returns:
+            tuple: Un par (mtime_ns, tamaño) por archivo, o None si no existe.
+        """
+        firma = []
+        for ruta in self._archivos():
+            try:
+                st = os.stat(ruta)
+                firma.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                firma.append(None)
+        return tuple(firma)
+
+    def modificado_externamente(self) -> bool:
+        """
+        Indica si los archivos cambiaron desde la última carga o escritura
+        hecha por este almacén (por ejemplo, desde otro proceso).
+
+        Returns:
+            bool: True si la tabla en disco ya no coincide con la memoria.
+        """
+        return self.firma() != self._firma
+
+    def cargar(self) -> dict:
+        """
+        Carga la tabla desde el archivo JSON.
+
+        Returns:
+            dict: Registros cargados o vacío si no existe o hay error.
+        """
+        with self.cerrojo.compartido():
+            self._firma = self.firma()
+            return self._a_tabla(self._leer_instantanea())
+
+    def _leer_instantanea(self) -> dict:
+        """
+        Lee el archivo JSON de la tabla sin convertir los registros.
+
+        Returns:
+            dict: Registros serializados, o vacío si no existe o hay error.
+        """
+        if not os.path.exists(self.ruta_db):
+            return {}
+        with open(self.ruta_db, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return {}
+
+    def _volcar(self, db: dict) -> str:
+        """
+        Escribe la tabla completa en un archivo temporal junto al JSON.
+
+        Args:
+            db (dict): Registros a volcar.
+
+        Returns:
+            str: Ruta del temporal, listo para renombrarse sobre el JSON.
+        """
+        temporal = f"{self.ruta_db}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(db, f, indent=4, default=_como_dict)
+            if self.sincronizar:
+                f.flush()
+                os.fsync(f.fileno())
+        return temporal
+
+    def _escribir_instantanea(self, db: dict):
+        """
+        Reemplaza el JSON por la tabla completa de forma atómica: quien lo
+        lea ve la versión anterior o la nueva, nunca una a medias.
+
+        Args:
+            db (dict): Registros a volcar.
+        """
+        os.replace(self._volcar(db), self.ruta_db)
+
+    def refrescar(self, db: dict):
+        """
+        Incorpora a ``db`` los cambios hechos en disco por otros procesos sin
+        releer la tabla completa, si el modo lo permite.
+
+        Args:
+            db (dict): Tabla en memoria.
+
+        Returns:
+            list or None: Pares (ID, registro anterior o None) de los
+            registros que cambiaron, o None si hay que recargar la tabla
+            completa (siempre, en este modo).
+        """
+        return None
+
+    def guardar(self, db: dict, ids=()):
+        """
+        Persiste la tabla. En este modo se ignoran los IDs modificados y se
+        reescribe el archivo completo.
+
+        Args:
+            db (dict): Tabla completa en memoria.
+            ids (iterable): IDs modificados desde la última escritura.
+        """
+        with self.cerrojo.exclusivo():
+            self._escribir_instantanea(db)
+            self._firma = self.firma()
+
+    def confirmar(self, db: dict):
+        """
+        Completa las escrituras después de liberar el cerrojo (no hace nada
+        en este modo: ``guardar`` ya dejó todo en disco).
+
+        Args:
+            db (dict): Tabla completa en memoria.
+        """
+
+    def cerrar(self):
+        """
+        Libera el archivo de cerrojo.
+        """
+        self.cerrojo.cerrar()
+
+
+class AlmacenDiario(AlmacenJSON):
+    """
+    Persistencia con diario de escritura anticipada (write-ahead log).
+
+    Cada cambio agrega una línea al archivo ``<ruta_db>.wal`` en lugar de
+    reescribir la tabla. Cuando el diario supera ``umbral_compactacion``
+    registros se compacta: su contenido se vuelca en el JSON original
+    (la instantánea) y el diario se vacía. Al cargar se lee la instantánea y
+    se reproducen los registros del diario; un último registro incompleto
+    (por ejemplo tras un corte de luz) se descarta.
+
+    Varios procesos pueden compartir el diario: cada almacén recuerda hasta
+    qué byte lo leyó, así que ponerse al día con lo que escribieron los demás
+    cuesta solo leer lo agregado. Con ``sincronizar`` el ``fsync`` se hace
+    después de liberar el cerrojo y una sola llamada cubre lo escrito por
+    todos los hilos que esperan (group commit).
+    """
+
+    def __init__(self, ruta_db: str, modelo=None, umbral_compactacion: int = 1000,
+                 en_segundo_plano: bool = True, sincronizar: bool = False):
+        """
+        Inicializa el almacén con diario.
+
+        Args:
+            ruta_db (str): Ruta al archivo JSON de la instantánea.
+            modelo (type, opcional): Clase de los registros en memoria.
+            umbral_compactacion (int): Registros del diario que disparan la
+                compactación.
+            en_segundo_plano (bool): Si es True la instantánea se escribe en
+                un hilo aparte para no bloquear al usuario.
+            sincronizar (bool): Si es True cada escritura termina con un
+                ``fsync`` del diario, compartido entre escrituras simultáneas.
+        """
+        super().__init__(ruta_db, modelo, sincronizar)
+        self.ruta_diario = ruta_db + ".wal"
+        self.ruta_diario_viejo = self.ruta_diario + ".old"
+        self.umbral_compactacion = umbral_compactacion
+        self.en_segundo_plano = en_segundo_plano
+        # Lo toma quien compacta, para que dos procesos no lo hagan a la vez
+        self.cerrojo_compactacion = CerrojoArchivo(ruta_db + ".compactacion.lock")
+        self._pendientes = 0
+        self._leido = 0
+        self._compactar_pendiente = False
+        self._cerrojo = threading.Lock()
+        self._hilo = None
+        self._cerrojo_hilo = threading.Lock()
+        # Group commit: escrituras hechas y cubiertas por un fsync
+        self._grupo = threading.Condition()
+        self._escrituras = 0
+        self._sincronizadas = 0
+        self._sincronizando = False
+
+    def _archivos(self):
+        """
+        Archivos en disco que componen la tabla.
+
+        Returns:
+            tuple: Instantánea, diario y diario viejo.
+        """
+        return (self.ruta_db, self.ruta_diario, self.ruta_diario_viejo)
+
+    def modificado_externamente(self) -> bool:
+        """
+        Indica si los archivos cambiaron por fuera de este almacén.
+
+        Returns:
+            bool: True si la tabla en disco ya no coincide con la memoria.
+        """
+        with self._cerrojo:
+            return super().modificado_externamente()
+
+    def cargar(self) -> dict:
+        """
+        Carga la instantánea y reproduce los diarios pendientes.
+
+        Returns:
+            dict: Registros cargados.
+        """
+        with self.cerrojo.compartido():
+            db = super().cargar()
+            # Un diario viejo indica una compactación en curso o interrumpida;
+            # reproducirlo es inocuo aunque la instantánea ya lo incluya.
+            self._reproducir(self.ruta_diario_viejo, db)
+            aplicados, leido = self._reproducir(self.ruta_diario, db)
+            with self._cerrojo:
+                self._pendientes = aplicados
+                self._leido = leido
+                self._firma = self.firma()
+        return db
+
+    def _reproducir(self, ruta: str, db: dict, desde: int = 0, cambios: dict = None,
+                    convertir: bool = True) -> tuple:
+        """
+        Aplica sobre ``db`` los registros de un diario.
+
+        Solo cuentan los registros terminados en salto de línea. Si aparece
+        uno incompleto o ilegible, el diario se trunca en ese punto para que
+        los siguientes agregados no queden pegados a basura.
+
+        Args:
+            ruta (str): Ruta del diario.
+            db (dict): Tabla sobre la que se aplican los cambios.
+            desde (int): Byte desde el que se lee.
+            cambios (dict, opcional): Si se indica, recibe ID -> registro
+                anterior de cada registro modificado.
+            convertir (bool): Si es False los registros quedan como dict.
+
+        Returns:
+            tuple: (registros aplicados, byte hasta el que el diario es válido).
+        """
+        if not os.path.exists(ruta):
+            return 0, 0
+
+        aplicados = 0
+        valido_hasta = desde
+        with open(ruta, "rb") as f:
+            f.seek(desde)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    break
+                if cambios is not None and registro["id"] not in cambios:
+                    cambios[registro["id"]] = db.get(registro["id"])
+                if registro.get("op") == "del":
+                    db.pop(registro["id"], None)
+                elif convertir:
+                    db[registro["id"]] = self._desde_dict(registro["datos"])
+                else:
+                    db[registro["id"]] = registro["datos"]
+                aplicados += 1
+                valido_hasta += len(linea)
+
+        if valido_hasta < os.path.getsize(ruta):
+            with open(ruta, "r+b") as f:
+                f.truncate(valido_hasta)
+        return aplicados, valido_hasta
+
+    def refrescar(self, db: dict):
+        """
+        Aplica sobre ``db`` solo lo que otros procesos agregaron al diario
+        desde la última lectura.
+
+        Args:
+            db (dict): Tabla en memoria.
+
+        Returns:
+            list or None: Pares (ID, registro anterior o None) de los
+            registros que cambiaron, o None si la instantánea cambió (hubo
+            una compactación) y hay que recargar la tabla completa.
+        """
+        with self.cerrojo.compartido():
+            firma = self.firma()
+            with self._cerrojo:
+                previa, leido = self._firma, self._leido
+            if (previa is None or firma[0] != previa[0] or firma[2] != previa[2]
+                    or firma[1] is None or firma[1][1] < leido):
+                return None
+            cambios = {}
+            aplicados, leido = self._reproducir(self.ruta_diario, db, leido, cambios)
+            with self._cerrojo:
+                self._pendientes += aplicados
+                self._leido = leido
+                self._firma = self.firma()
+                if self._pendientes >= self.umbral_compactacion:
+                    self._compactar_pendiente = True
+        return list(cambios.items())
+
+    def guardar(self, db: dict, ids=()):
+        """
+        Agrega al diario un registro por cada ID modificado. Sin IDs se
+        reescribe la instantánea completa y se vacían los diarios.
+
+        El ``fsync`` y la compactación quedan para ``confirmar``, que se
+        llama después de liberar el cerrojo.
+
+        Args:
+            db (dict): Tabla completa en memoria.
+            ids (iterable): IDs modificados; los ausentes de ``db`` se
+                registran como eliminados.
+        """
+        ids = list(ids)
+        with self.cerrojo.exclusivo():
+            if not ids:
+                self._reemplazar(db)
+                return
+
+            lineas = []
+            for id_registro in ids:
+                if id_registro in db:
+                    registro = {"op": "set", "id": id_registro,
+                                "datos": db[id_registro]}
+                else:
+                    registro = {"op": "del", "id": id_registro}
+                lineas.append(json.dumps(registro, separators=(",", ":"), default=_como_dict))
+            datos = ("\n".join(lineas) + "\n").encode("utf-8")
+
+            firma_previa = self.firma()
+            # Una sola escritura: el lote queda completo o como último
+            # registro incompleto, que la carga descarta.
+            with open(self.ruta_diario, "ab") as f:
+                f.write(datos)
+            with self._cerrojo:
+                # Si la memoria estaba al día, lo recién escrito también lo está
+                if firma_previa == self._firma:
+                    self._leido += len(datos)
+                    self._firma = self.firma()
+                self._pendientes += len(lineas)
+                if self._pendientes >= self.umbral_compactacion:
+                    self._compactar_pendiente = True
+            with self._grupo:
+                self._escrituras += 1
+
+    def _reemplazar(self, db: dict):
+        """
+        Escribe la tabla completa como instantánea y borra los diarios. Debe
+        llamarse con el cerrojo exclusivo tomado.
+
+        Args:
+            db (dict): Tabla completa en memoria.
+        """
+        self._escribir_instantanea(db)
+        for ruta in (self.ruta_diario, self.ruta_diario_viejo):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        with self._cerrojo:
+            self._pendientes = 0
+            self._leido = 0
+            self._firma = self.firma()
+
+    def confirmar(self, db: dict):
+        """
+        Termina las escrituras fuera del cerrojo: hace el ``fsync`` del
+        diario si corresponde y lanza la compactación si se superó el umbral.
+
+        Args:
+            db (dict): Tabla completa en memoria.
+        """
+        if self.sincronizar:
+            self._sincronizar_en_grupo()
+        with self._cerrojo:
+            compactar, self._compactar_pendiente = self._compactar_pendiente, False
+        if compactar:
+            self.compactar(db)
+
+    def _sincronizar_en_grupo(self):
+        """
+        Garantiza que las escrituras hechas hasta ahora estén en disco.
+
+        Si otro hilo ya está haciendo un ``fsync``, se espera a que termine y
+        se comprueba si cubrió las escrituras propias; si no, el primer hilo
+        libre hace uno solo para todo lo acumulado mientras tanto.
+        """
+        with self._grupo:
+            objetivo = self._escrituras
+            while self._sincronizadas < objetivo:
+                if not self._sincronizando:
+                    self._sincronizando = True
+                    break
+                self._grupo.wait()
+            else:
+                return
+            hasta = self._escrituras
+
+        sincronizado = False
+        try:
+            # fsync trabaja sobre el archivo, no sobre el descriptor: cubre
+            # también lo que se escribió con otros descriptores. El diario
+            # viejo se incluye por si una compactación lo acaba de renombrar.
+            for ruta in (self.ruta_diario, self.ruta_diario_viejo):
+                try:
+                    descriptor = os.open(ruta, os.O_RDWR)
+                except FileNotFoundError:
+                    continue
+                try:
+                    os.fsync(descriptor)
+                finally:
+                    os.close(descriptor)
+            sincronizado = True
+        finally:
+            with self._grupo:
+                self._sincronizando = False
+                if sincronizado:
+                    self._sincronizadas = max(self._sincronizadas, hasta)
+                self._grupo.notify_all()
+
+    def compactar(self, db: dict = None):
+        """
+        Vuelca la tabla en la instantánea y vacía el diario.
+
+        El diario actual se renombra a ``.wal.old`` antes de escribir, de modo
+        que los cambios posteriores van a un diario nuevo y nada se pierde si
+        la escritura se interrumpe. Si otro proceso ya está compactando la
+        tabla, no se hace nada.
+
+        Args:
+            db (dict, opcional): Tabla en memoria; se vuelca tal cual si está
+                al día con el disco. Si no, la instantánea se arma leyendo los
+                archivos.
+        """
+        with self._cerrojo_hilo:
+            self.esperar_compactacion()
+            if self.en_segundo_plano:
+                self._hilo = threading.Thread(target=self._compactar, args=(db,), daemon=True)
+                self._hilo.start()
+                return
+        self._compactar(db)
+
+    def _compactar(self, db: dict):
+        """
+        Hace la compactación. El cerrojo de la tabla solo se toma para
+        renombrar el diario y para reemplazar la instantánea; la escritura,
+        que es lo lento, no bloquea a los demás procesos.
+
+        Args:
+            db (dict): Tabla en memoria, o None.
+        """
+        with self.cerrojo_compactacion.exclusivo(esperar=False) as tomado:
+            if not tomado:
+                return
+            with self.cerrojo.exclusivo():
+                with self._cerrojo:
+                    al_dia = self._firma == self.firma()
+                copia = dict(db) if al_dia and db is not None else None
+                # Un diario viejo sin compactador es de una compactación
+                # interrumpida: se completa esa antes de empezar otra
+                renombrar = (not os.path.exists(self.ruta_diario_viejo)
+                             and os.path.exists(self.ruta_diario))
+                if renombrar:
+                    os.replace(self.ruta_diario, self.ruta_diario_viejo)
+                instantanea = self.firma()[0]
+                with self._cerrojo:
+                    self._pendientes = 0
+                    if al_dia:
+                        if renombrar:
+                            self._leido = 0
+                        self._firma = self.firma()
+
+            if copia is None:
+                # Fuera del cerrojo: la instantánea y el diario viejo solo los
+                # cambia quien compacta (o un reemplazo completo, que se
+                # detecta abajo por la firma)
+                try:
+                    copia = self._leer_instantanea()
+                    self._reproducir(self.ruta_diario_viejo, copia, convertir=False)
+                except OSError:
+                    return
+            temporal = self._volcar(copia)
+            with self.cerrojo.exclusivo():
+                firma = self.firma()
+                if firma[0] != instantanea:
+                    # La tabla se reescribió completa mientras tanto
+                    os.remove(temporal)
+                    return
+                os.replace(temporal, self.ruta_db)
+                if os.path.exists(self.ruta_diario_viejo):
+                    os.remove(self.ruta_diario_viejo)
+                with self._cerrojo:
+                    if self._firma == firma:
+                        self._firma = self.firma()
+
+    def esperar_compactacion(self):
+        """
+        Bloquea hasta que termine la compactación en segundo plano, si hay una.
+        """
+        hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            hilo.join()
+
+    def cerrar(self):
+        """
+        Espera a que terminen las escrituras pendientes.
+        """
+        self.esperar_compactacion()
+        self.cerrojo_compactacion.cerrar()
+        super().cerrar()
+
+
+class AlmacenBinario(AlmacenJSON):
+    """
+    Variante del modo JSON que guarda la tabla como instantánea binaria
+    (``db_*.bin`` junto al JSON, ver ``gestor.binario``): la carga no pasa
+    por el analizador JSON y arma los objetos de a uno, sin una copia
+    intermedia de toda la tabla como dict. Cada cambio reescribe el archivo
+    completo, de forma atómica, igual que en el modo JSON.
+    """
+
+    def __init__(self, ruta_db: str, modelo=None, sincronizar: bool = False):
+        """
+        Inicializa el almacén binario.
+
+        Args:
+            ruta_db (str): Ruta al archivo JSON de la tabla; la instantánea
+                binaria usa el mismo nombre con extensión ``.bin``.
+            modelo (type, opcional): Clase de los registros en memoria.
+            sincronizar (bool): Si es True se hace ``fsync`` de cada
+                escritura antes de darla por terminada.
+        """
+        super().__init__(ruta_db, modelo, sincronizar)
+        self.ruta_binaria = os.path.splitext(ruta_db)[0] + ".bin"
+
+    def _archivos(self):
+        """
+        Archivos en disco que componen la tabla.
+
+        Returns:
+            tuple: Ruta de la instantánea binaria.
+        """
+        return (self.ruta_binaria,)
+
+    def cargar(self) -> dict:
+        """
+        Carga la tabla desde la instantánea binaria.
+
+        Returns:
+            dict: Registros cargados o vacío si no existe o está dañada.
+        """
+        with self.cerrojo.compartido():
+            self._firma = self.firma()
+            try:
+                return leer_tabla(self.ruta_binaria, self.modelo.from_dict if self.modelo else None)
+            except ValueError:
+                return {}
+
+    def _leer_instantanea(self) -> dict:
+        """
+        Lee la instantánea binaria sin convertir los registros.
+
+        Returns:
+            dict: Registros serializados, o vacío si no existe o está dañada.
+        """
+        try:
+            return leer_tabla(self.ruta_binaria)
+        except ValueError:
+            return {}
+
+    def _volcar(self, db: dict) -> str:
+        """
+        Escribe la tabla completa en un archivo temporal junto a la
+        instantánea.
+
+        Args:
+            db (dict): Registros a volcar.
+
+        Returns:
+            str: Ruta del temporal, listo para renombrarse sobre la instantánea.
+        """
+        temporal = f"{self.ruta_binaria}.{os.getpid()}.{threading.get_ident()}.tmp"
+        escribir_tabla(temporal, db, self.sincronizar)
+        return temporal
+
+    def _escribir_instantanea(self, db: dict):
+        """
+        Reemplaza la instantánea binaria por la tabla completa de forma
+        atómica.
+
+        Args:
+            db (dict): Registros a volcar.
+        """
+        os.replace(self._volcar(db), self.ruta_binaria)
+
+
+class AlmacenSQLite:
+    """
+    Persistencia de una tabla en una base SQLite compartida
+    (``papilas.sqlite3`` junto al JSON), en modo WAL.
+
+    Cada registro se guarda completo como JSON en la columna ``datos``;
+    además se copian a columnas indexadas las claves foráneas y la fecha,
+    para consultas directas sobre la base. Solo se escriben los registros
+    modificados, en una única transacción.
+
+    SQLite ya coordina a los procesos que escriben la base; el cerrojo de
+    archivo ``<ruta_db>.lock`` se usa igual que en los otros modos, para las
+    transacciones del repositorio (leer el último ID y guardar el alta).
+    La tabla ``cambios`` anota qué IDs tocó cada versión, para que los demás
+    procesos se pongan al día leyendo solo esos registros.
+    """
+
+    NOMBRE_BASE = "papilas.sqlite3"
+    # Versiones de cada tabla que se conservan en ``cambios``
+    RETENCION_CAMBIOS = 1000
+
+    def __init__(self, ruta_db: str, modelo=None, sincronizar: bool = False):
+        """
+        Inicializa el almacén y crea la tabla si no existe.
+
+        Args:
+            ruta_db (str): Ruta del JSON de la tabla; su nombre (sin
+                extensión) se usa como nombre de la tabla SQLite.
+            modelo (type, opcional): Clase de los registros en memoria.
+            sincronizar (bool): Si es True SQLite hace ``fsync`` en cada
+                transacción (``synchronous=FULL``).
+        """
+        self.ruta_db = ruta_db
+        self.modelo = modelo
+        self.ruta_sqlite = os.path.join(os.path.dirname(ruta_db), self.NOMBRE_BASE)
+        self.tabla = os.path.splitext(os.path.basename(ruta_db))[0]
+        self.cerrojo = CerrojoArchivo(ruta_db + ".lock")
+        self._cerrojo = threading.Lock()
+        self._version = None
+        self._conexion = sqlite3.connect(self.ruta_sqlite, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute(f"PRAGMA synchronous={'FULL' if sincronizar else 'NORMAL'}")
+        with self._conexion:
+            self._conexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} ("
+                "id TEXT PRIMARY KEY, datos TEXT NOT NULL, "
+                "id_paciente TEXT, id_diagnostico TEXT, fecha TEXT)"
+            )
+            for columna in ("id_paciente", "id_diagnostico", "fecha"):
+                self._conexion.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.tabla}_{columna} "
+                    f"ON {self.tabla} ({columna})"
+                )
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS versiones "
+                "(tabla TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS cambios "
+                "(tabla TEXT NOT NULL, version INTEGER NOT NULL, id TEXT NOT NULL)"
+            )
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS cambios_tabla_version ON cambios (tabla, version)"
+            )
+
+    def firma(self) -> int:
+        """
+        Obtiene la versión de la tabla, que aumenta con cada escritura.
+
+        Returns:
+            int: Versión actual (0 si nunca se escribió).
+        """
+        fila = self._conexion.execute(
+            "SELECT version FROM versiones WHERE tabla = ?", (self.tabla,)
+        ).fetchone()
+        return fila[0] if fila else 0
+
+    def modificado_externamente(self) -> bool:
+        """
+        Indica si otra conexión escribió la tabla desde la última carga o
+        escritura de este almacén.
+
+        Returns:
+            bool: True si la tabla en disco ya no coincide con la memoria.
+        """
+        with self._cerrojo:
+            return self.firma() != self._version
+
+    def cargar(self) -> dict:
+        """
+        Carga todos los registros de la tabla, en orden de inserción.
+
+        Returns:
+            dict: Registros indexados por ID.
+        """
+        with self._cerrojo:
+            self._version = self.firma()
+            filas = self._conexion.execute(
+                f"SELECT id, datos FROM {self.tabla} ORDER BY rowid"
+            )
+            if self.modelo is None:
+                return {id_registro: json.loads(datos) for id_registro, datos in filas}
+            return {
+                id_registro: self.modelo.from_dict(json.loads(datos))
+                for id_registro, datos in filas
+            }
+
+    @staticmethod
+    def _fila(id_registro: str, registro) -> tuple:
+        """
+        Arma los valores de una fila SQLite a partir de un registro.
+        """
+        datos = _como_dict(registro)
+        return (
+            id_registro,
+            json.dumps(datos, separators=(",", ":")),
+            datos.get("id_paciente"),
+            datos.get("id_diagnostico"),
+            datos.get("fecha") or datos.get("fecha_captura"),
+        )
+
+    def guardar(self, db: dict, ids=()):
+        """
+        Persiste los registros modificados en una sola transacción. Sin IDs
+        se reemplaza la tabla completa.
+
+        Args:
+            db (dict): Tabla completa en memoria.
+            ids (iterable): IDs modificados; los ausentes de ``db`` se borran.
+        """
+        ids = list(ids)
+        completa = not ids
+        with self._cerrojo, self._conexion:
+            if completa:
+                self._conexion.execute(f"DELETE FROM {self.tabla}")
+                ids = list(db)
+            self._conexion.executemany(
+                f"INSERT INTO {self.tabla} (id, datos, id_paciente, id_diagnostico, fecha) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+                "datos = excluded.datos, id_paciente = excluded.id_paciente, "
+                "id_diagnostico = excluded.id_diagnostico, fecha = excluded.fecha",
+                [self._fila(i, db[i]) for i in ids if i in db]
+            )
+            self._conexion.executemany(
+                f"DELETE FROM {self.tabla} WHERE id = ?",
+                [(i,) for i in ids if i not in db]
+            )
+            self._conexion.execute(
+                "INSERT INTO versiones (tabla, version) VALUES (?, 1) "
+                "ON CONFLICT(tabla) DO UPDATE SET version = version + 1",
+                (self.tabla,)
+            )
+            self._version = self.firma()
+            # Un reemplazo completo no se anota: el hueco en las versiones
+            # obliga a los demás procesos a recargar la tabla
+            if not completa:
+                self._conexion.executemany(
+                    "INSERT INTO cambios (tabla, version, id) VALUES (?, ?, ?)",
+                    [(self.tabla, self._version, i) for i in ids]
+                )
+            self._conexion.execute(
+                "DELETE FROM cambios WHERE tabla = ? AND version <= ?",
+                (self.tabla, self._version - self.RETENCION_CAMBIOS)
+            )
+
+    def refrescar(self, db: dict):
+        """
+        Aplica sobre ``db`` los registros que otras conexiones modificaron
+        desde la última lectura, según la tabla ``cambios``.
+
+        Args:
+            db (dict): Tabla en memoria.
+
+        Returns:
+            list or None: Pares (ID, registro anterior o None) de los
+            registros que cambiaron, o None si faltan versiones en
+            ``cambios`` y hay que recargar la tabla completa.
+        """
+        with self._cerrojo:
+            actual = self.firma()
+            if self._version is None or actual < self._version:
+                return None
+            filas = self._conexion.execute(
+                "SELECT version, id FROM cambios WHERE tabla = ? AND version > ? AND version <= ?",
+                (self.tabla, self._version, actual)
+            ).fetchall()
+            if len({version for version, _ in filas}) != actual - self._version:
+                return None
+
+            ids = list(dict.fromkeys(id_registro for _, id_registro in filas))
+            datos = {}
+            for inicio in range(0, len(ids), 500):
+                bloque = ids[inicio:inicio + 500]
+                datos.update(self._conexion.execute(
+                    f"SELECT id, datos FROM {self.tabla} "
+                    f"WHERE id IN ({', '.join('?' * len(bloque))})", bloque
+                ))
+            cambios = []
+            for id_registro in ids:
+                cambios.append((id_registro, db.get(id_registro)))
+                if id_registro in datos:
+                    registro = json.loads(datos[id_registro])
+                    db[id_registro] = self.modelo.from_dict(registro) if self.modelo else registro
+                else:
+                    db.pop(id_registro, None)
+            self._version = actual
+        return cambios
+
+    def confirmar(self, db: dict):
+        """
+        No hace nada: la transacción de ``guardar`` ya quedó confirmada.
+        """
+
+    def cerrar(self):
+        """
+        Cierra la conexión con la base.
+        """
+        with self._cerrojo:
+            self._conexion.close()
+        self.cerrojo.cerrar()
+
+
+MODOS_ALMACEN = {
+    "json": AlmacenJSON,
+    "diario": AlmacenDiario,
+    "binario": AlmacenBinario,
+    "sqlite": AlmacenSQLite,
+}
+
+
+def crear_almacen(ruta_db: str, modo: str = "json", modelo=None, sincronizar: bool = False):
+    """
+    Crea el almacén correspondiente al modo de persistencia indicado.
+
+    Args:
+        ruta_db (str): Ruta al archivo JSON de la tabla.
+        modo (str): "json" (reescritura completa), "diario" (write-ahead log),
+            "binario" (instantánea binaria) o "sqlite" (base SQLite
+            compartida).
+        modelo (type, opcional): Clase de los registros en memoria.
+        sincronizar (bool): Si es True cada escritura se fuerza a disco.
+
+    Returns:
+        AlmacenJSON: Almacén listo para usar.
+    """
+    if modo not in MODOS_ALMACEN:
+        raise ValueError(f"Modo de almacenamiento desconocido: {modo}")
+    return MODOS_ALMACEN[modo](ruta_db, modelo, sincronizar=sincronizar)
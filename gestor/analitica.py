@@ -0,0 +1,263 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él no hay estadísticas
+    np = None
+
+MEDIDAS = ("dioptria_1", "dioptria_2", "astigmatismo")
+DIMENSIONES = ("tipo", "edad", "genero", "mes")
+BANDAS_EDAD = (0, 18, 40, 60, 80)
+ETIQUETAS_EDAD = ("0-17", "18-39", "40-59", "60-79", "80+")
+DESCONOCIDO = "?"
+
+
+def _a_numero(valor) -> float:
+    """
+    Convierte una medida o una edad a float; los valores vacíos o inválidos
+    (hay diagnósticos cargados con "") pasan a NaN y se excluyen de los
+    cálculos.
+    """
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class AnaliticaDiagnosticos:
+    """
+    Estadísticas de refracción sobre todos los diagnósticos, calculadas en
+    forma vectorizada con NumPy.
+
+    Las tablas de diagnósticos y pacientes se convierten una vez a columnas
+    (arreglos) unidas por ID de paciente. Las columnas quedan en caché y se
+    reconstruyen solo cuando alguna de las dos tablas cambia.
+    """
+
+    def __init__(self, gestor_diagnosticos, gestor_pacientes):
+        """
+        Inicializa el motor de análisis.
+
+        Args:
+            gestor_diagnosticos (GestorDiagnosticos): Fuente de diagnósticos.
+            gestor_pacientes (GestorPacientes): Fuente de pacientes.
+        """
+        self.gestor_diagnosticos = gestor_diagnosticos
+        self.gestor_pacientes = gestor_pacientes
+        self._cache = None
+        self._version = None
+
+    @staticmethod
+    def disponible() -> bool:
+        """
+        Indica si se pueden calcular estadísticas (requiere NumPy).
+
+        Returns:
+            bool: True si NumPy está instalado.
+        """
+        return np is not None
+
+    def _version_actual(self) -> tuple:
+        """
+        Versión combinada de las dos tablas de origen.
+
+        Returns:
+            tuple: (versión de diagnósticos, versión de pacientes).
+        """
+        gd = self.gestor_diagnosticos
+        gp = self.gestor_pacientes
+        return (gd.repositorio.version(gd.ruta_db), gp.repositorio.version(gp.ruta_db))
+
+    def columnas(self) -> dict:
+        """
+        Devuelve las columnas de análisis, reconstruyéndolas si las tablas
+        cambiaron desde la última vez.
+
+        Returns:
+            dict: Arreglos de medidas y, para cada dimensión, una tupla
+            (códigos por diagnóstico, etiquetas).
+        """
+        if np is None:
+            raise RuntimeError("Las estadísticas requieren NumPy (pip install numpy).")
+        version = self._version_actual()
+        if self._cache is None or self._version != version:
+            self._cache = self._construir_columnas()
+            self._version = version
+        return self._cache
+
+    def _construir_columnas(self) -> dict:
+        """
+        Convierte las tablas en columnas y las une por ID de paciente.
+
+        Returns:
+            dict: Columnas de análisis (ver ``columnas``).
+        """
+        diagnosticos = list(self.gestor_diagnosticos.db.values())
+        pacientes = list(self.gestor_pacientes.db.values())
+        n = len(diagnosticos)
+
+        columnas = {
+            medida: np.fromiter((_a_numero(getattr(d, medida)) for d in diagnosticos),
+                                dtype=np.float64, count=n)
+            for medida in MEDIDAS
+        }
+        columnas["tipo"] = self._codificar(d.tipo for d in diagnosticos)
+        columnas["mes"] = self._codificar((d.fecha or "")[:7] or DESCONOCIDO for d in diagnosticos)
+
+        # Unión por ID de paciente: cada diagnóstico apunta a la fila de su
+        # paciente; la fila extra al final representa "paciente inexistente".
+        fila_paciente = {p.id: i for i, p in enumerate(pacientes)}
+        indice = np.fromiter(
+            (fila_paciente.get(d.id_paciente, len(pacientes)) for d in diagnosticos),
+            dtype=np.int64, count=n
+        )
+        edades = np.append(
+            np.fromiter((_a_numero(p.edad) for p in pacientes), dtype=np.float64, count=len(pacientes)),
+            np.nan
+        )[indice]
+        # Las edades negativas (que la carga no rechaza) quedarían en la
+        # banda -1; van a "?" como las faltantes
+        bandas = np.digitize(edades, BANDAS_EDAD) - 1
+        bandas[(bandas < 0) | np.isnan(edades)] = len(ETIQUETAS_EDAD)
+        columnas["edad"] = (bandas, ETIQUETAS_EDAD + (DESCONOCIDO,))
+
+        codigos_genero, etiquetas_genero = self._codificar(p.genero for p in pacientes)
+        codigos_genero = np.append(codigos_genero, len(etiquetas_genero))
+        columnas["genero"] = (codigos_genero[indice], etiquetas_genero + (DESCONOCIDO,))
+        return columnas
+
+    @staticmethod
+    def _codificar(valores) -> tuple:
+        """
+        Convierte valores categóricos en códigos enteros.
+
+        Args:
+            valores (iterable): Valores de cada fila.
+
+        Returns:
+            tuple: (arreglo de códigos, etiquetas ordenadas).
+        """
+        etiquetas, codigos = np.unique(np.array(list(valores), dtype=object).astype(str),
+                                       return_inverse=True)
+        return codigos.reshape(-1), tuple(etiquetas.tolist())
+
+    def _grupos(self, columnas: dict, por) -> tuple:
+        """
+        Combina una o varias dimensiones en un único código de grupo.
+
+        Args:
+            columnas (dict): Columnas de análisis.
+            por (str or tuple): Dimensión o dimensiones de agrupamiento.
+
+        Returns:
+            tuple: (código de grupo por fila, función código -> etiqueta).
+        """
+        if isinstance(por, str):
+            por = (por,)
+        for dimension in por:
+            if dimension not in DIMENSIONES:
+                raise ValueError(f"Dimensión desconocida: {dimension}")
+
+        n = len(columnas["tipo"][0])
+        codigo = np.zeros(n, dtype=np.int64)
+        tamanos = []
+        for dimension in por:
+            codigos, etiquetas = columnas[dimension]
+            codigo = codigo * len(etiquetas) + codigos
+            tamanos.append(len(etiquetas))
+
+        def etiqueta(valor):
+            partes = np.unravel_index(valor, tamanos) if tamanos else ()
+            nombres = [columnas[d][1][int(p)] for d, p in zip(por, partes)]
+            return nombres[0] if len(nombres) == 1 else tuple(nombres)
+
+        return codigo, etiqueta
+
+    def agrupar(self, por="tipo", medidas=MEDIDAS, percentiles=(25, 50, 75)) -> dict:
+        """
+        Calcula cantidad, media, desvío y percentiles de cada medida por grupo.
+
+        Args:
+            por (str or tuple): "tipo", "edad", "genero", "mes" o una tupla
+                de ellas (por ejemplo ("edad", "tipo")).
+            medidas (tuple): Medidas a resumir.
+            percentiles (tuple): Percentiles a calcular (0 a 100).
+
+        Returns:
+            dict: {grupo: {medida: {"n", "media", "desvio", "p25", ...}}}.
+            Las medidas vacías no se cuentan.
+        """
+        columnas = self.columnas()
+        codigo, etiqueta = self._grupos(columnas, por)
+        resultado = {}
+        if len(codigo) == 0:
+            return resultado
+
+        q = np.asarray(percentiles, dtype=np.float64) / 100.0
+        for medida in medidas:
+            valida = ~np.isnan(columnas[medida])
+            valores = columnas[medida][valida]
+            codigo_medida = codigo[valida]
+            if len(valores) == 0:
+                continue
+            # Orden por grupo y, dentro de cada grupo, por valor: las medias
+            # salen de sumas por tramos y los percentiles de posiciones.
+            orden = np.lexsort((valores, codigo_medida))
+            grupos, inicios, cantidades = np.unique(codigo_medida[orden], return_index=True,
+                                                     return_counts=True)
+            ordenados = valores[orden]
+            sumas = np.add.reduceat(ordenados, inicios)
+            cuadrados = np.add.reduceat(ordenados ** 2, inicios)
+            medias = sumas / cantidades
+            desvios = np.sqrt(np.maximum(cuadrados / cantidades - medias ** 2, 0.0))
+
+            posiciones = inicios[:, None] + (cantidades[:, None] - 1) * q[None, :]
+            bajo = np.floor(posiciones).astype(np.int64)
+            alto = np.ceil(posiciones).astype(np.int64)
+            fraccion = posiciones - bajo
+            valores_p = ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * fraccion
+
+            for i, grupo in enumerate(grupos):
+                resumen = {
+                    "n": int(cantidades[i]),
+                    "media": float(medias[i]),
+                    "desvio": float(desvios[i]),
+                }
+                for p, valor in zip(percentiles, valores_p[i]):
+                    resumen[f"p{p:g}"] = float(valor)
+                resultado.setdefault(etiqueta(grupo), {})[medida] = resumen
+        return resultado
+
+    def histograma(self, medida: str, por=None, bins: int = 20) -> dict:
+        """
+        Calcula histogramas de una medida, con los mismos bordes para todos
+        los grupos de modo que sean comparables.
+
+        Args:
+            medida (str): "dioptria_1", "dioptria_2" o "astigmatismo".
+            por (str or tuple, opcional): Dimensiones de agrupamiento; sin
+                ellas se devuelve un único histograma bajo la clave "total".
+            bins (int): Cantidad de intervalos.
+
+        Returns:
+            dict: {grupo: {"conteos": [...], "bordes": [...]}}.
+        """
+        columnas = self.columnas()
+        valida = ~np.isnan(columnas[medida])
+        valores = columnas[medida][valida]
+        if len(valores) == 0:
+            return {}
+        bordes = np.histogram_bin_edges(valores, bins=bins)
+        if por is None:
+            conteos, _ = np.histogram(valores, bins=bordes)
+            return {"total": {"conteos": conteos.tolist(), "bordes": bordes.tolist()}}
+
+        codigo, etiqueta = self._grupos(columnas, por)
+        codigo = codigo[valida]
+        # Un único bincount 2D: (grupo, intervalo) -> cantidad
+        intervalo = np.clip(np.searchsorted(bordes, valores, side="right") - 1, 0, bins - 1)
+        grupos, inversa = np.unique(codigo, return_inverse=True)
+        conteos = np.bincount(inversa.reshape(-1) * bins + intervalo,
+                              minlength=len(grupos) * bins).reshape(len(grupos), bins)
+        return {
+            etiqueta(grupo): {"conteos": conteos[i].tolist(), "bordes": bordes.tolist()}
+            for i, grupo in enumerate(grupos)
+        }
@@ -0,0 +1,428 @@
+"""
+Instantánea binaria de una tabla, alternativa al JSON: se carga sin pasar
+por el analizador JSON y un registro suelto se lee con ``mmap`` sin leer el
+resto del archivo.
+
+Estructura del archivo (little-endian, secciones alineadas a 8 bytes):
+
+    cabecera        magia, versión, cantidades y desplazamientos
+    esquema         JSON con el nombre y el tipo de cada columna
+    columnas        un valor de ancho fijo por registro y columna:
+                    "entero" (int64), "real" (float64) o el número de un
+                    texto (uint32) para "texto" y "json"
+    índice          números de registro ordenados por ID (uint32)
+    desplazamientos inicio de cada texto (uint64)
+    textos          textos UTF-8 sin repetir, separados por NUL
+
+Las columnas "json" guardan como texto JSON los valores que no entran en
+las otras (None, booleanos, tipos mezclados, incluso enteros con reales);
+un registro sin la clave guarda ``AUSENTE``.
+"""
+import gc
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate, repeat
+
+# magia, versión, banderas, largo del esquema, registros, textos e inicio
+# del índice, de los desplazamientos, de los textos y del final del archivo
+CABECERA = struct.Struct("<8sHHI6Q")
+MAGIA = b"PAPTABLA"
+VERSION = 1
+# Algún texto contiene NUL: no se pueden separar todos de una vez
+CON_NUL = 1
+AUSENTE = 0xFFFFFFFF
+
+FORMATOS = {"entero": "q", "real": "d", "texto": "I", "json": "I"}
+POSICION = struct.Struct("<I")
+DESPLAZAMIENTO = struct.Struct("<Q")
+TRAMO = struct.Struct("<QQ")
+ENTERO_MAXIMO = 2 ** 63
+
+# Marca de una clave que falta en el registro (distinta de None)
+_FALTA = object()
+
+
+def _alineado(posicion: int) -> int:
+    return (posicion + 7) & ~7
+
+
+def _a_bytes(valores: array) -> bytes:
+    if sys.byteorder == "big":
+        valores.byteswap()
+    return valores.tobytes()
+
+
+def _desde_bytes(formato: str, datos: bytes) -> list:
+    valores = array(formato)
+    valores.frombytes(datos)
+    if sys.byteorder == "big":
+        valores.byteswap()
+    return valores.tolist()
+
+
+def _tipo_columna(valores: list) -> str:
+    """
+    Elige el tipo de una columna: entero, real o texto si todos los valores
+    son de ese tipo y JSON en cualquier otro caso. Una columna con enteros
+    y reales (dioptrías como -2 y -2.25) va como JSON para que los enteros
+    se lean como enteros.
+    """
+    tipos = set(map(type, valores))
+    if tipos == {int}:
+        if all(-ENTERO_MAXIMO <= v < ENTERO_MAXIMO for v in valores):
+            return "entero"
+        return "json"
+    if tipos == {float}:
+        return "real"
+    if tipos == {str}:
+        return "texto"
+    return "json"
+
+
+def _numeros_json(valores: list, textos: dict) -> list:
+    """
+    Codifica una columna JSON: cada valor pasa a ser el número de su texto
+    JSON en ``textos`` (que se completa) o ``AUSENTE``. Los escalares se
+    codifican una sola vez por valor distinto; la clave lleva el tipo y el
+    signo, porque 2 == 2.0 y 0.0 == -0.0 pero JSON los escribe distinto.
+
+    Args:
+        valores (list): Valores de la columna.
+        textos (dict): Texto -> número, compartido por todas las columnas.
+
+    Returns:
+        list: Números de texto.
+    """
+    codigos = {}
+    numeros = []
+    for valor in valores:
+        if valor is _FALTA:
+            numeros.append(AUSENTE)
+            continue
+        tipo = type(valor)
+        if tipo is float:
+            clave = (tipo, valor, math.copysign(1.0, valor)) if valor == valor else None
+        elif tipo in (int, bool, str) or valor is None:
+            clave = (tipo, valor)
+        else:
+            clave = None
+        numero = codigos.get(clave) if clave is not None else None
+        if numero is None:
+            numero = textos.setdefault(json.dumps(valor, ensure_ascii=False), len(textos))
+            if clave is not None:
+                codigos[clave] = numero
+        numeros.append(numero)
+    return numeros
+
+
+def _columnas(registros) -> dict:
+    """
+    Reparte los registros en columnas, en el orden en que aparecen las
+    claves. A los registros sin alguna clave se les pone ``_FALTA``.
+
+    Returns:
+        tuple: (cantidad de registros, dict nombre -> lista de valores).
+    """
+    columnas = {}
+    cantidad = 0
+    for registro in registros:
+        datos = registro if isinstance(registro, dict) else registro.to_dict()
+        for clave, valor in datos.items():
+            columna = columnas.get(clave)
+            if columna is None:
+                columna = columnas[clave] = [_FALTA] * cantidad
+            columna.append(valor)
+        cantidad += 1
+        if len(datos) < len(columnas):
+            for columna in columnas.values():
+                if len(columna) < cantidad:
+                    columna.append(_FALTA)
+    return cantidad, columnas
+
+
+def escribir_tabla(ruta: str, db: dict, sincronizar: bool = False):
+    """
+    Escribe una tabla completa en formato binario.
+
+    Args:
+        ruta (str): Archivo de destino (se sobrescribe).
+        db (dict): Registros (objetos del modelo o dict) indexados por ID.
+        sincronizar (bool): Si es True se hace ``fsync`` antes de cerrar.
+    """
+    cantidad, columnas = _columnas(db.values())
+    textos = {}
+    esquema = []
+    partes = []
+    for nombre, valores in columnas.items():
+        tipo = _tipo_columna(valores)
+        if tipo == "texto":
+            numeros = [textos.setdefault(v, len(textos)) for v in valores]
+        elif tipo == "json":
+            numeros = _numeros_json(valores, textos)
+        else:
+            numeros = valores
+        esquema.append([nombre, tipo])
+        partes.append(_a_bytes(array(FORMATOS[tipo], numeros)))
+
+    ids = columnas.get("id")
+    if ids is not None and _tipo_columna(ids) == "texto":
+        indice = sorted(range(cantidad), key=ids.__getitem__)
+    else:
+        indice = []
+
+    lista = list(textos)
+    junto = "\x00".join(lista)
+    datos = junto.encode("utf-8", "surrogatepass")
+    banderas = CON_NUL if junto.count("\x00") > max(0, len(lista) - 1) else 0
+    if len(datos) == len(junto):
+        largos = (len(texto) + 1 for texto in lista)
+    else:
+        largos = (len(texto.encode("utf-8", "surrogatepass")) + 1 for texto in lista)
+    desplazamientos = array("Q", [0])
+    desplazamientos.extend(accumulate(largos))
+
+    esquema = json.dumps(esquema, ensure_ascii=False).encode("utf-8")
+    with open(ruta, "wb") as f:
+        def escribir_seccion(contenido: bytes) -> int:
+            inicio = f.tell()
+            f.write(contenido)
+            f.write(bytes(_alineado(f.tell()) - f.tell()))
+            return inicio
+
+        f.write(bytes(CABECERA.size))
+        escribir_seccion(esquema)
+        for parte in partes:
+            escribir_seccion(parte)
+        inicio_indice = escribir_seccion(_a_bytes(array("I", indice)))
+        inicio_desplazamientos = escribir_seccion(_a_bytes(desplazamientos))
+        inicio_textos = escribir_seccion(datos)
+        fin = f.tell()
+        f.seek(0)
+        f.write(CABECERA.pack(MAGIA, VERSION, banderas, len(esquema), cantidad, len(lista),
+                              inicio_indice, inicio_desplazamientos, inicio_textos, fin))
+        if sincronizar:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class TablaBinaria:
+    """
+    Lector de una tabla en formato binario, proyectada en memoria con
+    ``mmap``: abrirla solo lee la cabecera y el esquema, ``buscar`` lee las
+    pocas páginas del índice y del registro pedido, y ``registros``
+    decodifica la tabla completa por columnas.
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Abre la tabla.
+
+        Args:
+            ruta (str): Archivo de la tabla.
+
+        Raises:
+            ValueError: Si el archivo no es una tabla binaria o está
+                incompleto.
+        """
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            if os.fstat(f.fileno()).st_size < CABECERA.size:
+                raise ValueError(f"{ruta} no es una tabla binaria válida.")
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magia, version, banderas, largo_esquema, self._cantidad, self._cantidad_textos,
+         self._inicio_indice, self._inicio_desplazamientos, self._inicio_textos,
+         fin) = self._leer(CABECERA, 0)
+        if magia != MAGIA or version != VERSION or fin != len(self._mapa):
+            self._mapa.close()
+            raise ValueError(f"{ruta} no es una tabla binaria válida o está incompleta.")
+        self._con_nul = bool(banderas & CON_NUL)
+
+        esquema = json.loads(self._mapa[CABECERA.size:CABECERA.size + largo_esquema])
+        # (nombre, tipo, formato de struct, inicio) de cada columna
+        self._columnas = []
+        inicio = _alineado(CABECERA.size + largo_esquema)
+        for nombre, tipo in esquema:
+            formato = struct.Struct("<" + FORMATOS[tipo])
+            self._columnas.append((nombre, tipo, formato, inicio))
+            inicio = _alineado(inicio + formato.size * self._cantidad)
+        self._columna_id = next((c for c in self._columnas if c[0] == "id" and c[1] == "texto"), None)
+
+    def __len__(self) -> int:
+        return self._cantidad
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+    @property
+    def columnas(self) -> list:
+        """
+        Nombres y tipos de las columnas.
+
+        Returns:
+            list: Pares (nombre, tipo).
+        """
+        return [(nombre, tipo) for nombre, tipo, _, _ in self._columnas]
+
+    def _leer(self, formato: struct.Struct, inicio: int) -> tuple:
+        # Todas las lecturas son cortes del mapa, que ``gestor.metricas``
+        # puede contar
+        return formato.unpack(self._mapa[inicio:inicio + formato.size])
+
+    def _texto(self, numero: int) -> str:
+        inicio, siguiente = self._leer(TRAMO, self._inicio_desplazamientos + 8 * numero)
+        datos = self._mapa[self._inicio_textos + inicio:self._inicio_textos + siguiente - 1]
+        return datos.decode("utf-8", "surrogatepass")
+
+    def _valor(self, columna: tuple, posicion: int):
+        _, tipo, formato, inicio = columna
+        valor = self._leer(formato, inicio + formato.size * posicion)[0]
+        if tipo == "texto":
+            return self._texto(valor)
+        if tipo == "json":
+            return _FALTA if valor == AUSENTE else json.loads(self._texto(valor))
+        return valor
+
+    def registro(self, posicion: int) -> dict:
+        """
+        Lee un registro por su posición en el archivo.
+
+        Args:
+            posicion (int): Número de registro, desde 0.
+
+        Returns:
+            dict: Registro.
+        """
+        if not 0 <= posicion < self._cantidad:
+            raise IndexError(f"No existe el registro número {posicion}.")
+        registro = {}
+        for columna in self._columnas:
+            valor = self._valor(columna, posicion)
+            if valor is not _FALTA:
+                registro[columna[0]] = valor
+        return registro
+
+    def buscar(self, id_registro: str):
+        """
+        Busca un registro por ID con una búsqueda binaria sobre el índice.
+
+        Args:
+            id_registro (str): ID buscado.
+
+        Returns:
+            dict or None: Registro, o None si no existe.
+        """
+        if self._columna_id is None:
+            return None
+        izquierda, derecha = 0, self._cantidad
+        while izquierda < derecha:
+            medio = (izquierda + derecha) // 2
+            posicion = self._leer(POSICION, self._inicio_indice + 4 * medio)[0]
+            actual = self._valor(self._columna_id, posicion)
+            if actual == id_registro:
+                return self.registro(posicion)
+            if actual < id_registro:
+                izquierda = medio + 1
+            else:
+                derecha = medio
+        return None
+
+    def _todos_los_textos(self) -> list:
+        if self._con_nul:
+            return [self._texto(numero) for numero in range(self._cantidad_textos)]
+        if not self._cantidad_textos:
+            return []
+        fin = self._leer(DESPLAZAMIENTO, self._inicio_desplazamientos + 8 * self._cantidad_textos)[0]
+        datos = self._mapa[self._inicio_textos:self._inicio_textos + fin - 1]
+        return datos.decode("utf-8", "surrogatepass").split("\x00")
+
+    def registros(self):
+        """
+        Recorre todos los registros en el orden en que se escribieron,
+        decodificando cada columna de una sola vez.
+
+        Returns:
+            iterator: Registros (dict).
+        """
+        textos = self._todos_los_textos()
+        nombres = []
+        listas = []
+        faltantes = False
+        for nombre, tipo, formato, inicio in self._columnas:
+            valores = _desde_bytes(formato.format[1:],
+                                   self._mapa[inicio:inicio + formato.size * self._cantidad])
+            if tipo == "texto":
+                valores = list(map(textos.__getitem__, valores))
+            elif tipo == "json":
+                valores = _decodificar_json(textos, valores)
+                faltantes = faltantes or _FALTA in valores
+            nombres.append(nombre)
+            listas.append(valores)
+
+        if faltantes:
+            return ({nombre: valor for nombre, valor in zip(nombres, fila) if valor is not _FALTA}
+                    for fila in zip(*listas))
+        # Sin claves faltantes los dict se arman sin pasar por código Python
+        return map(dict, map(zip, repeat(nombres), zip(*listas)))
+
+    def cerrar(self):
+        """
+        Libera la proyección del archivo.
+        """
+        self._mapa.close()
+
+
+def _decodificar_json(textos: list, numeros: list) -> list:
+    """
+    Decodifica una columna JSON. Los valores distintos suelen ser pocos, así
+    que se decodifica cada uno una sola vez; las listas y los dict se
+    decodifican por registro para que no queden compartidos.
+    """
+    distintos = {numero: json.loads(textos[numero]) for numero in set(numeros) if numero != AUSENTE}
+    if any(isinstance(valor, (list, dict)) for valor in distintos.values()):
+        return [_FALTA if numero == AUSENTE else json.loads(textos[numero]) for numero in numeros]
+    distintos[AUSENTE] = _FALTA
+    return list(map(distintos.__getitem__, numeros))
+
+
+def leer_tabla(ruta: str, convertir=None) -> dict:
+    """
+    Lee una tabla binaria completa.
+
+    Args:
+        ruta (str): Archivo de la tabla.
+        convertir (callable, opcional): Recibe cada registro (dict) y
+            devuelve el objeto a guardar en la tabla (por ejemplo
+            ``Paciente.from_dict``).
+
+    Returns:
+        dict: Registros indexados por ID, o vacío si el archivo no existe.
+
+    Raises:
+        ValueError: Si el archivo no es una tabla binaria válida.
+    """
+    if not os.path.exists(ruta):
+        return {}
+    # Con millones de objetos nuevos el recolector de ciclos recorre la
+    # tabla una y otra vez sin encontrar nada que liberar
+    recolector = gc.isenabled()
+    gc.disable()
+    try:
+        with TablaBinaria(ruta) as tabla:
+            if convertir is None:
+                return {registro["id"]: registro for registro in tabla.registros()}
+            tabla_en_memoria = {}
+            for objeto in map(convertir, tabla.registros()):
+                # La clave reutiliza el ID del objeto: una sola cadena por registro
+                tabla_en_memoria[objeto.id] = objeto
+            return tabla_en_memoria
+    finally:
+        if recolector:
+            gc.enable()
@@ -0,0 +1,140 @@
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class CerrojoArchivo:
+    """
+    Cerrojo consultivo (advisory lock) sobre un archivo auxiliar, para que
+    varios procesos que trabajan sobre la misma carpeta ``data/`` no
+    escriban una tabla a la vez.
+
+    Dentro de un proceso también excluye a los demás hilos, y es reentrante:
+    un hilo que ya lo tiene puede volver a tomarlo. En POSIX se usa
+    ``fcntl.flock``, con modo compartido para lecturas y exclusivo para
+    escrituras; en Windows ``msvcrt.locking``, que siempre es exclusivo.
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Inicializa el cerrojo sin tomarlo.
+
+        Args:
+            ruta (str): Archivo de cerrojo; se crea vacío si no existe.
+        """
+        self.ruta = ruta
+        self._hilos = threading.RLock()
+        self._dueno = None
+        self._profundidad = 0
+        self._exclusivo = False
+        self._descriptor = None
+        self._pid = None
+
+    def _abrir(self) -> int:
+        # Un proceso hijo creado con fork hereda el descriptor, y flock no
+        # distingue entre procesos que comparten descriptor: se reabre.
+        if self._descriptor is None or self._pid != os.getpid():
+            self._descriptor = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._descriptor
+
+    def _bloquear(self, exclusivo: bool, esperar: bool) -> bool:
+        descriptor = self._abrir()
+        if fcntl is not None:
+            modo = fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH
+            try:
+                fcntl.flock(descriptor, modo if esperar else modo | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+
+        os.lseek(descriptor, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(descriptor, msvcrt.LK_LOCK if esperar else msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                # LK_LOCK se rinde tras unos diez intentos: se sigue esperando
+                if not esperar:
+                    return False
+
+    def _liberar(self):
+        if fcntl is not None:
+            fcntl.flock(self._descriptor, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._descriptor, 0, os.SEEK_SET)
+            msvcrt.locking(self._descriptor, msvcrt.LK_UNLCK, 1)
+
+    @contextlib.contextmanager
+    def _tomar(self, exclusivo: bool, esperar: bool = True):
+        if not self._hilos.acquire(blocking=esperar):
+            yield False
+            return
+        try:
+            if self._profundidad == 0:
+                if not self._bloquear(exclusivo, esperar):
+                    yield False
+                    return
+                self._exclusivo = exclusivo or fcntl is None
+            elif exclusivo and not self._exclusivo:
+                # Se promueve el cerrojo compartido que ya tiene este hilo
+                self._bloquear(True, True)
+                self._exclusivo = True
+            self._profundidad += 1
+            self._dueno = threading.get_ident()
+            try:
+                yield True
+            finally:
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    self._dueno = None
+                    self._liberar()
+        finally:
+            self._hilos.release()
+
+    def compartido(self):
+        """
+        Toma el cerrojo para leer: otros procesos pueden leer a la vez, pero
+        ninguno escribir.
+
+        Returns:
+            contextmanager: Se usa con ``with``.
+        """
+        return self._tomar(False)
+
+    def exclusivo(self, esperar: bool = True):
+        """
+        Toma el cerrojo para escribir.
+
+        Args:
+            esperar (bool): Si es False no se bloquea cuando otro lo tiene.
+
+        Returns:
+            contextmanager: Se usa con ``with``; entrega True si se tomó el
+            cerrojo y False si estaba ocupado y no se quiso esperar.
+        """
+        return self._tomar(True, esperar)
+
+    def retenido(self) -> bool:
+        """
+        Indica si el hilo actual tiene el cerrojo.
+
+        Returns:
+            bool: True si el hilo está dentro de un ``with`` del cerrojo.
+        """
+        return self._dueno == threading.get_ident()
+
+    def cerrar(self):
+        """
+        Cierra el archivo de cerrojo (no debe estar tomado).
+        """
+        with self._hilos:
+            if self._descriptor is not None and self._pid == os.getpid():
+                os.close(self._descriptor)
+            self._descriptor = None
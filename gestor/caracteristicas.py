@@ -0,0 +1,491 @@
+"""
+Características cuantitativas de las capturas de fondo de ojo: histogramas
+de intensidad, ubicación y tamaño aproximados de la papila (disco óptico) y
+medidas de calidad (nitidez, contraste, exposición).
+
+Se calculan una sola vez por contenido y se guardan en una caché binaria de
+registros de tamaño fijo, indexada por el SHA-256 del archivo.
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from gestor.bloqueo import CerrojoArchivo
+from gestor.ingesta import procesar_en_paralelo
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # NumPy y Pillow son opcionales: sin ellos no hay características
+    np = Image = None
+
+# Lado máximo al que se reduce la imagen antes de analizarla: la papila y
+# las medidas de calidad no necesitan la resolución completa
+LADO_ANALISIS = 512
+BINS_LUMINANCIA = 32
+BINS_CANAL = 16
+# Luminancia por debajo de la cual un píxel es el borde negro de la captura
+UMBRAL_FONDO = 15
+
+CABECERA = struct.Struct("<8sHH")
+MAGIA = b"PAPCARAC"
+VERSION = 1
+# sha256, ancho, alto, 8 medidas y los histogramas cuantizados a 16 bits
+REGISTRO = struct.Struct(f"<32sHH8f{BINS_LUMINANCIA + 3 * BINS_CANAL}H")
+MEDIDAS = ("disco_x", "disco_y", "disco_radio", "nitidez", "contraste", "brillo",
+           "saturacion", "cobertura")
+
+
+def disponible() -> bool:
+    """
+    Indica si se pueden calcular características (requiere NumPy y Pillow).
+
+    Returns:
+        bool: True si ambas bibliotecas están instaladas.
+    """
+    return np is not None
+
+
+def _histograma(valores, bins: int) -> list:
+    cuentas = np.histogram(valores, bins=bins, range=(0, 256))[0]
+    return (cuentas / max(1, len(valores))).tolist()
+
+
+def _ubicar_disco(luminancia, mascara) -> tuple:
+    """
+    Ubica la papila como la zona más brillante de la retina: se promedia la
+    luminancia en ventanas cuadradas (con una imagen integral) y se toma la
+    de mayor promedio. El radio sale del área alrededor del centro que
+    supera el punto medio entre ese máximo y el brillo típico de la retina.
+
+    Returns:
+        tuple: (x, y, radio), relativos al ancho y alto de la imagen.
+    """
+    alto, ancho = luminancia.shape
+    lado = max(3, min(alto, ancho) // 16)
+    integral = np.pad(luminancia, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+    cubierta = np.pad(mascara.astype(np.float64), ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+
+    def sumar_ventanas(tabla):
+        return tabla[lado:, lado:] - tabla[:-lado, lado:] - tabla[lado:, :-lado] + tabla[:-lado, :-lado]
+
+    promedios = sumar_ventanas(integral) / (lado * lado)
+    # Las ventanas que tocan el borde negro no cuentan
+    promedios[sumar_ventanas(cubierta) < 0.9 * lado * lado] = 0
+    fila, columna = np.unravel_index(np.argmax(promedios), promedios.shape)
+    pico = promedios[fila, columna]
+    fondo = np.median(luminancia[mascara])
+    umbral = fondo + (pico - fondo) / 2
+
+    cy, cx = fila + lado / 2, columna + lado / 2
+    y0, y1 = max(0, int(cy) - 3 * lado), min(alto, int(cy) + 3 * lado)
+    x0, x1 = max(0, int(cx) - 3 * lado), min(ancho, int(cx) + 3 * lado)
+    area = np.count_nonzero(luminancia[y0:y1, x0:x1] > umbral)
+    return cx / ancho, cy / alto, math.sqrt(area / math.pi) / ancho
+
+
+def calcular_caracteristicas(datos: bytes) -> dict:
+    """
+    Calcula las características de una captura JPEG.
+
+    Args:
+        datos (bytes): Contenido del archivo.
+
+    Returns:
+        dict: Dimensiones originales, medidas e histogramas (ver
+        ``CacheCaracteristicas.obtener``).
+    """
+    if np is None:
+        raise RuntimeError("Las características requieren NumPy y Pillow (pip install numpy pillow).")
+    with Image.open(io.BytesIO(datos)) as imagen:
+        ancho, alto = imagen.size
+        imagen.draft("RGB", (LADO_ANALISIS, LADO_ANALISIS))
+        imagen = imagen.convert("RGB")
+        imagen.thumbnail((LADO_ANALISIS, LADO_ANALISIS))
+        rgb = np.asarray(imagen, dtype=np.float64)
+
+    luminancia = rgb @ np.array([0.299, 0.587, 0.114])
+    mascara = luminancia > UMBRAL_FONDO
+    if not mascara.any():
+        mascara[:] = True
+    valores = luminancia[mascara]
+
+    # Varianza del laplaciano: baja en capturas desenfocadas
+    laplaciano = (4 * luminancia[1:-1, 1:-1] - luminancia[:-2, 1:-1] - luminancia[2:, 1:-1]
+                  - luminancia[1:-1, :-2] - luminancia[1:-1, 2:])
+    interior = mascara[1:-1, 1:-1]
+    disco_x, disco_y, disco_radio = _ubicar_disco(luminancia, mascara)
+    return {
+        "ancho": ancho,
+        "alto": alto,
+        "disco_x": disco_x,
+        "disco_y": disco_y,
+        "disco_radio": disco_radio,
+        "nitidez": float(laplaciano[interior].var()) if interior.any() else 0.0,
+        "contraste": float(valores.std() / 255),
+        "brillo": float(valores.mean() / 255),
+        "saturacion": float(np.count_nonzero(valores >= 250) / len(valores)),
+        "cobertura": float(mascara.mean()),
+        "histogramas": {
+            "luminancia": _histograma(valores, BINS_LUMINANCIA),
+            "rojo": _histograma(rgb[..., 0][mascara], BINS_CANAL),
+            "verde": _histograma(rgb[..., 1][mascara], BINS_CANAL),
+            "azul": _histograma(rgb[..., 2][mascara], BINS_CANAL),
+        },
+    }
+
+
+def _empaquetar(sha256: bytes, caracteristicas: dict) -> bytes:
+    histogramas = caracteristicas["histogramas"]
+    cuantizados = [
+        round(fraccion * 65535)
+        for canal in ("luminancia", "rojo", "verde", "azul")
+        for fraccion in histogramas[canal]
+    ]
+    return REGISTRO.pack(
+        sha256, min(caracteristicas["ancho"], 65535), min(caracteristicas["alto"], 65535),
+        *(caracteristicas[medida] for medida in MEDIDAS), *cuantizados
+    )
+
+
+def _desempaquetar(registro: bytes) -> dict:
+    valores = REGISTRO.unpack(registro)
+    medidas = valores[3:3 + len(MEDIDAS)]
+    bins = [round(cuenta / 65535, 5) for cuenta in valores[3 + len(MEDIDAS):]]
+    rojo = BINS_LUMINANCIA + BINS_CANAL
+    caracteristicas = {"sha256": valores[0].hex(), "ancho": valores[1], "alto": valores[2]}
+    caracteristicas.update((medida, round(valor, 6)) for medida, valor in zip(MEDIDAS, medidas))
+    caracteristicas["histogramas"] = {
+        "luminancia": bins[:BINS_LUMINANCIA],
+        "rojo": bins[BINS_LUMINANCIA:rojo],
+        "verde": bins[rojo:rojo + BINS_CANAL],
+        "azul": bins[rojo + BINS_CANAL:],
+    }
+    return caracteristicas
+
+
+# Hashes ya presentes en la caché, compartidos con cada proceso del pool al
+# crearlo (ver ``_iniciar_proceso``)
+_conocidos = frozenset()
+
+
+def _iniciar_proceso(conocidos: frozenset):
+    global _conocidos
+    _conocidos = conocidos
+
+
+def _procesar(tarea: tuple) -> tuple:
+    """
+    Lee un archivo, calcula su hash y, si su contenido no está en la caché,
+    sus características. Se ejecuta en los procesos del pool.
+
+    Args:
+        tarea (tuple): (nombre del archivo, ruta).
+
+    Returns:
+        tuple: (sha256, registro empaquetado o None, tamaño, mtime_ns).
+    """
+    with open(tarea[1], "rb") as f:
+        estado = os.fstat(f.fileno())
+        datos = f.read()
+    sha256 = hashlib.sha256(datos).digest()
+    if sha256 in _conocidos:
+        return sha256, None, estado.st_size, estado.st_mtime_ns
+    return sha256, _empaquetar(sha256, calcular_caracteristicas(datos)), estado.st_size, estado.st_mtime_ns
+
+
+class CacheCaracteristicas:
+    """
+    Caché persistente de características, indexada por el SHA-256 del
+    contenido de cada imagen.
+
+    El archivo binario tiene una cabecera y registros de tamaño fijo
+    (``REGISTRO``) que solo se agregan al final; en memoria se guarda el
+    desplazamiento de cada hash, y consultar una imagen lee un solo
+    registro. Otro archivo, JSON, recuerda el tamaño, la fecha de
+    modificación y el hash de cada archivo de imagen, para saber sin leerlo
+    si cambió desde la última extracción.
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Inicializa la caché sin leerla.
+
+        Args:
+            ruta (str): Archivo binario de la caché.
+        """
+        self.ruta = ruta
+        self.ruta_archivos = os.path.splitext(ruta)[0] + ".json"
+        self.cerrojo = CerrojoArchivo(ruta + ".lock")
+        self._cerrojo = threading.Lock()
+        self._desplazamientos = {}
+        self._leido = 0
+        self._inodo = None
+        self._archivos = None
+        self._firma_archivos = None
+
+    @staticmethod
+    def disponible() -> bool:
+        """
+        Indica si se pueden calcular características (requiere NumPy y Pillow).
+
+        Returns:
+            bool: True si ambas bibliotecas están instaladas.
+        """
+        return disponible()
+
+    def _refrescar(self):
+        """
+        Incorpora los registros que se agregaron al archivo desde la última
+        lectura (de este u otro proceso); si el archivo se reemplazó al
+        compactarlo, se relee entero. Debe llamarse con ``_cerrojo`` tomado.
+        """
+        try:
+            estado = os.stat(self.ruta)
+        except FileNotFoundError:
+            self._desplazamientos, self._leido, self._inodo = {}, 0, None
+            return
+        if estado.st_ino != self._inodo or estado.st_size < self._leido:
+            self._desplazamientos, self._leido, self._inodo = {}, 0, estado.st_ino
+        if estado.st_size == self._leido:
+            return
+        with open(self.ruta, "rb") as f:
+            if self._leido == 0:
+                magia, version, tamano = CABECERA.unpack(f.read(CABECERA.size))
+                if magia != MAGIA or version != VERSION or tamano != REGISTRO.size:
+                    raise ValueError(f"{self.ruta} no es una caché de características compatible.")
+                self._leido = CABECERA.size
+            f.seek(self._leido)
+            datos = f.read()
+        # Un registro a medio escribir (proceso interrumpido) se ignora
+        completos = len(datos) - len(datos) % REGISTRO.size
+        for inicio in range(0, completos, REGISTRO.size):
+            self._desplazamientos[datos[inicio:inicio + 32]] = self._leido + inicio
+        self._leido += completos
+
+    def __len__(self) -> int:
+        with self._cerrojo:
+            self._refrescar()
+            return len(self._desplazamientos)
+
+    def __contains__(self, sha256: str) -> bool:
+        with self._cerrojo:
+            self._refrescar()
+            return bytes.fromhex(sha256) in self._desplazamientos
+
+    def obtener(self, sha256: str):
+        """
+        Obtiene las características de un contenido, sin decodificar la
+        imagen.
+
+        Args:
+            sha256 (str): Hash hexadecimal del archivo.
+
+        Returns:
+            dict or None: "sha256", "ancho" y "alto" originales, la papila
+            ("disco_x", "disco_y" y "disco_radio", relativos al ancho y alto),
+            "nitidez" (varianza del laplaciano), "contraste", "brillo",
+            "saturacion" (fracción de píxeles quemados), "cobertura"
+            (fracción de retina visible) e "histogramas" (fracciones por
+            intervalo de "luminancia", "rojo", "verde" y "azul"); None si el
+            contenido no está en la caché.
+        """
+        try:
+            clave = bytes.fromhex(sha256)
+        except (TypeError, ValueError):
+            return None
+        with self._cerrojo:
+            self._refrescar()
+            desplazamiento = self._desplazamientos.get(clave)
+            if desplazamiento is None:
+                return None
+            with open(self.ruta, "rb") as f:
+                f.seek(desplazamiento)
+                return _desempaquetar(f.read(REGISTRO.size))
+
+    def agregar(self, registros: list):
+        """
+        Agrega registros empaquetados al final del archivo.
+
+        Args:
+            registros (list): Registros de ``REGISTRO.size`` bytes.
+        """
+        if not registros:
+            return
+        with self.cerrojo.exclusivo(), self._cerrojo:
+            self._refrescar()
+            nuevos = {}
+            for registro in registros:
+                if registro[:32] not in self._desplazamientos:
+                    nuevos[registro[:32]] = registro
+            if not nuevos:
+                return
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            with open(self.ruta, "ab") as f:
+                if f.tell() == 0:
+                    f.write(CABECERA.pack(MAGIA, VERSION, REGISTRO.size))
+                f.write(b"".join(nuevos.values()))
+            self._refrescar()
+
+    def compactar(self, vigentes: set) -> int:
+        """
+        Reescribe el archivo conservando solo los contenidos indicados.
+
+        Args:
+            vigentes (set): Hashes hexadecimales a conservar.
+
+        Returns:
+            int: Registros descartados.
+        """
+        claves = {bytes.fromhex(sha256) for sha256 in vigentes if sha256}
+        with self.cerrojo.exclusivo(), self._cerrojo:
+            self._refrescar()
+            descartar = [clave for clave in self._desplazamientos if clave not in claves]
+            if not descartar:
+                return 0
+            conservar = sorted(self._desplazamientos[clave] for clave in self._desplazamientos
+                               if clave in claves)
+            temporal = f"{self.ruta}.{os.getpid()}.tmp"
+            with open(self.ruta, "rb") as origen, open(temporal, "wb") as destino:
+                destino.write(CABECERA.pack(MAGIA, VERSION, REGISTRO.size))
+                for desplazamiento in conservar:
+                    origen.seek(desplazamiento)
+                    destino.write(origen.read(REGISTRO.size))
+            os.replace(temporal, self.ruta)
+            self._refrescar()
+        return len(descartar)
+
+    def leer_archivos(self) -> dict:
+        """
+        Lee lo que se sabe de cada archivo de imagen según la última
+        extracción.
+
+        Returns:
+            dict: Nombre de archivo -> [tamaño, mtime_ns, sha256]. No debe
+            modificarse.
+        """
+        try:
+            estado = os.stat(self.ruta_archivos)
+        except OSError:
+            return {}
+        firma = (estado.st_ino, estado.st_size, estado.st_mtime_ns)
+        if firma != self._firma_archivos:
+            try:
+                with open(self.ruta_archivos, "r", encoding="utf-8") as f:
+                    self._archivos = json.load(f)
+            except (OSError, ValueError):
+                return {}
+            self._firma_archivos = firma
+        return self._archivos
+
+    def _escribir_archivos(self, archivos: dict):
+        temporal = f"{self.ruta_archivos}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(archivos, f)
+        os.replace(temporal, self.ruta_archivos)
+
+    def hash_de(self, carpeta: str, archivo: str):
+        """
+        Obtiene el hash de un archivo de imagen sin leerlo, si no cambió
+        desde la última extracción.
+
+        Args:
+            carpeta (str): Carpeta de las imágenes.
+            archivo (str): Nombre del archivo dentro de la carpeta.
+
+        Returns:
+            str or None: SHA-256 hexadecimal, o None si no se conoce.
+        """
+        conocido = self.leer_archivos().get(archivo)
+        try:
+            estado = os.stat(os.path.join(carpeta, archivo))
+        except OSError:
+            return None
+        if conocido and conocido[0] == estado.st_size and conocido[1] == estado.st_mtime_ns:
+            return conocido[2]
+        return None
+
+    def actualizar(self, carpeta: str, archivos, procesos: int = None, progreso=None) -> dict:
+        """
+        Calcula las características de los archivos nuevos o modificados.
+
+        Los archivos cuyo tamaño y fecha no cambiaron desde la última vez y
+        cuyo contenido ya está en la caché no se leen. El resto se reparte
+        entre un pool de procesos (el análisis es de CPU); un archivo
+        modificado cuyo contenido nuevo ya se conocía se lee para calcular
+        su hash, pero no se decodifica.
+
+        Args:
+            carpeta (str): Carpeta de las imágenes.
+            archivos (iterable): Nombres de archivo dentro de la carpeta.
+            procesos (int, opcional): Procesos del pool; por defecto, uno
+                por núcleo.
+            progreso (callable, opcional): Recibe (archivos procesados, total).
+
+        Returns:
+            dict: Cantidad de archivos "calculados", "en_cache" y "errores",
+            más el detalle de los errores en "fallidos".
+        """
+        if not disponible():
+            raise RuntimeError("Las características requieren NumPy y Pillow (pip install numpy pillow).")
+        procesos = procesos or os.cpu_count() or 1
+        conocidos = self.leer_archivos()
+        with self._cerrojo:
+            self._refrescar()
+            presentes = frozenset(self._desplazamientos)
+
+        resumen = {"calculados": 0, "en_cache": 0, "errores": 0, "fallidos": {}}
+        vigentes = {}
+        tareas = []
+        for archivo in sorted(set(archivos)):
+            ruta = os.path.join(carpeta, archivo)
+            try:
+                estado = os.stat(ruta)
+            except OSError as e:
+                resumen["errores"] += 1
+                resumen["fallidos"][archivo] = str(e)
+                continue
+            conocido = conocidos.get(archivo)
+            if (conocido and conocido[0] == estado.st_size and conocido[1] == estado.st_mtime_ns
+                    and bytes.fromhex(conocido[2]) in presentes):
+                vigentes[archivo] = conocido
+                resumen["en_cache"] += 1
+            else:
+                tareas.append((archivo, ruta))
+
+        avisar = (lambda hechas: progreso(hechas, len(tareas))) if progreso else None
+        pool = None
+        if tareas and procesos > 1:
+            pool = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso,
+                                       initargs=(presentes,))
+        else:
+            _iniciar_proceso(presentes)
+        nuevos = []
+        try:
+            for (archivo, _), resultado, error in procesar_en_paralelo(
+                    _procesar, tareas, procesos, progreso=avisar, pool=pool):
+                if error is not None:
+                    resumen["errores"] += 1
+                    resumen["fallidos"][archivo] = str(error)
+                    continue
+                sha256, registro, tamano, mtime_ns = resultado
+                vigentes[archivo] = [tamano, mtime_ns, sha256.hex()]
+                if registro is None:
+                    resumen["en_cache"] += 1
+                    continue
+                resumen["calculados"] += 1
+                nuevos.append(registro)
+                if len(nuevos) >= 256:
+                    self.agregar(nuevos)
+                    nuevos = []
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            self.agregar(nuevos)
+        self._escribir_archivos(vigentes)
+        return resumen
@@ -0,0 +1,102 @@
+import datetime
+
+# Fechas anteriores se consideran errores de carga
+ANIO_MINIMO = 1900
+
+
+def validar_fecha(texto: str) -> str:
+    """
+    Valida una fecha ingresada y la lleva al formato "YYYY-MM-DD", que se
+    ordena igual como texto que como fecha ("2024-3-5" -> "2024-03-05").
+
+    Args:
+        texto (str): Fecha ingresada.
+
+    Returns:
+        str: Fecha normalizada.
+
+    Raises:
+        ValueError: Si no es una fecha válida, es anterior a 1900 o es
+            posterior a hoy.
+    """
+    try:
+        fecha = datetime.datetime.strptime(str(texto).strip(), "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"Fecha inválida: '{texto}'. Debe tener el formato YYYY-MM-DD.") from None
+    if fecha.year < ANIO_MINIMO:
+        raise ValueError(f"Fecha inválida: '{texto}' es anterior a {ANIO_MINIMO}.")
+    if fecha > datetime.date.today():
+        raise ValueError(f"Fecha inválida: '{texto}' es posterior a hoy.")
+    return fecha.isoformat()
+
+
+def en_rango(valor, desde=None, hasta=None) -> bool:
+    """
+    Indica si un valor está dentro de un rango cerrado; los extremos no
+    indicados no se controlan. Un valor vacío nunca está en un rango acotado.
+
+    Args:
+        valor: Valor a controlar (número o fecha "YYYY-MM-DD").
+        desde (opcional): Extremo inferior, inclusive.
+        hasta (opcional): Extremo superior, inclusive.
+
+    Returns:
+        bool: True si el valor está en el rango.
+    """
+    if desde is None and hasta is None:
+        return True
+    if valor in (None, ""):
+        return False
+    if desde is not None and valor < desde:
+        return False
+    if hasta is not None and valor > hasta:
+        return False
+    return True
+
+
+def recorrer(db: dict, ids=None, filtro=None, id_desde=None, id_hasta=None,
+             limite: int = None, cursor: str = None):
+    """
+    Recorre una tabla en orden de inserción devolviendo de a un registro,
+    sin copiar la tabla ni acumular resultados.
+
+    Para paginar se pasa como ``cursor`` el ID del último registro recibido:
+    el recorrido continúa con los registros de ID mayor, aunque ese registro
+    se haya eliminado entre una página y la siguiente. La tabla no debe
+    modificarse mientras se consume el generador.
+
+    Args:
+        db (dict): Tabla de registros indexada por ID.
+        ids (iterable, opcional): IDs candidatos (por ejemplo, de un índice);
+            por defecto toda la tabla.
+        filtro (callable, opcional): Recibe el registro y devuelve True si
+            debe incluirse.
+        id_desde (str or int, opcional): Primer ID incluido.
+        id_hasta (str or int, opcional): Último ID incluido.
+        limite (int, opcional): Cantidad máxima de registros.
+        cursor (str, opcional): ID del último registro de la página anterior.
+
+    Yields:
+        object: Registros (objetos del modelo) que cumplen los filtros.
+    """
+    if limite is not None and limite <= 0:
+        return
+    desde = int(id_desde) if id_desde not in (None, "") else None
+    hasta = int(id_hasta) if id_hasta not in (None, "") else None
+    if cursor not in (None, ""):
+        siguiente = int(cursor) + 1
+        desde = siguiente if desde is None else max(desde, siguiente)
+
+    entregados = 0
+    for id_registro in (db if ids is None else ids):
+        registro = db.get(id_registro)
+        if registro is None:
+            continue
+        if not en_rango(int(id_registro), desde, hasta):
+            continue
+        if filtro is not None and not filtro(registro):
+            continue
+        yield registro
+        entregados += 1
+        if limite is not None and entregados >= limite:
+            return
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no hay reflinks
+    fcntl = None
+
+# ioctl de Linux para clonar un archivo compartiendo bloques (reflink)
+FICLONE = 0x40049409
+TAMANO_BLOQUE = 1024 * 1024
+
+
+def calcular_sha256(ruta: str) -> tuple:
+    """
+    Calcula el SHA-256 de un archivo leyéndolo por bloques.
+
+    Args:
+        ruta (str): Ruta del archivo.
+
+    Returns:
+        tuple: (hash hexadecimal, tamaño en bytes).
+    """
+    sha = hashlib.sha256()
+    tamano = 0
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b""):
+            sha.update(bloque)
+            tamano += len(bloque)
+    return sha.hexdigest(), tamano
+
+
+def copiar_con_hash(origen: str, destino: str) -> tuple:
+    """
+    Copia un archivo calculando su SHA-256 en la misma pasada.
+
+    Args:
+        origen (str): Archivo a copiar.
+        destino (str): Ruta de la copia.
+
+    Returns:
+        tuple: (hash hexadecimal, tamaño en bytes).
+    """
+    sha = hashlib.sha256()
+    tamano = 0
+    with open(origen, "rb") as fo, open(destino, "wb") as fd:
+        for bloque in iter(lambda: fo.read(TAMANO_BLOQUE), b""):
+            sha.update(bloque)
+            fd.write(bloque)
+            tamano += len(bloque)
+    shutil.copystat(origen, destino)
+    return sha.hexdigest(), tamano
+
+
+def _clonar(origen: str, destino: str) -> bool:
+    """
+    Intenta crear ``destino`` como reflink de ``origen``.
+
+    Returns:
+        bool: True si el sistema de archivos soporta la clonación.
+    """
+    if fcntl is None:
+        return False
+    with open(origen, "rb") as fo, open(destino, "wb") as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), FICLONE, fo.fileno())
+            return True
+        except OSError:
+            pass
+    os.remove(destino)
+    return False
+
+
+def ubicar(origen: str, destino: str) -> str:
+    """
+    Coloca una copia de ``origen`` en ``destino`` de la forma más barata
+    posible: reflink, enlace duro (si ambos están en el mismo sistema de
+    archivos) o copia completa.
+
+    Args:
+        origen (str): Archivo a ubicar.
+        destino (str): Ruta final; no debe existir.
+
+    Returns:
+        str: Método utilizado ("reflink", "enlace" o "copia").
+    """
+    mismo_dispositivo = (
+        os.stat(origen).st_dev == os.stat(os.path.dirname(destino)).st_dev
+    )
+    if mismo_dispositivo:
+        if _clonar(origen, destino):
+            return "reflink"
+        try:
+            os.link(origen, destino)
+            return "enlace"
+        except OSError:
+            pass
+    shutil.copy2(origen, destino)
+    return "copia"
+
+
+class AlmacenContenido:
+    """
+    Almacén de imágenes direccionado por contenido. Cada archivo se guarda
+    una sola vez bajo ``objetos/<2 primeros caracteres>/<sha256>.jpg``, de
+    modo que las cargas repetidas no se copian de nuevo y una nueva captura
+    nunca pisa a otra.
+    """
+
+    def __init__(self, carpeta: str):
+        """
+        Inicializa el almacén.
+
+        Args:
+            carpeta (str): Carpeta base de las imágenes.
+        """
+        self.carpeta = carpeta
+
+    def ruta_relativa(self, sha256: str) -> str:
+        """
+        Calcula la ruta de un objeto relativa a la carpeta base.
+
+        Args:
+            sha256 (str): Hash del contenido.
+
+        Returns:
+            str: Ruta relativa del objeto.
+        """
+        # Separador fijo para que la base de datos sea portable entre
+        # sistemas operativos.
+        return f"objetos/{sha256[:2]}/{sha256}.jpg"
+
+    def guardar(self, ruta_origen: str) -> tuple:
+        """
+        Agrega un archivo al almacén, si su contenido no estaba ya.
+
+        Args:
+            ruta_origen (str): Archivo a guardar.
+
+        Returns:
+            tuple: (ruta relativa, sha256, tamaño en bytes).
+        """
+        sha256, tamano = calcular_sha256(ruta_origen)
+        relativa = self.ruta_relativa(sha256)
+        destino = os.path.join(self.carpeta, relativa)
+        if not os.path.exists(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            # Se ubica con un nombre temporal y se renombra, para que nunca
+            # quede a la vista un objeto a medio copiar.
+            temporal = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+            ubicar(ruta_origen, temporal)
+            os.replace(temporal, destino)
+        return relativa, sha256, tamano
+
+    def eliminar(self, relativa: str):
+        """
+        Borra un objeto del almacén. Quien llama debe asegurarse de que
+        ningún registro lo siga usando.
+
+        Args:
+            relativa (str): Ruta relativa del objeto.
+        """
+        ruta = os.path.join(self.carpeta, relativa)
+        if os.path.exists(ruta):
+            os.remove(ruta)
@@ -1,9 +1,12 @@
-import json
-import os
 import sys
 sys.path.append('C:\\Users\\srodriguez\\Desktop\\papila_diagnosticos 2\\papila_diagnosticos 2\\papila_diagnosticos\\modelos')
 
+from gestor.consultas import en_rango, recorrer, validar_fecha
+from gestor.importacion import resultado_error, resultado_ok
+from gestor.indices import IndiceFechas, IndicesTabla
+from gestor.repositorio import Repositorio
 from modelos.diagnostico import Diagnostico
+from modelos.paciente import Paciente
 
 
 class GestorDiagnosticos:
@@ -12,43 +15,103 @@ class GestorDiagnosticos:
     registro, eliminación, listado y persistencia en archivos JSON.
     """
 
-    def __init__(self, ruta_db: str, db_pacientes: str):
+    def __init__(self, ruta_db: str, db_pacientes: str, repositorio: Repositorio = None):
         self.ruta_db = ruta_db
         self.ruta_db_pacientes = db_pacientes
-        self.db = self._cargar_db()
+        self.repositorio = repositorio or Repositorio()
+        self.repositorio.declarar(db_pacientes, Paciente)
+        self.repositorio.declarar(ruta_db, Diagnostico)
+        self._db = None
+        self._indices = IndicesTabla("id_paciente", "tipo")
+        self._fechas = None
         self.ultimo_id = self._obtener_ultimo_id()
+        self.repositorio.al_recargar(ruta_db, self._al_recargar)
+
+    @property
+    def db(self) -> dict:
+        """
+        Diagnósticos indexados por ID. La tabla se lee de disco y se indexa
+        recién en el primer acceso.
+
+        Returns:
+            dict: Diagnósticos (objetos ``Diagnostico``).
+        """
+        if self._db is None:
+            self._db = self._cargar_db()
+            self._indices.construir(self._db)
+        return self._db
+
+    @property
+    def indices(self) -> IndicesTabla:
+        """
+        Índices secundarios de la tabla, cargándola si todavía no se leyó.
+
+        Returns:
+            IndicesTabla: Índices en memoria.
+        """
+        if self._db is None:
+            self.db  # fuerza la carga diferida
+        return self._indices
+
+    @property
+    def fechas(self) -> IndiceFechas:
+        """
+        Índice por fecha, con una línea de tiempo por paciente. Se construye
+        en la primera consulta por fecha y desde entonces se mantiene con
+        cada alta y baja.
+
+        Returns:
+            IndiceFechas: Índice en memoria.
+        """
+        if self._fechas is None:
+            fechas = IndiceFechas("fecha", grupo=lambda diagnostico: diagnostico.id_paciente)
+            fechas.construir(self.db)
+            self._fechas = fechas
+        return self._fechas
 
     def _cargar_db(self):
-        if not os.path.exists(self.ruta_db):
-            return {}
-        with open(self.ruta_db, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-
-    def _guardar_db(self):
-        with open(self.ruta_db, "w", encoding="utf-8") as f:
-            json.dump(self.db, f, indent=4)
+        return self.repositorio.abrir(self.ruta_db, Diagnostico)
+
+    def _guardar_db(self, *ids):
+        self.repositorio.guardar(self.ruta_db, ids)
+
+    def _al_recargar(self, cambios=None):
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id())
+        if self._db is not None:
+            self._indices.actualizar(self._db, cambios)
+            if self._fechas is not None:
+                self._fechas.actualizar(self._db, cambios)
+
+    def verificar_indices(self) -> list:
+        """
+        Reconstruye los índices secundarios y los compara con los actuales.
+
+        Returns:
+            list: Campos con índices inconsistentes (vacía si están bien).
+        """
+        inconsistentes = self.indices.verificar(self.db)
+        if self._fechas is not None:
+            referencia = IndiceFechas("fecha", self._fechas.grupo)
+            referencia.construir(self.db)
+            if referencia.contenido() != self._fechas.contenido():
+                inconsistentes.append("fecha")
+        return inconsistentes
 
     def _obtener_ultimo_id(self):
-        if not self.db:
-            return 0
-        return max(int(did) for did in self.db.keys())
+        return self.repositorio.ultimo_id(self.ruta_db)
 
     def _generar_id(self):
-        self.ultimo_id += 1
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id()) + 1
         return str(self.ultimo_id).zfill(3)
 
+    def _reservar_ids(self, cantidad: int) -> list:
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id())
+        inicio = self.ultimo_id + 1
+        self.ultimo_id += cantidad
+        return [str(i).zfill(3) for i in range(inicio, self.ultimo_id + 1)]
+
     def _paciente_existe(self, id_paciente: str) -> bool:
-        if not os.path.exists(self.ruta_db_pacientes):
-            return False
-        with open(self.ruta_db_pacientes, "r", encoding="utf-8") as f:
-            try:
-                db_pacientes = json.load(f)
-                return id_paciente in db_pacientes
-            except json.JSONDecodeError:
-                return False
+        return self.repositorio.existe(self.ruta_db_pacientes, id_paciente)
 
     def registrar_diagnostico(self, id_paciente: str, fecha: str, d1: float, d2: float, astigmatismo: float, tipo: str):
         """
@@ -56,53 +119,230 @@ class GestorDiagnosticos:
 
         Args:
             id_paciente (str): ID del paciente relacionado.
-            fecha (str): Fecha del diagnóstico.
+            fecha (str): Fecha del diagnóstico (YYYY-MM-DD).
             d1 (float): Dioptría 1.
             d2 (float): Dioptría 2.
             astigmatismo (float): Valor del astigmatismo.
             tipo (str): Tipo de ojo ("OD" o "OS").
+
+        Returns:
+            str or None: ID asignado, o None si el diagnóstico no es válido.
         """
-        if not self._paciente_existe(id_paciente):
-            print("❌ El paciente no existe.")
-            return
+        error = self._validar_referencias(id_paciente, tipo)
+        if error:
+            print(f"❌ {error}")
+            return None
+        try:
+            fecha = validar_fecha(fecha)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return None
+
+        with self.repositorio.transaccion(self.ruta_db):
+            nuevo_id = self._generar_id()
+            diagnostico = Diagnostico(
+                id_=nuevo_id,
+                id_paciente=id_paciente,
+                fecha=fecha,
+                dioptria_1=d1,
+                dioptria_2=d2,
+                astigmatismo=astigmatismo,
+                tipo=tipo
+            )
+            self.db[nuevo_id] = diagnostico
+            self.indices.agregar(nuevo_id, diagnostico)
+            if self._fechas is not None:
+                self._fechas.agregar(nuevo_id, diagnostico)
+            self._guardar_db(nuevo_id)
+        print(f"✅ Diagnóstico registrado con ID {nuevo_id}")
+        return nuevo_id
 
+    def _validar_referencias(self, id_paciente: str, tipo: str):
+        if not self._paciente_existe(id_paciente):
+            return "El paciente no existe."
         if tipo not in ("OD", "OS"):
-            print("❌ Tipo inválido. Debe ser 'OD' (ojo derecho) o 'OS' (ojo izquierdo).")
-            return
+            return "Tipo inválido. Debe ser 'OD' (ojo derecho) o 'OS' (ojo izquierdo)."
+        return None
 
-        nuevo_id = self._generar_id()
-        diagnostico = Diagnostico(
-            id_=nuevo_id,
-            id_paciente=id_paciente,
-            fecha=fecha,
-            dioptria_1=d1,
-            dioptria_2=d2,
-            astigmatismo=astigmatismo,
-            tipo=tipo
-        )
-        self.db[nuevo_id] = diagnostico.to_dict()
-        self._guardar_db()
-        print(f"✅ Diagnóstico registrado con ID {nuevo_id}")
+    def _validar_fila(self, fila: dict):
+        """
+        Valida y normaliza una fila de importación de diagnósticos.
+
+        Args:
+            fila (dict): Datos con las claves "id_paciente", "fecha",
+                "dioptria_1", "dioptria_2", "astigmatismo" y "tipo".
+
+        Returns:
+            tuple: (argumentos para Diagnostico, None) o (None, mensaje de error).
+        """
+        try:
+            datos = {
+                "id_paciente": str(fila["id_paciente"]),
+                "fecha": str(fila["fecha"]),
+                "dioptria_1": float(fila["dioptria_1"]),
+                "dioptria_2": float(fila["dioptria_2"]),
+                "astigmatismo": float(fila["astigmatismo"]),
+                "tipo": str(fila["tipo"]).upper(),
+            }
+        except KeyError as e:
+            return None, f"Falta el campo {e}."
+        except (TypeError, ValueError):
+            return None, "Las dioptrías y el astigmatismo deben ser numéricos."
+        error = self._validar_referencias(datos["id_paciente"], datos["tipo"])
+        if error:
+            return None, error
+        try:
+            datos["fecha"] = validar_fecha(datos["fecha"])
+        except ValueError as e:
+            return None, str(e)
+        return datos, None
+
+    def registrar_diagnosticos_batch(self, filas) -> list:
+        """
+        Registra muchos diagnósticos con una única escritura en disco.
+
+        Todas las filas se validan primero contra la tabla de pacientes en
+        memoria; las válidas reciben un bloque de IDs consecutivos y se
+        persisten juntas.
+
+        Args:
+            filas (iterable): Diccionarios con los campos de ``Diagnostico``.
+
+        Returns:
+            list: Reporte con una entrada por fila (ver ``gestor.importacion``).
+        """
+        reporte = []
+        validas = []
+        for numero, fila in enumerate(filas, start=1):
+            datos, error = self._validar_fila(fila)
+            if error:
+                reporte.append(resultado_error(numero, error))
+            else:
+                validas.append((numero, datos))
+
+        with self.repositorio.transaccion(self.ruta_db):
+            ids = self._reservar_ids(len(validas))
+            for nuevo_id, (numero, datos) in zip(ids, validas):
+                diagnostico = Diagnostico(id_=nuevo_id, **datos)
+                self.db[nuevo_id] = diagnostico
+                self.indices.agregar(nuevo_id, diagnostico)
+                if self._fechas is not None:
+                    self._fechas.agregar(nuevo_id, diagnostico)
+                reporte.append(resultado_ok(numero, nuevo_id))
+
+            if ids:
+                self._guardar_db(*ids)
+        reporte.sort(key=lambda entrada: entrada["fila"])
+        return reporte
 
     def eliminar_diagnostico(self, id_diagnostico: str):
-        if id_diagnostico not in self.db:
-            print("❌ El diagnóstico no existe.")
-            return
-        del self.db[id_diagnostico]
-        self._guardar_db()
+        with self.repositorio.transaccion(self.ruta_db):
+            if id_diagnostico not in self.db:
+                print("❌ El diagnóstico no existe.")
+                return
+            self.indices.quitar(id_diagnostico, self.db[id_diagnostico])
+            if self._fechas is not None:
+                self._fechas.quitar(id_diagnostico)
+            del self.db[id_diagnostico]
+            self._guardar_db(id_diagnostico)
         print(f"🗑️ Diagnóstico {id_diagnostico} eliminado.")
 
-    def listar_diagnosticos(self, id_paciente: str = None):
+    def eliminar_diagnosticos_batch(self, ids) -> list:
+        """
+        Elimina varios diagnósticos con una única escritura en disco. No
+        toca las imágenes asociadas (ver ``gestor.integridad``).
+
+        Args:
+            ids (iterable): IDs de los diagnósticos a eliminar.
+
+        Returns:
+            list: IDs eliminados; se omiten los que no existían.
+        """
+        with self.repositorio.transaccion(self.ruta_db):
+            eliminados = []
+            for id_diagnostico in dict.fromkeys(ids):
+                diagnostico = self.db.pop(id_diagnostico, None)
+                if diagnostico is not None:
+                    self.indices.quitar(id_diagnostico, diagnostico)
+                    if self._fechas is not None:
+                        self._fechas.quitar(id_diagnostico)
+                    eliminados.append(id_diagnostico)
+            if eliminados:
+                self._guardar_db(*eliminados)
+        return eliminados
+
+    def consultar_diagnosticos(self, id_paciente: str = None, tipo: str = None,
+                               fecha_desde: str = None, fecha_hasta: str = None,
+                               id_desde: str = None, id_hasta: str = None,
+                               limite: int = None, cursor: str = None):
+        """
+        Recorre los diagnósticos que cumplen los filtros, de a uno y sin
+        copiar la tabla. Los filtros por paciente y tipo usan los índices, y
+        un rango de fechas usa el índice por fecha si deja menos candidatos.
+
+        Args:
+            id_paciente (str, opcional): Paciente de los diagnósticos.
+            tipo (str, opcional): Tipo de ojo ("OD" o "OS").
+            fecha_desde (str, opcional): Fecha mínima (YYYY-MM-DD), inclusive.
+            fecha_hasta (str, opcional): Fecha máxima (YYYY-MM-DD), inclusive.
+            id_desde (str, opcional): Primer ID incluido.
+            id_hasta (str, opcional): Último ID incluido.
+            limite (int, opcional): Cantidad máxima de diagnósticos.
+            cursor (str, opcional): ID del último diagnóstico de la página
+                anterior, para continuar a partir de él.
+
+        Yields:
+            Diagnostico: Diagnósticos en orden de registro.
+        """
+        ids = self.indices.mas_selectivo({"id_paciente": id_paciente, "tipo": tipo})
+        if fecha_desde is not None or fecha_hasta is not None:
+            # La línea de tiempo del paciente nunca tiene más candidatos que
+            # su índice; la de toda la tabla, solo si el rango es acotado. Los
+            # IDs se ordenan para conservar el orden de registro y el cursor
+            en_fecha = self.fechas.contar(fecha_desde, fecha_hasta, id_paciente)
+            if id_paciente is not None or en_fecha < len(self.db) // 2:
+                ids = sorted(self.fechas.rango(fecha_desde, fecha_hasta, id_paciente), key=int)
+
+        def filtro(diagnostico):
+            return (
+                (id_paciente is None or diagnostico.id_paciente == id_paciente)
+                and (tipo is None or diagnostico.tipo == tipo)
+                and en_rango(diagnostico.fecha, fecha_desde, fecha_hasta)
+            )
+
+        return recorrer(self.db, ids, filtro, id_desde, id_hasta, limite, cursor)
+
+    def consultar_por_fecha(self, fecha_desde: str = None, fecha_hasta: str = None,
+                            id_paciente: str = None, descendente: bool = False,
+                            limite: int = None) -> list:
+        """
+        Obtiene los diagnósticos de un rango de fechas en orden cronológico,
+        en O(log N + k) sin importar el tamaño de la tabla. Con un paciente,
+        es su historia clínica (línea de tiempo).
+
+        Args:
+            fecha_desde (str, opcional): Fecha mínima (YYYY-MM-DD), inclusive.
+            fecha_hasta (str, opcional): Fecha máxima (YYYY-MM-DD), inclusive.
+            id_paciente (str, opcional): Paciente de los diagnósticos.
+            descendente (bool): Si es True, del más reciente al más antiguo.
+            limite (int, opcional): Cantidad máxima de diagnósticos.
+
+        Returns:
+            list: Diagnósticos con fecha en el rango (los que no tienen fecha
+            no se incluyen).
+        """
+        ids = self.fechas.rango(fecha_desde, fecha_hasta, id_paciente, descendente, limite)
+        return [self.db[id_diagnostico] for id_diagnostico in ids]
+
+    def listar_diagnosticos(self, id_paciente: str = None, **filtros):
         if not self.db:
             print("📭 No hay diagnósticos registrados.")
             return
 
         print("\n📋 Lista de diagnósticos:")
-        for did, datos in self.db.items():
-            if id_paciente and datos["id_paciente"] != id_paciente:
-                continue
+        for diagnostico in self.consultar_diagnosticos(id_paciente or None, **filtros):
             print(
-                f"ID: {did} | Paciente: {datos['id_paciente']} | Fecha: {datos['fecha']} | "
-                f"D1: {datos['dioptria_1']} | D2: {datos['dioptria_2']} | "
-                f"Astigmatismo: {datos['astigmatismo']} | Tipo: {datos['tipo']}"
+                f"ID: {diagnostico.id} | Paciente: {diagnostico.id_paciente} | Fecha: {diagnostico.fecha} | "
+                f"D1: {diagnostico.dioptria_1} | D2: {diagnostico.dioptria_2} | "
+                f"Astigmatismo: {diagnostico.astigmatismo} | Tipo: {diagnostico.tipo}"
             )
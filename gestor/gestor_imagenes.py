@@ -1,6 +1,16 @@
-import json
 import os
-import shutil
+import threading
+from gestor.caracteristicas import CacheCaracteristicas
+from gestor.contenido import AlmacenContenido, copiar_con_hash
+from gestor.consultas import en_rango, recorrer, validar_fecha
+from gestor.importacion import resultado_error, resultado_ok
+from gestor.indices import IndiceFechas, IndicesTabla
+from gestor.ingesta import listar_imagenes_carpeta, procesar_en_paralelo
+from gestor.metadatos import leer_metadatos
+from gestor.miniaturas import CacheMiniaturas
+from gestor.repositorio import Repositorio
+from gestor.similitud import DISTANCIA_DUPLICADO, IndiceHuellas, huella_perceptual
+from modelos.diagnostico import Diagnostico
 from modelos.imagen import ImagenPapila
 
 
@@ -10,7 +20,8 @@ class GestorImagenes:
     eliminación, listado y persistencia en disco.
     """
 
-    def __init__(self, ruta_db: str, carpeta_imagenes: str, db_diagnosticos: str, db_pacientes: str):
+    def __init__(self, ruta_db: str, carpeta_imagenes: str, db_diagnosticos: str, db_pacientes: str,
+                 repositorio: Repositorio = None, por_contenido: bool = False):
         """
         Inicializa el gestor de imágenes.
 
@@ -19,48 +30,132 @@ class GestorImagenes:
             carpeta_imagenes (str): Carpeta donde se guardarán las imágenes físicamente.
             db_diagnosticos (str): Ruta a la base de datos de diagnósticos.
             db_pacientes (str): Ruta a la base de datos de pacientes.
+            repositorio (Repositorio, opcional): Repositorio compartido con los
+                demás gestores. Si no se indica se crea uno propio.
+            por_contenido (bool): Si es True las imágenes se guardan una sola
+                vez por contenido (SHA-256) en lugar de como RET{paciente}{ojo}.jpg.
         """
         self.ruta_db = ruta_db
         self.ruta_db_diagnosticos = db_diagnosticos
         self.ruta_db_pacientes = db_pacientes
         self.carpeta_imagenes = carpeta_imagenes
-        self.db = self._cargar_db()
+        self.contenido = AlmacenContenido(carpeta_imagenes) if por_contenido else None
+        self.miniaturas = CacheMiniaturas(os.path.join(carpeta_imagenes, ".miniaturas"))
+        self.caracteristicas = CacheCaracteristicas(os.path.join(carpeta_imagenes, ".caracteristicas.bin"))
+        self.huellas = IndiceHuellas(os.path.join(carpeta_imagenes, ".huellas.jsonl"))
+        self._huellas_sincronizadas = False
+        self.repositorio = repositorio or Repositorio()
+        self.repositorio.declarar(db_diagnosticos, Diagnostico)
+        self.repositorio.declarar(ruta_db, ImagenPapila)
+        self._db = None
+        self._indices = IndicesTabla("id_diagnostico", "tipo_ojo", "archivo")
+        self._fechas = None
         self.ultimo_id = self._obtener_ultimo_id()
+        self.repositorio.al_recargar(ruta_db, self._al_recargar)
 
         os.makedirs(carpeta_imagenes, exist_ok=True)
 
+    @property
+    def db(self) -> dict:
+        """
+        Imágenes indexadas por ID. La tabla se lee de disco y se indexa
+        recién en el primer acceso.
+
+        Returns:
+            dict: Imágenes (objetos ``ImagenPapila``).
+        """
+        if self._db is None:
+            self._db = self._cargar_db()
+            self._indices.construir(self._db)
+        return self._db
+
+    @property
+    def indices(self) -> IndicesTabla:
+        """
+        Índices secundarios de la tabla, cargándola si todavía no se leyó.
+
+        Returns:
+            IndicesTabla: Índices en memoria.
+        """
+        if self._db is None:
+            self.db  # fuerza la carga diferida
+        return self._indices
+
+    @property
+    def fechas(self) -> IndiceFechas:
+        """
+        Índice por fecha de captura, con una línea de tiempo por paciente
+        (el de su diagnóstico). Se construye en la primera consulta por
+        fecha y desde entonces se mantiene con cada alta y baja.
+
+        Returns:
+            IndiceFechas: Índice en memoria.
+        """
+        if self._fechas is None:
+            fechas = IndiceFechas("fecha_captura",
+                                  grupo=lambda imagen: self._get_paciente_id(imagen.id_diagnostico))
+            fechas.construir(self.db)
+            self._fechas = fechas
+        return self._fechas
+
     def _cargar_db(self):
         """
         Carga la base de datos desde el archivo JSON.
 
         Returns:
-            dict: Base de datos de imágenes.
+            dict: Imágenes (objetos ``ImagenPapila``) indexadas por ID.
         """
-        if not os.path.exists(self.ruta_db):
-            return {}
-        with open(self.ruta_db, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
+        return self.repositorio.abrir(self.ruta_db, ImagenPapila)
 
-    def _guardar_db(self):
+    def _guardar_db(self, *ids):
         """
-        Guarda la base de datos de imágenes en el archivo JSON.
+        Guarda la base de datos de imágenes.
+
+        Args:
+            *ids (str): IDs modificados, para los almacenes que solo
+                persisten los cambios.
+        """
+        self.repositorio.guardar(self.ruta_db, ids)
+
+    def _al_recargar(self, cambios=None):
         """
-        with open(self.ruta_db, "w", encoding="utf-8") as f:
-            json.dump(self.db, f, indent=4)
+        Actualiza el último ID y los índices cuando otro proceso modificó la
+        tabla.
+
+        Args:
+            cambios (list, opcional): Registros que cambiaron; sin ellos los
+                índices se reconstruyen completos.
+        """
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id())
+        if self._db is not None:
+            self._indices.actualizar(self._db, cambios)
+            if self._fechas is not None:
+                self._fechas.actualizar(self._db, cambios)
+
+    def verificar_indices(self) -> list:
+        """
+        Reconstruye los índices secundarios y los compara con los actuales.
+
+        Returns:
+            list: Campos con índices inconsistentes (vacía si están bien).
+        """
+        inconsistentes = self.indices.verificar(self.db)
+        if self._fechas is not None:
+            referencia = IndiceFechas("fecha_captura", self._fechas.grupo)
+            referencia.construir(self.db)
+            if referencia.contenido() != self._fechas.contenido():
+                inconsistentes.append("fecha_captura")
+        return inconsistentes
 
     def _obtener_ultimo_id(self):
         """
-        Obtiene el último ID usado para las imágenes.
+        Obtiene el último ID usado para las imágenes, desde el manifiesto de
+        la tabla.
 
         Returns:
             int: Último ID numérico usado.
         """
-        if not self.db:
-            return 0
-        return max(int(iid) for iid in self.db.keys())
+        return self.repositorio.ultimo_id(self.ruta_db)
 
     def _generar_id(self):
         """
@@ -69,9 +164,24 @@ class GestorImagenes:
         Returns:
             str: Nuevo ID como cadena, con ceros a la izquierda.
         """
-        self.ultimo_id += 1
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id()) + 1
         return str(self.ultimo_id).zfill(3)
 
+    def _reservar_ids(self, cantidad: int) -> list:
+        """
+        Reserva un bloque de IDs consecutivos.
+
+        Args:
+            cantidad (int): Cantidad de IDs a reservar.
+
+        Returns:
+            list: IDs reservados, con el mismo formato que ``_generar_id``.
+        """
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id())
+        inicio = self.ultimo_id + 1
+        self.ultimo_id += cantidad
+        return [str(i).zfill(3) for i in range(inicio, self.ultimo_id + 1)]
+
     def _diagnostico_valido(self, id_diagnostico):
         """
         Verifica si un diagnóstico existe en la base de datos.
@@ -82,14 +192,7 @@ class GestorImagenes:
         Returns:
             bool: True si el diagnóstico existe, False en caso contrario.
         """
-        if not os.path.exists(self.ruta_db_diagnosticos):
-            return False
-        with open(self.ruta_db_diagnosticos, "r", encoding="utf-8") as f:
-            try:
-                db_diag = json.load(f)
-                return id_diagnostico in db_diag
-            except json.JSONDecodeError:
-                return False
+        return self.repositorio.existe(self.ruta_db_diagnosticos, id_diagnostico)
 
     def _get_paciente_id(self, id_diagnostico):
         """
@@ -101,13 +204,10 @@ class GestorImagenes:
         Returns:
             str or None: ID del paciente si se encuentra, None si no.
         """
-        if not os.path.exists(self.ruta_db_diagnosticos):
+        diagnostico = self.repositorio.obtener(self.ruta_db_diagnosticos, id_diagnostico)
+        if diagnostico is None:
             return None
-        with open(self.ruta_db_diagnosticos, "r", encoding="utf-8") as f:
-            db_diag = json.load(f)
-            if id_diagnostico in db_diag:
-                return db_diag[id_diagnostico]["id_paciente"]
-        return None
+        return diagnostico.id_paciente
 
     def registrar_imagen(self, id_diagnostico: str, ruta_origen: str, descripcion: str = "", tipo_ojo: str = "OD", fecha_captura: str = ""):
         """
@@ -118,73 +218,645 @@ class GestorImagenes:
             ruta_origen (str): Ruta del archivo de imagen. Ej: C:\FundusImages\ImgPaciente2025.jpg.
             descripcion (str): Descripción opcional de la imagen.
             tipo_ojo (str): Tipo de ojo ("OD" o "OS").
-            fecha_captura (str): Fecha de captura de la imagen en formato "YYYY-MM-DD".
+            fecha_captura (str): Fecha de captura de la imagen en formato
+                "YYYY-MM-DD". Si se deja vacía se toma la del EXIF del archivo.
+
+        Returns:
+            str or None: ID asignado, o None si la imagen no es válida.
         """
-        if not self._diagnostico_valido(id_diagnostico):
-            print("❌ Diagnóstico no encontrado.")
-            return
+        error = self._validar_referencias(id_diagnostico, ruta_origen)
+        if error:
+            print(f"❌ {error}")
+            return None
+        try:
+            metadatos = leer_metadatos(ruta_origen)
+            fecha_captura = self._fecha_captura(fecha_captura, metadatos["fecha_exif"])
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            return None
+
+        # La copia no necesita el ID: se hace antes de tomar el cerrojo de la
+        # tabla, para no bloquear a los demás procesos mientras dura
+        id_paciente = self._get_paciente_id(id_diagnostico)
+        copia = self._copiar_imagen(id_paciente, ruta_origen, tipo_ojo)
+        huella = self._calcular_huella(ruta_origen)
+
+        with self.repositorio.transaccion(self.ruta_db):
+            try:
+                nombre_archivo, sha256, tamano = self._confirmar_copia(
+                    copia, id_paciente, ruta_origen, tipo_ojo
+                )
+            except OSError as e:
+                print(f"❌ No se pudo copiar la imagen: {e}")
+                return None
+            id_imagen = self._generar_id()
+            imagen = ImagenPapila(
+                id_=id_imagen,
+                id_diagnostico=id_diagnostico,
+                archivo=nombre_archivo,
+                descripcion=descripcion,
+                tipo_ojo=tipo_ojo,
+                fecha_captura=fecha_captura,
+                sha256=sha256,
+                tamano_bytes=tamano,
+                ancho=metadatos["ancho"],
+                alto=metadatos["alto"],
+                fecha_exif=metadatos["fecha_exif"]
+            )
+            self.db[id_imagen] = imagen
+            self.indices.agregar(id_imagen, imagen)
+            if self._fechas is not None:
+                self._fechas.agregar(id_imagen, imagen)
+            self._guardar_db(id_imagen)
+        print(f"✅ Imagen registrada con ID {id_imagen} y guardada como {nombre_archivo}")
+        for duplicado in self._indexar_huellas([(id_imagen, huella)])[id_imagen]:
+            print(f"⚠️ Posible duplicado de la imagen {duplicado['id']} "
+                  f"(diagnóstico {duplicado['id_diagnostico']}, ojo {duplicado['tipo_ojo']}, "
+                  f"distancia {duplicado['distancia']}).")
+        return id_imagen
+
+    @staticmethod
+    def _fecha_captura(indicada: str, fecha_exif: str) -> str:
+        """
+        Elige la fecha de captura de una imagen: la indicada, validada, o si
+        no se indicó, la del EXIF. Una fecha EXIF imposible (una cámara con
+        el reloj mal configurado) se descarta sin rechazar la imagen.
+
+        Args:
+            indicada (str): Fecha ingresada ("" si no se indicó).
+            fecha_exif (str): Fecha leída del archivo ("" si no trae).
 
+        Returns:
+            str: Fecha "YYYY-MM-DD", o "" si no se conoce.
+
+        Raises:
+            ValueError: Si la fecha indicada no es válida.
+        """
+        if indicada:
+            return validar_fecha(indicada)
+        try:
+            return validar_fecha(fecha_exif) if fecha_exif else ""
+        except ValueError:
+            return ""
+
+    def _validar_referencias(self, id_diagnostico: str, ruta_origen: str):
+        """
+        Verifica que el diagnóstico exista y que el archivo de origen esté
+        disponible.
+
+        Args:
+            id_diagnostico (str): ID del diagnóstico relacionado.
+            ruta_origen (str): Ruta del archivo de imagen.
+
+        Returns:
+            str or None: Mensaje de error, o None si todo es válido.
+        """
+        if not self._diagnostico_valido(id_diagnostico):
+            return "Diagnóstico no encontrado."
         if not os.path.exists(ruta_origen):
-            print("❌ La imagen no existe en la ruta especificada.")
-            return
+            return "La imagen no existe en la ruta especificada."
+        return None
+
+    def _copiar_imagen(self, id_paciente: str, ruta_origen: str, tipo_ojo: str) -> tuple:
+        """
+        Copia el archivo de imagen a la carpeta de imágenes, calculando su
+        SHA-256 en la misma lectura. No consulta otras tablas, por lo que
+        puede ejecutarse desde varios hilos a la vez.
+
+        Args:
+            id_paciente (str): ID del paciente dueño de la imagen.
+            ruta_origen (str): Ruta del archivo de imagen.
+            tipo_ojo (str): Tipo de ojo ("OD" o "OS").
+
+        Returns:
+            tuple: (nombre del archivo dentro de la carpeta de imágenes,
+            sha256, tamaño en bytes).
+        """
+        if self.contenido is not None:
+            return self.contenido.guardar(ruta_origen)
 
-        id_imagen = self._generar_id()
-        id_paciente = self._get_paciente_id(id_diagnostico)
         nombre_archivo = f"RET{id_paciente}{tipo_ojo}.jpg"
         ruta_destino = os.path.join(self.carpeta_imagenes, nombre_archivo)
+        # Copia a un temporal y renombra, para que dos copias simultáneas al
+        # mismo destino no mezclen su contenido
+        temporal = f"{ruta_destino}.{threading.get_ident()}.tmp"
+        sha256, tamano = copiar_con_hash(ruta_origen, temporal)
+        os.replace(temporal, ruta_destino)
+        return nombre_archivo, sha256, tamano
+
+    def _confirmar_copia(self, copia: tuple, id_paciente: str, ruta_origen: str, tipo_ojo: str) -> tuple:
+        """
+        Verifica, con el cerrojo de la tabla tomado, que el archivo copiado
+        antes de la transacción siga en disco, y si no lo vuelve a copiar.
+        Una baja concurrente que ya no veía registros con ese archivo (el
+        alta todavía no estaba guardada) pudo haberlo borrado; las bajas
+        toman el mismo cerrojo, así que después de esta verificación ya no
+        pueden borrarlo.
 
-        shutil.copy2(ruta_origen, ruta_destino)
+        Args:
+            copia (tuple): Resultado de ``_copiar_imagen``, que puede traer
+                más elementos al final.
+            id_paciente (str): ID del paciente dueño de la imagen.
+            ruta_origen (str): Ruta del archivo de imagen.
+            tipo_ojo (str): Tipo de ojo ("OD" o "OS").
+
+        Returns:
+            tuple: La misma copia, o la nueva si hubo que repetirla.
+
+        Raises:
+            OSError: Si no se pudo volver a copiar el archivo.
+        """
+        if os.path.exists(os.path.join(self.carpeta_imagenes, copia[0])):
+            return copia
+        return self._copiar_imagen(id_paciente, ruta_origen, tipo_ojo) + copia[3:]
+
+    def _ingerir(self, tarea: tuple) -> tuple:
+        """
+        Valida y copia el archivo de una fila de importación. Se ejecuta en
+        los hilos del pool de ingesta.
+
+        Args:
+            tarea (tuple): (número de fila, datos normalizados).
+
+        Returns:
+            tuple: Resultado de ``_copiar_imagen`` más la huella perceptual y
+            los metadatos del JPEG.
+        """
+        datos = tarea[1]
+        metadatos = leer_metadatos(datos["ruta_origen"])
+        copia = self._copiar_imagen(datos["id_paciente"], datos["ruta_origen"], datos["tipo_ojo"])
+        return copia + (self._calcular_huella(datos["ruta_origen"]), metadatos)
+
+    def _validar_fila(self, fila: dict):
+        """
+        Valida y normaliza una fila de importación de imágenes.
+
+        Args:
+            fila (dict): Datos con las claves "id_diagnostico" y "ruta_origen",
+                y opcionalmente "descripcion", "tipo_ojo" y "fecha_captura" (si
+                falta, se toma la del EXIF del archivo).
+
+        Returns:
+            tuple: (datos normalizados, None) o (None, mensaje de error).
+        """
+        try:
+            datos = {
+                "id_diagnostico": str(fila["id_diagnostico"]),
+                "ruta_origen": str(fila["ruta_origen"]),
+                "descripcion": str(fila.get("descripcion") or ""),
+                "tipo_ojo": str(fila.get("tipo_ojo") or "OD").upper(),
+                "fecha_captura": str(fila.get("fecha_captura") or ""),
+            }
+        except KeyError as e:
+            return None, f"Falta el campo {e}."
+        if datos["tipo_ojo"] not in ("OD", "OS"):
+            return None, "Tipo de ojo inválido. Debe ser 'OD' o 'OS'."
+        if datos["fecha_captura"]:
+            try:
+                datos["fecha_captura"] = validar_fecha(datos["fecha_captura"])
+            except ValueError as e:
+                return None, str(e)
+        error = self._validar_referencias(datos["id_diagnostico"], datos["ruta_origen"])
+        if error:
+            return None, error
+        datos["id_paciente"] = self._get_paciente_id(datos["id_diagnostico"])
+        return datos, None
+
+    def registrar_imagenes_batch(self, filas, trabajadores: int = 1, progreso=None) -> list:
+        """
+        Registra muchas imágenes con una única escritura de la base de datos.
+
+        Todas las filas se validan primero contra la tabla de diagnósticos en
+        memoria; se copian los archivos de las válidas (en paralelo si se
+        indica más de un trabajador) y las copiadas reciben un bloque de IDs
+        consecutivos y se persisten juntas.
+
+        Args:
+            filas (iterable): Diccionarios con los datos de cada imagen.
+            trabajadores (int): Hilos para copiar, calcular hashes y validar.
+            progreso (callable, opcional): Recibe (imágenes procesadas, total).
 
-        imagen = ImagenPapila(
-            id_=id_imagen,
-            id_diagnostico=id_diagnostico,
-            archivo=nombre_archivo,
-            descripcion=descripcion,
-            tipo_ojo=tipo_ojo,
-            fecha_captura=fecha_captura
+        Returns:
+            list: Reporte con una entrada por fila (ver ``gestor.importacion``).
+        """
+        reporte = []
+        validas = []
+        for numero, fila in enumerate(filas, start=1):
+            datos, error = self._validar_fila(fila)
+            if error:
+                reporte.append(resultado_error(numero, error))
+            else:
+                validas.append((numero, datos))
+
+        avisar = (lambda hechas: progreso(hechas, len(validas))) if progreso else None
+
+        # Las copias se hacen fuera del cerrojo de la tabla; los IDs se
+        # reservan recién al guardar, en la misma transacción
+        copiadas = []
+        for tarea, resultado, error in procesar_en_paralelo(
+                self._ingerir, validas, trabajadores, progreso=avisar):
+            numero, datos = tarea
+            if isinstance(error, OSError):
+                reporte.append(resultado_error(numero, f"No se pudo copiar la imagen: {error}"))
+            elif error:
+                reporte.append(resultado_error(numero, str(error)))
+            else:
+                copiadas.append((numero, datos, resultado))
+        copiadas.sort(key=lambda copiada: copiada[0])
+
+        with self.repositorio.transaccion(self.ruta_db):
+            confirmadas = []
+            for numero, datos, copia in copiadas:
+                try:
+                    copia = self._confirmar_copia(copia, datos["id_paciente"], datos["ruta_origen"],
+                                                  datos["tipo_ojo"])
+                except OSError as e:
+                    reporte.append(resultado_error(numero, f"No se pudo copiar la imagen: {e}"))
+                    continue
+                confirmadas.append((numero, datos, copia))
+            copiadas = confirmadas
+            ids = self._reservar_ids(len(copiadas))
+            for id_imagen, (numero, datos, copia) in zip(ids, copiadas):
+                nombre_archivo, sha256, tamano, _, metadatos = copia
+                imagen = ImagenPapila(
+                    id_=id_imagen,
+                    id_diagnostico=datos["id_diagnostico"],
+                    archivo=nombre_archivo,
+                    descripcion=datos["descripcion"],
+                    tipo_ojo=datos["tipo_ojo"],
+                    fecha_captura=self._fecha_captura(datos["fecha_captura"], metadatos["fecha_exif"]),
+                    sha256=sha256,
+                    tamano_bytes=tamano,
+                    ancho=metadatos["ancho"],
+                    alto=metadatos["alto"],
+                    fecha_exif=metadatos["fecha_exif"]
+                )
+                self.db[id_imagen] = imagen
+                self.indices.agregar(id_imagen, imagen)
+                if self._fechas is not None:
+                    self._fechas.agregar(id_imagen, imagen)
+                reporte.append(resultado_ok(numero, id_imagen))
+
+            if ids:
+                self._guardar_db(*ids)
+
+        # Los posibles duplicados (también entre las filas del lote) se
+        # informan en el reporte, sin impedir el registro
+        duplicados = self._indexar_huellas(
+            [(id_imagen, copiada[2][3]) for id_imagen, copiada in zip(ids, copiadas)]
         )
-        self.db[id_imagen] = imagen.to_dict()
-        self._guardar_db()
-        print(f"✅ Imagen registrada con ID {id_imagen} y guardada como {nombre_archivo}")
+        for entrada in reporte:
+            if duplicados.get(entrada.get("id")):
+                entrada["duplicados"] = [duplicado["id"] for duplicado in duplicados[entrada["id"]]]
+        reporte.sort(key=lambda entrada: entrada["fila"])
+        return reporte
+
+    def importar_carpeta(self, ruta: str, mapping, trabajadores: int = 4, progreso=None) -> list:
+        """
+        Registra todas las capturas JPEG de una carpeta en una sola operación.
+
+        La copia, el cálculo del hash y la validación de cada archivo se
+        reparten entre un pool de hilos; los metadatos se guardan una única
+        vez al final.
+
+        Args:
+            ruta (str): Carpeta con las capturas.
+            mapping (dict or callable): Para cada nombre de archivo, los datos
+                de la imagen ("id_diagnostico" y opcionalmente "tipo_ojo",
+                "descripcion" y "fecha_captura"). Puede ser un diccionario o
+                una función que devuelve None para omitir el archivo.
+            trabajadores (int): Hilos del pool de ingesta.
+            progreso (callable, opcional): Recibe (imágenes procesadas, total).
+
+        Returns:
+            list: Reporte por archivo; cada entrada incluye "archivo".
+        """
+        obtener = mapping if callable(mapping) else mapping.get
+        nombres = []
+        filas = []
+        for nombre in listar_imagenes_carpeta(ruta):
+            datos = obtener(nombre)
+            if datos is None:
+                continue
+            nombres.append(nombre)
+            filas.append(dict(datos, ruta_origen=os.path.join(ruta, nombre)))
+
+        reporte = self.registrar_imagenes_batch(filas, trabajadores, progreso)
+        for entrada in reporte:
+            entrada["archivo"] = nombres[entrada["fila"] - 1]
+        return reporte
 
     def eliminar_imagen(self, id_imagen: str):
         """
-        Elimina una imagen tanto de la base de datos como del disco.
+        Elimina una imagen de la base de datos, y del disco si ningún otro
+        registro usa el mismo archivo.
 
         Args:
             id_imagen (str): ID de la imagen a eliminar.
         """
-        if id_imagen not in self.db:
+        if not self.eliminar_imagenes_batch([id_imagen]):
             print("❌ Imagen no encontrada.")
             return
+        print(f"🗑️ Imagen {id_imagen} eliminada correctamente.")
 
-        nombre_archivo = self.db[id_imagen]["archivo"]
-        ruta_fisica = os.path.join(self.carpeta_imagenes, nombre_archivo)
+    def eliminar_imagenes_batch(self, ids) -> list:
+        """
+        Elimina varias imágenes con una única escritura de la base de datos,
+        y del disco los archivos que ya no usa ningún otro registro.
 
-        if os.path.exists(ruta_fisica):
-            os.remove(ruta_fisica)
+        Args:
+            ids (iterable): IDs de las imágenes a eliminar.
 
-        del self.db[id_imagen]
-        self._guardar_db()
-        print(f"🗑️ Imagen {id_imagen} eliminada correctamente.")
+        Returns:
+            list: IDs eliminados; se omiten los que no existían.
+        """
+        with self.repositorio.transaccion(self.ruta_db):
+            eliminados = []
+            archivos = {}
+            for id_imagen in dict.fromkeys(ids):
+                imagen = self.db.pop(id_imagen, None)
+                if imagen is not None:
+                    self.indices.quitar(id_imagen, imagen)
+                    if self._fechas is not None:
+                        self._fechas.quitar(id_imagen)
+                    archivos[imagen.archivo] = None
+                    eliminados.append(id_imagen)
+            if not eliminados:
+                return eliminados
+            self._guardar_db(*eliminados)
+            self.huellas.quitar(eliminados)
+
+            # El índice por archivo funciona como contador de referencias
+            for nombre_archivo in archivos:
+                if self.indices.contar("archivo", nombre_archivo) == 0:
+                    ruta_fisica = os.path.join(self.carpeta_imagenes, nombre_archivo)
+                    if os.path.exists(ruta_fisica):
+                        os.remove(ruta_fisica)
+        return eliminados
+
+    def _calcular_huella(self, ruta: str):
+        """
+        Calcula la huella perceptual de un archivo, si se puede.
+
+        Args:
+            ruta (str): Ruta del archivo de imagen.
+
+        Returns:
+            int or None: Huella, o None sin Pillow o si no se pudo decodificar.
+        """
+        if not IndiceHuellas.disponible():
+            return None
+        try:
+            return huella_perceptual(ruta)
+        except (OSError, ValueError):
+            return None
+
+    def sincronizar_huellas(self, trabajadores: int = 4) -> int:
+        """
+        Pone el índice de huellas al día con la tabla: calcula las de las
+        imágenes que no tienen (registradas antes de existir el índice) y
+        quita las de imágenes que ya no existen.
+
+        Args:
+            trabajadores (int): Hilos para decodificar las imágenes.
+
+        Returns:
+            int: Huellas calculadas.
+        """
+        indexadas = self.huellas.ids()
+        self.huellas.quitar(indexadas - self.db.keys())
+        faltantes = [(id_imagen, os.path.join(self.carpeta_imagenes, imagen.archivo))
+                     for id_imagen, imagen in self.db.items() if id_imagen not in indexadas]
+        nuevas = []
+        if IndiceHuellas.disponible():
+            for (id_imagen, _), huella, error in procesar_en_paralelo(
+                    lambda faltante: huella_perceptual(faltante[1]), faltantes, trabajadores):
+                if error is None:
+                    nuevas.append((id_imagen, huella))
+        self.huellas.agregar(nuevas)
+        self._huellas_sincronizadas = True
+        return len(nuevas)
+
+    def _indexar_huellas(self, huellas: list) -> dict:
+        """
+        Agrega huellas recién registradas al índice, buscando antes las
+        imágenes ya indexadas que se les parecen.
+
+        Args:
+            huellas (list): Pares (ID de la imagen, huella o None).
+
+        Returns:
+            dict: Para cada ID, la lista de posibles duplicados (ver
+            ``buscar_similares``).
+        """
+        duplicados = {id_imagen: [] for id_imagen, _ in huellas}
+        huellas = [(id_imagen, huella) for id_imagen, huella in huellas if huella is not None]
+        if not huellas:
+            return duplicados
+        if not self._huellas_sincronizadas:
+            self.sincronizar_huellas()
+        for id_imagen, huella in huellas:
+            duplicados[id_imagen] = self._similares(huella, DISTANCIA_DUPLICADO, id_imagen)
+            self.huellas.agregar([(id_imagen, huella)])
+        return duplicados
+
+    def _similares(self, huella: int, distancia_maxima: int, excluir: str = None) -> list:
+        similares = []
+        for distancia, id_imagen in self.huellas.buscar(huella, distancia_maxima):
+            imagen = self.db.get(id_imagen)
+            if id_imagen != excluir and imagen is not None:
+                similares.append({"id": id_imagen, "id_diagnostico": imagen.id_diagnostico,
+                                  "tipo_ojo": imagen.tipo_ojo, "distancia": distancia})
+        return similares
+
+    def buscar_similares(self, id_imagen: str, distancia_maxima: int = DISTANCIA_DUPLICADO):
+        """
+        Busca las imágenes que parecen otra captura de la misma toma.
+
+        Args:
+            id_imagen (str): ID de la imagen de referencia.
+            distancia_maxima (int): Bits distintos permitidos entre las
+                huellas perceptuales (de 256).
+
+        Returns:
+            list or None: Diccionarios con "id", "id_diagnostico", "tipo_ojo"
+            y "distancia", de la más parecida a la menos; None si la imagen no
+            existe o no se pudo calcular su huella.
+        """
+        if id_imagen not in self.db:
+            print("❌ Imagen no encontrada.")
+            return None
+        if not self._huellas_sincronizadas:
+            self.sincronizar_huellas()
+        huella = self.huellas.huella(id_imagen)
+        if huella is None:
+            print("❌ No se pudo calcular la huella de la imagen.")
+            return None
+        return self._similares(huella, distancia_maxima, id_imagen)
 
-    def listar_imagenes(self, id_diagnostico: str = None):
+    def vista_previa(self, id_imagen: str, tamano: int = 256):
+        """
+        Obtiene una vista previa reducida de una imagen, generándola en la
+        caché si hace falta.
+
+        Args:
+            id_imagen (str): ID de la imagen.
+            tamano (int): Lado máximo en píxeles (128, 256 o 512).
+
+        Returns:
+            str or None: Ruta de la vista previa, o None si no se pudo generar.
+        """
+        if id_imagen not in self.db:
+            print("❌ Imagen no encontrada.")
+            return None
+        ruta = os.path.join(self.carpeta_imagenes, self.db[id_imagen].archivo)
+        try:
+            return self.miniaturas.obtener(ruta, tamano)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ No se pudo generar la vista previa: {e}")
+            return None
+
+    def precalentar_vistas_previas(self, trabajadores: int = 4) -> int:
+        """
+        Genera en paralelo las vistas previas de todas las imágenes.
+
+        Args:
+            trabajadores (int): Hilos a utilizar.
+
+        Returns:
+            int: Cantidad de vistas previas disponibles.
+        """
+        if not self.miniaturas.disponible():
+            print("❌ Las vistas previas requieren Pillow (pip install pillow).")
+            return 0
+        archivos = {imagen.archivo for imagen in self.db.values()}
+        rutas = [os.path.join(self.carpeta_imagenes, archivo) for archivo in sorted(archivos)]
+        return self.miniaturas.precalentar(rutas, trabajadores)
+
+    def extraer_caracteristicas(self, procesos: int = None, progreso=None) -> dict:
+        """
+        Calcula las características de las imágenes nuevas o modificadas,
+        repartiendo el análisis entre varios procesos, y descarta de la
+        caché las de contenidos que ya no usa ningún archivo ni registro.
+
+        Args:
+            procesos (int, opcional): Procesos a utilizar; por defecto, uno
+                por núcleo.
+            progreso (callable, opcional): Recibe (archivos procesados, total).
+
+        Returns:
+            dict: Resumen de ``CacheCaracteristicas.actualizar``.
+        """
+        archivos = {imagen.archivo for imagen in self.db.values()}
+        resumen = self.caracteristicas.actualizar(self.carpeta_imagenes, archivos, procesos, progreso)
+        vigentes = {conocido[2] for conocido in self.caracteristicas.leer_archivos().values()}
+        vigentes.update(imagen.sha256 for imagen in self.db.values() if imagen.sha256)
+        if len(self.caracteristicas) - len(vigentes) > max(100, len(vigentes) // 4):
+            self.caracteristicas.compactar(vigentes)
+        return resumen
+
+    def obtener_caracteristicas(self, id_imagen: str):
+        """
+        Obtiene las características ya calculadas de una imagen, sin volver
+        a decodificarla.
+
+        Args:
+            id_imagen (str): ID de la imagen.
+
+        Returns:
+            dict or None: Características (ver ``CacheCaracteristicas.obtener``),
+            o None si la imagen no existe o todavía no se analizó.
+        """
+        imagen = self.db.get(id_imagen)
+        if imagen is None:
+            print("❌ Imagen no encontrada.")
+            return None
+        # Primero el contenido registrado; si no se conoce (registros viejos
+        # sin hash), el del archivo tal como estaba en la última extracción
+        for sha256 in (imagen.sha256, self.caracteristicas.hash_de(self.carpeta_imagenes, imagen.archivo)):
+            if sha256:
+                caracteristicas = self.caracteristicas.obtener(sha256)
+                if caracteristicas is not None:
+                    return caracteristicas
+        print("📭 La imagen todavía no tiene características calculadas.")
+        return None
+
+    def consultar_imagenes(self, id_diagnostico: str = None, tipo_ojo: str = None,
+                           fecha_desde: str = None, fecha_hasta: str = None,
+                           id_desde: str = None, id_hasta: str = None,
+                           limite: int = None, cursor: str = None):
+        """
+        Recorre las imágenes que cumplen los filtros, de a una y sin copiar
+        la tabla. Los filtros por diagnóstico y tipo de ojo usan los índices,
+        y un rango de fechas usa el índice por fecha si deja menos candidatos.
+
+        Args:
+            id_diagnostico (str, opcional): Diagnóstico de las imágenes.
+            tipo_ojo (str, opcional): Tipo de ojo ("OD" o "OS").
+            fecha_desde (str, opcional): Fecha de captura mínima, inclusive.
+            fecha_hasta (str, opcional): Fecha de captura máxima, inclusive.
+            id_desde (str, opcional): Primer ID incluido.
+            id_hasta (str, opcional): Último ID incluido.
+            limite (int, opcional): Cantidad máxima de imágenes.
+            cursor (str, opcional): ID de la última imagen de la página
+                anterior, para continuar a partir de ella.
+
+        Yields:
+            ImagenPapila: Imágenes en orden de registro.
+        """
+        ids = self.indices.mas_selectivo({"id_diagnostico": id_diagnostico, "tipo_ojo": tipo_ojo})
+        if (fecha_desde is not None or fecha_hasta is not None) and id_diagnostico is None:
+            # Los IDs se ordenan para conservar el orden de registro y el cursor
+            if self.fechas.contar(fecha_desde, fecha_hasta) < len(self.db) // 2:
+                ids = sorted(self.fechas.rango(fecha_desde, fecha_hasta), key=int)
+
+        def filtro(imagen):
+            return (
+                (id_diagnostico is None or imagen.id_diagnostico == id_diagnostico)
+                and (tipo_ojo is None or imagen.tipo_ojo == tipo_ojo)
+                and en_rango(imagen.fecha_captura, fecha_desde, fecha_hasta)
+            )
+
+        return recorrer(self.db, ids, filtro, id_desde, id_hasta, limite, cursor)
+
+    def consultar_por_fecha(self, fecha_desde: str = None, fecha_hasta: str = None,
+                            id_paciente: str = None, descendente: bool = False,
+                            limite: int = None) -> list:
+        """
+        Obtiene las imágenes capturadas en un rango de fechas en orden
+        cronológico, en O(log N + k) sin importar el tamaño de la tabla. Con
+        un paciente, es la línea de tiempo de sus capturas.
+
+        Args:
+            fecha_desde (str, opcional): Fecha mínima (YYYY-MM-DD), inclusive.
+            fecha_hasta (str, opcional): Fecha máxima (YYYY-MM-DD), inclusive.
+            id_paciente (str, opcional): Paciente de las imágenes.
+            descendente (bool): Si es True, de la más reciente a la más antigua.
+            limite (int, opcional): Cantidad máxima de imágenes.
+
+        Returns:
+            list: Imágenes con fecha de captura en el rango (las que no
+            tienen fecha no se incluyen).
+        """
+        ids = self.fechas.rango(fecha_desde, fecha_hasta, id_paciente, descendente, limite)
+        return [self.db[id_imagen] for id_imagen in ids]
+
+    def listar_imagenes(self, id_diagnostico: str = None, **filtros):
         """
         Lista todas las imágenes registradas, o solo las de un diagnóstico específico.
 
         Args:
             id_diagnostico (str, opcional): Si se especifica, filtra las imágenes por este diagnóstico.
+            **filtros: Otros filtros y paginación de ``consultar_imagenes``.
         """
         if not self.db:
             print("📭 No hay imágenes registradas.")
             return
 
         print("\n📸 Lista de imágenes:")
-        for iid, datos in self.db.items():
-            if id_diagnostico and datos["id_diagnostico"] != id_diagnostico:
-                continue
+        for imagen in self.consultar_imagenes(id_diagnostico or None, **filtros):
             print(
-                f"ID: {iid} | Diagnóstico: {datos['id_diagnostico']} | "
-                f"Archivo: {datos['archivo']} | Descripción: {datos.get('descripcion', '')} | "
-                f"Tipo Ojo: {datos['tipo_ojo']} | Fecha Captura: {datos['fecha_captura']}"
+                f"ID: {imagen.id} | Diagnóstico: {imagen.id_diagnostico} | "
+                f"Archivo: {imagen.archivo} | Descripción: {imagen.descripcion} | "
+                f"Tipo Ojo: {imagen.tipo_ojo} | Fecha Captura: {imagen.fecha_captura}"
             )
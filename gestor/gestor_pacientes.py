@@ -1,5 +1,7 @@
-import json
-import os
+from gestor.consultas import recorrer
+from gestor.importacion import resultado_error, resultado_ok
+from gestor.indices import IndiceNombres
+from gestor.repositorio import Repositorio
 from modelos.paciente import Paciente
 
 
@@ -10,49 +12,94 @@ class GestorPacientes:
     en archivos JSON.
     """
 
-    def __init__(self, ruta_db: str):
+    def __init__(self, ruta_db: str, repositorio: Repositorio = None):
         """
         Inicializa el gestor de pacientes.
 
         Args:
             ruta_db (str): Ruta al archivo JSON de la base de datos de pacientes.
+            repositorio (Repositorio, opcional): Repositorio compartido con los
+                demás gestores. Si no se indica se crea uno propio.
         """
         self.ruta_db = ruta_db
-        self.db = self._cargar_db()
+        self.repositorio = repositorio or Repositorio()
+        self.repositorio.declarar(ruta_db, Paciente)
+        self._db = None
+        self._nombres = None
         self.ultimo_id = self._obtener_ultimo_id()
+        self.repositorio.al_recargar(ruta_db, self._al_recargar)
+
+    @property
+    def db(self) -> dict:
+        """
+        Pacientes indexados por ID. La tabla se lee de disco recién en el
+        primer acceso, así crear el gestor no cuesta nada.
+
+        Returns:
+            dict: Pacientes (objetos ``Paciente``).
+        """
+        if self._db is None:
+            self._db = self._cargar_db()
+        return self._db
+
+    @property
+    def nombres(self) -> IndiceNombres:
+        """
+        Índice de búsqueda por nombre. Se construye en la primera búsqueda
+        y desde entonces se mantiene con cada alta, modificación y baja.
+
+        Returns:
+            IndiceNombres: Índice en memoria.
+        """
+        if self._nombres is None:
+            nombres = IndiceNombres("nombre")
+            nombres.construir(self.db)
+            self._nombres = nombres
+        return self._nombres
 
     def _cargar_db(self):
         """
         Carga la base de datos de pacientes desde el archivo JSON.
 
         Returns:
-            dict: Diccionario con los datos cargados o vacío si no existe o hay error.
+            dict: Pacientes (objetos ``Paciente``) indexados por ID, o vacío
+            si no existe o hay error.
+        """
+        return self.repositorio.abrir(self.ruta_db, Paciente)
+
+    def _guardar_db(self, *ids):
+        """
+        Guarda la base de datos de pacientes.
+
+        Args:
+            *ids (str): IDs modificados, para los almacenes que solo
+                persisten los cambios.
         """
-        if not os.path.exists(self.ruta_db):
-            return {}
-        with open(self.ruta_db, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
+        self.repositorio.guardar(self.ruta_db, ids)
 
-    def _guardar_db(self):
+    def _al_recargar(self, cambios=None):
         """
-        Guarda la base de datos de pacientes en el archivo JSON.
+        Actualiza el último ID y el índice de nombres cuando otro proceso
+        modificó la tabla.
+
+        Args:
+            cambios (list, opcional): Registros que cambiaron (ver
+                ``Repositorio.al_recargar``); sin ellos el índice se
+                reconstruye completo.
         """
-        with open(self.ruta_db, "w", encoding="utf-8") as f:
-            json.dump(self.db, f, indent=4)
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id())
+        if self._nombres is not None and self._db is not None:
+            self._nombres.actualizar(self._db, cambios)
 
     def _obtener_ultimo_id(self):
         """
         Obtiene el último ID numérico usado para generar nuevos pacientes.
+        Sale del manifiesto de la tabla, sin recorrer todas las claves.
 
         Returns:
             int: Último ID usado, 0 si no hay pacientes.
         """
-        if not self.db:
-            return 0
-        return max(int(pid) for pid in self.db.keys())
+        return self.repositorio.ultimo_id(self.ruta_db)
 
     def _generar_id(self):
         """
@@ -61,9 +108,25 @@ class GestorPacientes:
         Returns:
             str: ID generado (ej. "001").
         """
-        self.ultimo_id += 1
+        # Otro proceso puede haber dado altas desde que se leyó el último ID
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id()) + 1
         return str(self.ultimo_id).zfill(3)
 
+    def _reservar_ids(self, cantidad: int) -> list:
+        """
+        Reserva un bloque de IDs consecutivos.
+
+        Args:
+            cantidad (int): Cantidad de IDs a reservar.
+
+        Returns:
+            list: IDs reservados, con el mismo formato que ``_generar_id``.
+        """
+        self.ultimo_id = max(self.ultimo_id, self._obtener_ultimo_id())
+        inicio = self.ultimo_id + 1
+        self.ultimo_id += cantidad
+        return [str(i).zfill(3) for i in range(inicio, self.ultimo_id + 1)]
+
     def registrar_paciente(self, nombre: str, edad: int, genero: str):
         """
         Registra un nuevo paciente en la base de datos.
@@ -72,12 +135,77 @@ class GestorPacientes:
             nombre (str): Nombre del paciente.
             edad (int): Edad del paciente.
             genero (str): Género del paciente.
+
+        Returns:
+            str: ID asignado al paciente.
         """
-        nuevo_id = self._generar_id()
-        paciente = Paciente(id_=nuevo_id, nombre=nombre, edad=edad, genero=genero)
-        self.db[nuevo_id] = paciente.to_dict()
-        self._guardar_db()
+        # El ID se genera y se guarda sin que otro proceso escriba en el medio
+        with self.repositorio.transaccion(self.ruta_db):
+            nuevo_id = self._generar_id()
+            paciente = Paciente(id_=nuevo_id, nombre=nombre, edad=edad, genero=genero)
+            self.db[nuevo_id] = paciente
+            if self._nombres is not None:
+                self._nombres.agregar(nuevo_id, paciente)
+            self._guardar_db(nuevo_id)
         print(f"✅ Paciente registrado con ID {nuevo_id}")
+        return nuevo_id
+
+    def _validar_fila(self, fila: dict):
+        """
+        Valida y normaliza una fila de importación de pacientes.
+
+        Args:
+            fila (dict): Datos con las claves "nombre", "edad" y "genero".
+
+        Returns:
+            tuple: (argumentos para Paciente, None) o (None, mensaje de error).
+        """
+        try:
+            datos = {
+                "nombre": str(fila["nombre"]),
+                "edad": int(fila["edad"]),
+                "genero": str(fila["genero"]),
+            }
+        except KeyError as e:
+            return None, f"Falta el campo {e}."
+        except (TypeError, ValueError):
+            return None, "La edad debe ser un número entero."
+        return datos, None
+
+    def registrar_pacientes_batch(self, filas) -> list:
+        """
+        Registra muchos pacientes con una única escritura en disco.
+
+        Todas las filas se validan primero; las válidas reciben un bloque de
+        IDs consecutivos y se persisten juntas.
+
+        Args:
+            filas (iterable): Diccionarios con "nombre", "edad" y "genero".
+
+        Returns:
+            list: Reporte con una entrada por fila (ver ``gestor.importacion``).
+        """
+        reporte = []
+        validas = []
+        for numero, fila in enumerate(filas, start=1):
+            datos, error = self._validar_fila(fila)
+            if error:
+                reporte.append(resultado_error(numero, error))
+            else:
+                validas.append((numero, datos))
+
+        with self.repositorio.transaccion(self.ruta_db):
+            ids = self._reservar_ids(len(validas))
+            for nuevo_id, (numero, datos) in zip(ids, validas):
+                self.db[nuevo_id] = Paciente(id_=nuevo_id, **datos)
+                if self._nombres is not None:
+                    self._nombres.agregar(nuevo_id, self.db[nuevo_id])
+                reporte.append(resultado_ok(numero, nuevo_id))
+
+            if ids:
+                self._guardar_db(*ids)
+        reporte.sort(key=lambda entrada: entrada["fila"])
+        return reporte
 
     def modificar_paciente(self, id_paciente: str, nuevo_nombre=None, nueva_edad=None, nuevo_genero=None):
         """
@@ -89,21 +217,24 @@ class GestorPacientes:
             nueva_edad (int, opcional): Nueva edad (si aplica).
             nuevo_genero (str, opcional): Nuevo género (si aplica).
         """
-        if id_paciente not in self.db:
-            print("❌ El paciente no existe.")
-            return
+        with self.repositorio.transaccion(self.ruta_db):
+            if id_paciente not in self.db:
+                print("❌ El paciente no existe.")
+                return
 
-        paciente = Paciente.from_dict(self.db[id_paciente])
+            paciente = self.db[id_paciente]
 
-        if nuevo_nombre:
-            paciente.nombre = nuevo_nombre
-        if nueva_edad is not None:
-            paciente.edad = nueva_edad
-        if nuevo_genero:
-            paciente.genero = nuevo_genero
+            if nuevo_nombre:
+                paciente.nombre = nuevo_nombre
+                if self._nombres is not None:
+                    self._nombres.quitar(id_paciente)
+                    self._nombres.agregar(id_paciente, paciente)
+            if nueva_edad is not None:
+                paciente.edad = nueva_edad
+            if nuevo_genero:
+                paciente.genero = nuevo_genero
 
-        self.db[id_paciente] = paciente.to_dict()
-        self._guardar_db()
+            self._guardar_db(id_paciente)
         print(f"✅ Paciente {id_paciente} modificado.")
 
     def eliminar_paciente(self, id_paciente: str):
@@ -113,22 +244,89 @@ class GestorPacientes:
         Args:
             id_paciente (str): ID del paciente a eliminar.
         """
-        if id_paciente not in self.db:
-            print("❌ El paciente no existe.")
-            return
+        with self.repositorio.transaccion(self.ruta_db):
+            if id_paciente not in self.db:
+                print("❌ El paciente no existe.")
+                return
 
-        del self.db[id_paciente]
-        self._guardar_db()
+            del self.db[id_paciente]
+            if self._nombres is not None:
+                self._nombres.quitar(id_paciente)
+            self._guardar_db(id_paciente)
         print(f"🗑️ Paciente {id_paciente} eliminado.")
 
-    def listar_pacientes(self):
+    def eliminar_pacientes_batch(self, ids) -> list:
+        """
+        Elimina varios pacientes con una única escritura en disco. No toca
+        sus diagnósticos ni imágenes (ver ``gestor.integridad``).
+
+        Args:
+            ids (iterable): IDs de los pacientes a eliminar.
+
+        Returns:
+            list: IDs eliminados; se omiten los que no existían.
+        """
+        with self.repositorio.transaccion(self.ruta_db):
+            eliminados = []
+            for id_paciente in dict.fromkeys(ids):
+                if self.db.pop(id_paciente, None) is not None:
+                    if self._nombres is not None:
+                        self._nombres.quitar(id_paciente)
+                    eliminados.append(id_paciente)
+            if eliminados:
+                self._guardar_db(*eliminados)
+        return eliminados
+
+    def consultar_pacientes(self, id_desde: str = None, id_hasta: str = None, genero: str = None,
+                            limite: int = None, cursor: str = None):
         """
-        Lista todos los pacientes registrados.
+        Recorre los pacientes que cumplen los filtros, de a uno y sin copiar
+        la tabla.
+
+        Args:
+            id_desde (str, opcional): Primer ID incluido.
+            id_hasta (str, opcional): Último ID incluido.
+            genero (str, opcional): Género a buscar.
+            limite (int, opcional): Cantidad máxima de pacientes.
+            cursor (str, opcional): ID del último paciente de la página
+                anterior, para continuar a partir de él.
+
+        Yields:
+            Paciente: Pacientes en orden de registro.
+        """
+        filtro = None
+        if genero is not None:
+            filtro = lambda paciente: paciente.genero == genero
+        return recorrer(self.db, filtro=filtro, id_desde=id_desde, id_hasta=id_hasta,
+                        limite=limite, cursor=cursor)
+
+    def buscar_pacientes(self, texto: str, limite: int = 20, tolerante: bool = True) -> list:
+        """
+        Busca pacientes por nombre, sin distinguir mayúsculas ni acentos:
+        por el comienzo de cada palabra y, si se pide, admitiendo errores de
+        tipeo (ver ``IndiceNombres.buscar``).
+
+        Args:
+            texto (str): Nombre o parte del nombre.
+            limite (int): Cantidad máxima de pacientes.
+            tolerante (bool): Si es True se admiten errores de tipeo.
+
+        Returns:
+            list: Pacientes encontrados, primero los que coinciden sin errores.
+        """
+        return [self.db[id_paciente] for id_paciente in self.nombres.buscar(texto, limite, tolerante)]
+
+    def listar_pacientes(self, **filtros):
+        """
+        Lista los pacientes registrados.
+
+        Args:
+            **filtros: Filtros y paginación de ``consultar_pacientes``.
         """
         if not self.db:
             print("📭 No hay pacientes registrados.")
             return
 
         print("\n📋 Lista de pacientes:")
-        for pid, datos in self.db.items():
-            print(f"ID: {pid} | Nombre: {datos['nombre']} | Edad: {datos['edad']} | Género: {datos['genero']}")
+        for paciente in self.consultar_pacientes(**filtros):
+            print(f"ID: {paciente.id} | Nombre: {paciente.nombre} | Edad: {paciente.edad} | Género: {paciente.genero}")
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+from itertools import islice
+
+
+def resultado_ok(fila: int, id_registro: str) -> dict:
+    """
+    Arma la entrada del reporte para una fila registrada.
+
+    Args:
+        fila (int): Número de fila (desde 1).
+        id_registro (str): ID asignado.
+
+    Returns:
+        dict: Entrada del reporte.
+    """
+    return {"fila": fila, "estado": "ok", "id": id_registro}
+
+
+def resultado_error(fila: int, mensaje: str) -> dict:
+    """
+    Arma la entrada del reporte para una fila rechazada.
+
+    Args:
+        fila (int): Número de fila (desde 1).
+        mensaje (str): Motivo del rechazo.
+
+    Returns:
+        dict: Entrada del reporte.
+    """
+    return {"fila": fila, "estado": "error", "error": mensaje}
+
+
+def leer_filas(ruta: str):
+    """
+    Lee un archivo CSV (con encabezado) o JSONL fila por fila, sin cargarlo
+    completo en memoria.
+
+    Args:
+        ruta (str): Ruta del archivo; el formato se deduce de la extensión.
+
+    Yields:
+        dict: Una fila por registro.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    with open(ruta, "r", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+        elif extension in (".jsonl", ".ndjson"):
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+        else:
+            raise ValueError(f"Formato de importación no soportado: {extension}")
+
+
+def escribir_filas(ruta: str, filas) -> int:
+    """
+    Escribe filas en un archivo CSV o JSONL que después se puede volver a
+    leer con ``leer_filas``, sin armar antes una lista con todas.
+
+    Args:
+        ruta (str): Ruta del archivo; el formato se deduce de la extensión.
+        filas (iterable): Diccionarios a escribir (en CSV, todos con las
+            mismas claves que el primero).
+
+    Returns:
+        int: Cantidad de filas escritas.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in (".csv", ".jsonl", ".ndjson"):
+        raise ValueError(f"Formato de exportación no soportado: {extension}")
+    escritas = 0
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            escritor = None
+            for fila in filas:
+                if escritor is None:
+                    escritor = csv.DictWriter(f, fieldnames=list(fila))
+                    escritor.writeheader()
+                escritor.writerow(fila)
+                escritas += 1
+        else:
+            for fila in filas:
+                f.write(json.dumps(fila, ensure_ascii=False) + "\n")
+                escritas += 1
+    return escritas
+
+
+def importar_archivo(registrar_lote, ruta: str, tamano_lote: int = 5000) -> list:
+    """
+    Importa un archivo por lotes usando un método ``registrar_*_batch``.
+
+    Cada lote se valida y se persiste con una única escritura; los números
+    de fila del reporte se refieren a la posición en el archivo.
+
+    Args:
+        registrar_lote (callable): Método de lote de un gestor.
+        ruta (str): Ruta del archivo CSV o JSONL.
+        tamano_lote (int): Filas por lote.
+
+    Returns:
+        list: Reporte con una entrada por fila.
+    """
+    reporte = []
+    filas = leer_filas(ruta)
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            break
+        desplazamiento = len(reporte)
+        for entrada in registrar_lote(lote):
+            entrada["fila"] += desplazamiento
+            reporte.append(entrada)
+    return reporte
+
+
+def resumir(reporte: list) -> str:
+    """
+    Resume un reporte de importación en una línea.
+
+    Args:
+        reporte (list): Reporte devuelto por un método de lote.
+
+    Returns:
+        str: Cantidad de filas registradas y rechazadas.
+    """
+    errores = sum(1 for entrada in reporte if entrada["estado"] == "error")
+    return f"{len(reporte) - errores} registradas, {errores} rechazadas"
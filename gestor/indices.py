@@ -0,0 +1,760 @@
+import bisect
+import functools
+import re
+import unicodedata
+from collections import Counter
+
+# Marcas diacríticas que deja la descomposición NFKD (acentos, tilde de la
+# ñ, diéresis) y separadores entre palabras
+_DIACRITICOS = re.compile("[\u0300-\u036f]")
+_SEPARADORES = re.compile(r"[\W_]+")
+
+class IndiceInverso:
+    """
+    Índice secundario en memoria que asocia cada valor de un campo con los
+    IDs de los registros que lo tienen. Los IDs se guardan en un diccionario
+    para conservar el orden de inserción con altas y bajas en O(1).
+    """
+
+    def __init__(self, campo: str):
+        """
+        Inicializa el índice.
+
+        Args:
+            campo (str): Nombre del campo indexado.
+        """
+        self.campo = campo
+        self._ids = {}
+
+    def agregar(self, id_registro: str, registro):
+        """
+        Agrega un registro al índice.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object): Registro (objeto del modelo).
+        """
+        self._ids.setdefault(getattr(registro, self.campo, None), {})[id_registro] = None
+
+    def quitar(self, id_registro: str, registro):
+        """
+        Quita un registro del índice.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object): Registro (objeto del modelo).
+        """
+        valor = getattr(registro, self.campo, None)
+        ids = self._ids.get(valor)
+        if ids is None:
+            return
+        ids.pop(id_registro, None)
+        if not ids:
+            del self._ids[valor]
+
+    def buscar(self, valor) -> list:
+        """
+        Obtiene los IDs de los registros con un valor dado.
+
+        Args:
+            valor: Valor buscado.
+
+        Returns:
+            list: IDs en orden de inserción.
+        """
+        return list(self._ids.get(valor, ()))
+
+    def iterar(self, valor):
+        """
+        Recorre los IDs de los registros con un valor dado, sin copiarlos.
+        El índice no debe modificarse durante el recorrido.
+
+        Args:
+            valor: Valor buscado.
+
+        Returns:
+            iterator: IDs en orden de inserción.
+        """
+        return iter(self._ids.get(valor, ()))
+
+    def contar(self, valor) -> int:
+        """
+        Cuenta los registros con un valor dado.
+
+        Args:
+            valor: Valor buscado.
+
+        Returns:
+            int: Cantidad de registros.
+        """
+        return len(self._ids.get(valor, ()))
+
+    def contenido(self) -> dict:
+        """
+        Devuelve el índice como diccionario de conjuntos, para comparaciones.
+
+        Returns:
+            dict: Valor -> conjunto de IDs.
+        """
+        return {valor: set(ids) for valor, ids in self._ids.items()}
+
+
+class IndicesTabla:
+    """
+    Conjunto de índices inversos de una tabla, mantenidos en paralelo.
+    """
+
+    def __init__(self, *campos: str):
+        """
+        Inicializa los índices.
+
+        Args:
+            *campos (str): Campos a indexar.
+        """
+        self.campos = campos
+        self._indices = {campo: IndiceInverso(campo) for campo in campos}
+
+    def construir(self, db: dict):
+        """
+        Reconstruye todos los índices a partir de la tabla completa.
+
+        Args:
+            db (dict): Tabla de registros.
+        """
+        self._indices = {campo: IndiceInverso(campo) for campo in self.campos}
+        for id_registro, registro in db.items():
+            self.agregar(id_registro, registro)
+
+    def agregar(self, id_registro: str, registro):
+        """
+        Agrega un registro a todos los índices.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object): Registro (objeto del modelo).
+        """
+        for indice in self._indices.values():
+            indice.agregar(id_registro, registro)
+
+    def quitar(self, id_registro: str, registro):
+        """
+        Quita un registro de todos los índices.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object): Registro (objeto del modelo).
+        """
+        for indice in self._indices.values():
+            indice.quitar(id_registro, registro)
+
+    def actualizar(self, db: dict, cambios=None):
+        """
+        Pone los índices al día después de que la tabla cambió desde disco.
+
+        Args:
+            db (dict): Tabla ya actualizada.
+            cambios (list, opcional): Pares (ID, registro anterior o None) de
+                los registros que cambiaron; sin ellos se reconstruye todo.
+        """
+        if cambios is None:
+            self.construir(db)
+            return
+        for id_registro, anterior in cambios:
+            if anterior is not None:
+                self.quitar(id_registro, anterior)
+            if id_registro in db:
+                self.agregar(id_registro, db[id_registro])
+
+    def buscar(self, campo: str, valor) -> list:
+        """
+        Obtiene los IDs de los registros con un valor dado en un campo.
+
+        Args:
+            campo (str): Campo indexado.
+            valor: Valor buscado.
+
+        Returns:
+            list: IDs en orden de inserción.
+        """
+        return self._indices[campo].buscar(valor)
+
+    def iterar(self, campo: str, valor):
+        """
+        Recorre los IDs de los registros con un valor dado en un campo, sin
+        copiarlos.
+
+        Args:
+            campo (str): Campo indexado.
+            valor: Valor buscado.
+
+        Returns:
+            iterator: IDs en orden de inserción.
+        """
+        return self._indices[campo].iterar(valor)
+
+    def mas_selectivo(self, filtros: dict):
+        """
+        Elige, entre varios filtros por igualdad sobre campos indexados, el
+        que devuelve menos registros.
+
+        Args:
+            filtros (dict): Campo -> valor buscado; se ignoran los valores None.
+
+        Returns:
+            iterator or None: IDs del filtro más selectivo, o None si no hay
+            filtros.
+        """
+        activos = [(campo, valor) for campo, valor in filtros.items() if valor is not None]
+        if not activos:
+            return None
+        campo, valor = min(activos, key=lambda par: self.contar(*par))
+        return self.iterar(campo, valor)
+
+    def contar(self, campo: str, valor) -> int:
+        """
+        Cuenta los registros con un valor dado en un campo.
+
+        Args:
+            campo (str): Campo indexado.
+            valor: Valor buscado.
+
+        Returns:
+            int: Cantidad de registros.
+        """
+        return self._indices[campo].contar(valor)
+
+    def verificar(self, db: dict) -> list:
+        """
+        Reconstruye los índices desde cero y los compara con los actuales.
+
+        Args:
+            db (dict): Tabla de registros.
+
+        Returns:
+            list: Campos cuyo índice no coincide (vacía si todo está bien).
+        """
+        referencia = IndicesTabla(*self.campos)
+        referencia.construir(db)
+        return [
+            campo for campo in self.campos
+            if self._indices[campo].contenido() != referencia._indices[campo].contenido()
+        ]
+
+
+@functools.lru_cache(maxsize=65536)
+def normalizar(texto: str) -> str:
+    """
+    Normaliza un texto para buscarlo sin distinguir mayúsculas ni acentos:
+    "José  Pérez-Ñúñez" -> "jose perez nunez".
+
+    Args:
+        texto (str): Texto original.
+
+    Returns:
+        str: Palabras en minúsculas, sin diacríticos, separadas por un espacio.
+    """
+    sin_acentos = _DIACRITICOS.sub("", unicodedata.normalize("NFKD", texto.casefold()))
+    return " ".join(palabra for palabra in _SEPARADORES.split(sin_acentos) if palabra)
+
+
+def _gramas(palabra: str, largo: int) -> set:
+    marcada = f"${palabra}$"
+    return {marcada[i:i + largo] for i in range(len(marcada) - largo + 1)}
+
+
+def _bigramas_y_trigramas(palabra: str) -> set:
+    return _gramas(palabra, 2) | _gramas(palabra, 3)
+
+
+def tolerancia_para(palabra: str) -> int:
+    """
+    Cantidad de errores de tipeo admitidos según el largo de la palabra:
+    ninguno hasta 3 letras, uno hasta 7 y dos a partir de 8.
+    """
+    return 0 if len(palabra) <= 3 else 1 if len(palabra) <= 7 else 2
+
+
+def distancia_edicion(a: str, b: str, maximo: int) -> int:
+    """
+    Distancia de edición (inserciones, borrados, sustituciones y
+    trasposiciones de letras vecinas) acotada: deja de calcular en cuanto
+    supera ``maximo``.
+
+    Returns:
+        int: La distancia, o ``maximo + 1`` si es mayor que ``maximo``.
+    """
+    tope = maximo + 1
+    if abs(len(a) - len(b)) > maximo:
+        return tope
+    # El comienzo y el final comunes no cambian la distancia
+    inicio = 0
+    while inicio < len(a) and inicio < len(b) and a[inicio] == b[inicio]:
+        inicio += 1
+    fin_a, fin_b = len(a), len(b)
+    while fin_a > inicio and fin_b > inicio and a[fin_a - 1] == b[fin_b - 1]:
+        fin_a -= 1
+        fin_b -= 1
+    a, b = a[inicio:fin_a], b[inicio:fin_b]
+    if not a or not b:
+        return min(len(a) + len(b), tope)
+
+    # Solo se calcula la banda de la matriz a ``maximo`` de la diagonal: fuera
+    # de ella la distancia ya supera el máximo
+    previa = None
+    anterior = [j if j <= maximo else tope for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        actual = [tope] * (len(b) + 1)
+        if i <= maximo:
+            actual[0] = i
+        caracter = a[i - 1]
+        for j in range(max(1, i - maximo), min(len(b), i + maximo) + 1):
+            valor = anterior[j - 1] + (caracter != b[j - 1])
+            if anterior[j] < valor:
+                valor = anterior[j] + 1
+            if actual[j - 1] < valor:
+                valor = actual[j - 1] + 1
+            if (i > 1 and j > 1 and caracter == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previa[j - 2] < valor):
+                valor = previa[j - 2] + 1
+            actual[j] = valor
+        if min(actual) > maximo:
+            return tope
+        previa, anterior = anterior, actual
+    return min(anterior[-1], tope)
+
+
+class IndiceNombres:
+    """
+    Índice en memoria para buscar registros por nombre, sin distinguir
+    mayúsculas ni acentos, por prefijo y con tolerancia a errores de tipeo.
+
+    Cada nombre se normaliza y se parte en palabras. Las palabras distintas
+    se guardan ordenadas, así las que empiezan con un prefijo forman un
+    rango contiguo que se ubica con búsqueda binaria; cada palabra apunta a
+    los IDs que la usan. Para la búsqueda tolerante, cada palabra está
+    además indexada por sus bigramas y trigramas: las candidatas son las que
+    comparten suficientes con la buscada, y solo a ellas se les calcula la
+    distancia de edición.
+    """
+
+    def __init__(self, campo: str = "nombre"):
+        """
+        Inicializa el índice vacío.
+
+        Args:
+            campo (str): Campo de texto indexado.
+        """
+        self.campo = campo
+        self._vaciar()
+
+    def _vaciar(self):
+        self._palabras = []
+        self._ids = {}
+        self._palabras_de = {}
+        self._gramas = {}
+
+    def construir(self, db: dict):
+        """
+        Reconstruye el índice a partir de la tabla completa.
+
+        Args:
+            db (dict): Tabla de registros.
+        """
+        self._vaciar()
+        for id_registro, registro in db.items():
+            palabras = tuple(dict.fromkeys(normalizar(getattr(registro, self.campo, "") or "").split()))
+            self._palabras_de[id_registro] = palabras
+            for palabra in palabras:
+                self._ids.setdefault(palabra, {})[id_registro] = None
+        self._palabras = sorted(self._ids)
+        for palabra in self._palabras:
+            for grama in _bigramas_y_trigramas(palabra):
+                self._gramas.setdefault(grama, set()).add(palabra)
+
+    def agregar(self, id_registro: str, registro):
+        """
+        Agrega un registro al índice.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object): Registro (objeto del modelo).
+        """
+        palabras = tuple(dict.fromkeys(normalizar(getattr(registro, self.campo, "") or "").split()))
+        self._palabras_de[id_registro] = palabras
+        for palabra in palabras:
+            ids = self._ids.get(palabra)
+            if ids is None:
+                ids = self._ids[palabra] = {}
+                bisect.insort(self._palabras, palabra)
+                for grama in _bigramas_y_trigramas(palabra):
+                    self._gramas.setdefault(grama, set()).add(palabra)
+            ids[id_registro] = None
+
+    def quitar(self, id_registro: str, registro=None):
+        """
+        Quita un registro del índice. Se usan las palabras con las que se
+        indexó, así funciona aunque el registro ya se haya modificado.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object, opcional): No se usa; está por simetría con
+                ``IndiceInverso``.
+        """
+        for palabra in self._palabras_de.pop(id_registro, ()):
+            ids = self._ids[palabra]
+            ids.pop(id_registro, None)
+            if ids:
+                continue
+            del self._ids[palabra]
+            del self._palabras[bisect.bisect_left(self._palabras, palabra)]
+            for grama in _bigramas_y_trigramas(palabra):
+                self._gramas[grama].discard(palabra)
+                if not self._gramas[grama]:
+                    del self._gramas[grama]
+
+    def actualizar(self, db: dict, cambios=None):
+        """
+        Pone el índice al día después de que la tabla cambió desde disco.
+
+        Args:
+            db (dict): Tabla ya actualizada.
+            cambios (list, opcional): Pares (ID, registro anterior o None) de
+                los registros que cambiaron; sin ellos se reconstruye todo.
+        """
+        if cambios is None:
+            self.construir(db)
+            return
+        for id_registro, _ in cambios:
+            self.quitar(id_registro)
+            if id_registro in db:
+                self.agregar(id_registro, db[id_registro])
+
+    def _con_prefijo(self, prefijo: str) -> list:
+        inicio = bisect.bisect_left(self._palabras, prefijo)
+        fin = bisect.bisect_left(self._palabras, prefijo + "\U0010ffff", inicio)
+        return self._palabras[inicio:fin]
+
+    def _parecidas(self, palabra: str) -> list:
+        """
+        Palabras indexadas a distancia de edición tolerable de una dada.
+        Cada error cambia a lo sumo tres bigramas o cuatro trigramas (la
+        inversión de dos letras vecinas es el peor caso), así que una
+        palabra a distancia ``d`` comparte al menos ``bigramas - 3 * d`` y
+        ``trigramas - 4 * d`` con la buscada. Los trigramas descartan
+        muchas más candidatas, pero en las palabras cortas la cota no sirve
+        y se usan los bigramas.
+        """
+        maximo = tolerancia_para(palabra)
+        if maximo == 0:
+            return []
+        gramas = _gramas(palabra, 3)
+        minimo = len(gramas) - 4 * maximo
+        if minimo < 2:
+            gramas = _gramas(palabra, 2)
+            minimo = len(gramas) - 3 * maximo
+        if minimo <= 0:
+            # Palabras con letras muy repetidas ("aaaa"): el filtro no
+            # descarta nada y se comparan todas las de largo parecido
+            candidatas = [candidata for candidata in self._palabras
+                          if abs(len(candidata) - len(palabra)) <= maximo]
+        else:
+            comunes = Counter()
+            for grama in gramas:
+                comunes.update(self._gramas.get(grama, ()))
+            candidatas = [
+                candidata for candidata, cantidad in comunes.items()
+                if cantidad >= minimo and abs(len(candidata) - len(palabra)) <= maximo
+            ]
+        return [candidata for candidata in candidatas
+                if distancia_edicion(palabra, candidata, maximo) <= maximo]
+
+    def _buscar(self, opciones: list, limite: int, excluir: set) -> list:
+        """
+        Busca los registros que tienen, por cada término de la consulta,
+        alguna de sus palabras admitidas.
+
+        Args:
+            opciones (list): Para cada término, la lista de palabras admitidas.
+            limite (int): Cantidad máxima de resultados.
+            excluir (set): IDs ya encontrados, que no se repiten.
+
+        Returns:
+            list: IDs encontrados.
+        """
+        if not all(opciones):
+            return []
+        # Se recorren los IDs del término más selectivo y se verifican los demás
+        opciones = sorted(opciones, key=lambda palabras: sum(len(self._ids[p]) for p in palabras[:50]))
+        resto = [set(palabras) for palabras in opciones[1:]]
+        encontrados = []
+        for palabra in opciones[0]:
+            for id_registro in self._ids[palabra]:
+                if id_registro in excluir:
+                    continue
+                propias = self._palabras_de[id_registro]
+                if all(not admitidas.isdisjoint(propias) for admitidas in resto):
+                    excluir.add(id_registro)
+                    encontrados.append(id_registro)
+                    if len(encontrados) >= limite:
+                        return encontrados
+        return encontrados
+
+    def buscar(self, texto: str, limite: int = 20, tolerante: bool = True) -> list:
+        """
+        Busca registros por nombre. Cada palabra de la consulta debe ser el
+        comienzo de alguna palabra del nombre, en cualquier orden ("gom ma"
+        encuentra a "María Gómez"). Si no se llega al límite y se pide
+        tolerancia, se agregan los nombres que coinciden admitiendo errores
+        de tipeo en palabras completas ("maira gomes").
+
+        Args:
+            texto (str): Texto buscado.
+            limite (int): Cantidad máxima de resultados.
+            tolerante (bool): Si es True se admiten errores de tipeo.
+
+        Returns:
+            list: IDs encontrados; primero los que coinciden por prefijo.
+        """
+        terminos = normalizar(texto).split()
+        if not terminos or limite <= 0:
+            return []
+        prefijos = [self._con_prefijo(termino) for termino in terminos]
+        encontrados = self._buscar(prefijos, limite, set())
+        if tolerante and len(encontrados) < limite:
+            opciones = [
+                palabras + [p for p in self._parecidas(termino) if not p.startswith(termino)]
+                for termino, palabras in zip(terminos, prefijos)
+            ]
+            if opciones != prefijos:
+                encontrados += self._buscar(opciones, limite - len(encontrados), set(encontrados))
+        return encontrados
+
+    def contenido(self) -> dict:
+        """
+        Devuelve las palabras indexadas de cada registro, para comparaciones.
+
+        Returns:
+            dict: ID -> tupla de palabras normalizadas.
+        """
+        return dict(self._palabras_de)
+
+
+class _LineaDeTiempo:
+    """
+    Registros ordenados por fecha y, en la misma fecha, por ID numérico, en
+    dos listas paralelas (fechas e IDs) para ubicar rangos con búsqueda
+    binaria.
+    """
+
+    __slots__ = ("fechas", "ids")
+
+    def __init__(self):
+        self.fechas = []
+        self.ids = []
+
+    def _posicion(self, fecha: str, id_registro: str) -> int:
+        inicio = bisect.bisect_left(self.fechas, fecha)
+        fin = bisect.bisect_right(self.fechas, fecha, inicio)
+        return bisect.bisect_left(self.ids, int(id_registro), inicio, fin, key=int)
+
+    def agregar(self, fecha: str, id_registro: str):
+        posicion = self._posicion(fecha, id_registro)
+        self.fechas.insert(posicion, fecha)
+        self.ids.insert(posicion, id_registro)
+
+    def quitar(self, fecha: str, id_registro: str):
+        posicion = self._posicion(fecha, id_registro)
+        if posicion < len(self.ids) and self.ids[posicion] == id_registro:
+            del self.fechas[posicion]
+            del self.ids[posicion]
+
+    def limites(self, desde: str = None, hasta: str = None) -> tuple:
+        inicio = 0 if desde is None else bisect.bisect_left(self.fechas, desde)
+        fin = len(self.fechas) if hasta is None else bisect.bisect_right(self.fechas, hasta)
+        return inicio, max(inicio, fin)
+
+
+class IndiceFechas:
+    """
+    Índice en memoria de una tabla ordenada por un campo de fecha, para
+    consultas por rango en O(log N + k).
+
+    Las fechas "YYYY-MM-DD" se ordenan igual como texto que como fecha, así
+    que se comparan como texto, igual que ``en_rango``: un rango del índice
+    devuelve exactamente los registros que devolvería recorrer la tabla
+    filtrando por fecha. Los registros sin fecha no se indexan. Además de la
+    línea de tiempo de toda la tabla se mantiene una por grupo (por ejemplo,
+    por paciente), con la clave que devuelve la función ``grupo``.
+    """
+
+    def __init__(self, campo: str, grupo=None):
+        """
+        Inicializa el índice vacío.
+
+        Args:
+            campo (str): Campo de fecha indexado.
+            grupo (callable, opcional): Recibe el registro y devuelve la
+                clave de su grupo (o None si no pertenece a ninguno).
+        """
+        self.campo = campo
+        self.grupo = grupo
+        self._vaciar()
+
+    def _vaciar(self):
+        self._todos = _LineaDeTiempo()
+        self._grupos = {}
+        self._claves_de = {}
+
+    def _claves(self, registro) -> tuple:
+        fecha = getattr(registro, self.campo, None) or None
+        grupo = self.grupo(registro) if self.grupo is not None and fecha is not None else None
+        return fecha, grupo
+
+    def construir(self, db: dict):
+        """
+        Reconstruye el índice a partir de la tabla completa, ordenándola una
+        sola vez.
+
+        Args:
+            db (dict): Tabla de registros.
+        """
+        self._vaciar()
+        entradas = []
+        for id_registro, registro in db.items():
+            claves = self._claves(registro)
+            if claves[0] is not None:
+                self._claves_de[id_registro] = claves
+                entradas.append((claves[0], int(id_registro), id_registro, claves[1]))
+        entradas.sort()
+        self._todos.fechas = [entrada[0] for entrada in entradas]
+        self._todos.ids = [entrada[2] for entrada in entradas]
+        grupos = self._grupos
+        for fecha, _, id_registro, grupo in entradas:
+            if grupo is not None:
+                linea = grupos.get(grupo)
+                if linea is None:
+                    linea = grupos[grupo] = _LineaDeTiempo()
+                linea.fechas.append(fecha)
+                linea.ids.append(id_registro)
+
+    def _lineas(self, grupo, crear: bool = False) -> list:
+        lineas = [self._todos]
+        if grupo is not None:
+            linea = self._grupos.get(grupo)
+            if linea is None and crear:
+                linea = self._grupos[grupo] = _LineaDeTiempo()
+            if linea is not None:
+                lineas.append(linea)
+        return lineas
+
+    def agregar(self, id_registro: str, registro):
+        """
+        Agrega un registro al índice.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object): Registro (objeto del modelo).
+        """
+        fecha, grupo = self._claves(registro)
+        if fecha is None:
+            return
+        self._claves_de[id_registro] = (fecha, grupo)
+        for linea in self._lineas(grupo, crear=True):
+            linea.agregar(fecha, id_registro)
+
+    def quitar(self, id_registro: str, registro=None):
+        """
+        Quita un registro del índice. Se usan la fecha y el grupo con los
+        que se indexó, así funciona aunque el registro ya se haya modificado.
+
+        Args:
+            id_registro (str): ID del registro.
+            registro (object, opcional): No se usa; está por simetría con
+                ``IndiceInverso``.
+        """
+        claves = self._claves_de.pop(id_registro, None)
+        if claves is None:
+            return
+        fecha, grupo = claves
+        for linea in self._lineas(grupo):
+            linea.quitar(fecha, id_registro)
+        if grupo is not None and not self._grupos[grupo].ids:
+            del self._grupos[grupo]
+
+    def actualizar(self, db: dict, cambios=None):
+        """
+        Pone el índice al día después de que la tabla cambió desde disco.
+
+        Args:
+            db (dict): Tabla ya actualizada.
+            cambios (list, opcional): Pares (ID, registro anterior o None) de
+                los registros que cambiaron; sin ellos se reconstruye todo.
+        """
+        if cambios is None:
+            self.construir(db)
+            return
+        for id_registro, _ in cambios:
+            self.quitar(id_registro)
+            if id_registro in db:
+                self.agregar(id_registro, db[id_registro])
+
+    def rango(self, desde: str = None, hasta: str = None, grupo=None,
+              descendente: bool = False, limite: int = None) -> list:
+        """
+        Obtiene los IDs de los registros con fecha dentro de un rango.
+
+        Args:
+            desde (str, opcional): Fecha mínima (YYYY-MM-DD), inclusive.
+            hasta (str, opcional): Fecha máxima (YYYY-MM-DD), inclusive.
+            grupo (opcional): Si se indica, solo los registros de ese grupo.
+            descendente (bool): Si es True, de la fecha más reciente a la
+                más antigua.
+            limite (int, opcional): Cantidad máxima de IDs.
+
+        Returns:
+            list: IDs en orden cronológico (en la misma fecha, por ID).
+        """
+        linea = self._todos if grupo is None else self._grupos.get(grupo)
+        if linea is None:
+            return []
+        inicio, fin = linea.limites(desde, hasta)
+        if limite is not None:
+            limite = max(limite, 0)
+            if descendente:
+                inicio = max(inicio, fin - limite)
+            else:
+                fin = min(fin, inicio + limite)
+        ids = linea.ids[inicio:fin]
+        if descendente:
+            ids.reverse()
+        return ids
+
+    def contar(self, desde: str = None, hasta: str = None, grupo=None) -> int:
+        """
+        Cuenta los registros con fecha dentro de un rango, sin recorrerlos.
+
+        Args:
+            desde (str, opcional): Fecha mínima, inclusive.
+            hasta (str, opcional): Fecha máxima, inclusive.
+            grupo (opcional): Si se indica, solo los registros de ese grupo.
+
+        Returns:
+            int: Cantidad de registros.
+        """
+        linea = self._todos if grupo is None else self._grupos.get(grupo)
+        if linea is None:
+            return 0
+        inicio, fin = linea.limites(desde, hasta)
+        return fin - inicio
+
+    def contenido(self) -> dict:
+        """
+        Devuelve las líneas de tiempo como listas de pares, para comparaciones.
+
+        Returns:
+            dict: Grupo (None para toda la tabla) -> lista de (fecha, ID).
+        """
+        contenido = {None: list(zip(self._todos.fechas, self._todos.ids))}
+        for grupo, linea in self._grupos.items():
+            contenido[grupo] = list(zip(linea.fechas, linea.ids))
+        return contenido
@@ -0,0 +1,102 @@
+import contextlib
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from gestor.metadatos import leer_metadatos
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg")
+
+
+def es_jpeg(ruta: str) -> bool:
+    """
+    Verificación rápida de que un archivo es un JPEG completo: se recorren
+    sus marcadores hasta los datos comprimidos (ver
+    ``gestor.metadatos.leer_metadatos``) y debe terminar con el marcador EOI.
+
+    Args:
+        ruta (str): Ruta del archivo.
+
+    Returns:
+        bool: True si el archivo parece un JPEG válido.
+    """
+    try:
+        leer_metadatos(ruta)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def procesar_en_paralelo(funcion, tareas, trabajadores: int = 4, max_en_vuelo: int = None,
+                         progreso=None, pool=None):
+    """
+    Aplica ``funcion`` a cada tarea usando un pool de hilos, con una cola
+    acotada de tareas en vuelo para no leer todo por adelantado.
+
+    Los hilos alcanzan porque el trabajo (copiar y calcular hashes) pasa la
+    mayor parte del tiempo en E/S y en código C que libera el GIL.
+
+    Args:
+        funcion (callable): Función que procesa una tarea.
+        tareas (iterable): Tareas a procesar.
+        trabajadores (int): Cantidad de hilos; con 1 se procesa en serie.
+        max_en_vuelo (int, opcional): Tareas enviadas al pool sin terminar.
+            Por defecto, el doble de trabajadores.
+        progreso (callable, opcional): Se llama con la cantidad de tareas
+            terminadas después de cada una.
+        pool (Executor, opcional): Pool a usar en lugar de uno de hilos (por
+            ejemplo, de procesos para trabajo de CPU); no se cierra al final.
+
+    Yields:
+        tuple: (tarea, resultado, error), en orden de finalización. Solo uno
+        de resultado o error es distinto de None.
+    """
+    hechas = 0
+    if trabajadores <= 1 and pool is None:
+        for tarea in tareas:
+            try:
+                yield tarea, funcion(tarea), None
+            except (OSError, ValueError) as e:
+                yield tarea, None, e
+            hechas += 1
+            if progreso:
+                progreso(hechas)
+        return
+
+    max_en_vuelo = max_en_vuelo or trabajadores * 2
+    pendientes = {}
+    iterador = iter(tareas)
+    propio = ThreadPoolExecutor(max_workers=trabajadores) if pool is None else contextlib.nullcontext(pool)
+    with propio as pool:
+        while True:
+            for tarea in iterador:
+                pendientes[pool.submit(funcion, tarea)] = tarea
+                if len(pendientes) >= max_en_vuelo:
+                    break
+            if not pendientes:
+                break
+            listas, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in listas:
+                tarea = pendientes.pop(futuro)
+                try:
+                    yield tarea, futuro.result(), None
+                except (OSError, ValueError) as e:
+                    yield tarea, None, e
+                hechas += 1
+                if progreso:
+                    progreso(hechas)
+
+
+def listar_imagenes_carpeta(ruta: str) -> list:
+    """
+    Lista los archivos JPEG de una carpeta (sin subcarpetas).
+
+    Args:
+        ruta (str): Carpeta a recorrer.
+
+    Returns:
+        list: Nombres de archivo ordenados.
+    """
+    return sorted(
+        entrada.name for entrada in os.scandir(ruta)
+        if entrada.is_file() and entrada.name.lower().endswith(EXTENSIONES_IMAGEN)
+    )
@@ -0,0 +1,382 @@
+"""
+Integridad referencial entre pacientes, diagnósticos e imágenes: bajas en
+cascada y un barrido incremental de registros y archivos huérfanos.
+"""
+import contextlib
+import os
+import threading
+import time
+
+# Un archivo sin registro se considera huérfano recién pasado este tiempo
+# (en segundos): las altas copian la imagen antes de guardar su registro
+ANTIGUEDAD_MINIMA = 3600
+
+# Extensiones de los archivos que el barrido puede reclamar (las imágenes y
+# las copias temporales que deja un alta interrumpida)
+EXTENSIONES = (".jpg", ".jpeg", ".tmp")
+
+
+def listar_archivos(carpeta: str) -> list:
+    """
+    Lista los archivos de imagen de una carpeta y sus subcarpetas, salteando
+    los archivos y carpetas ocultos (vistas previas, cachés e índices).
+
+    Args:
+        carpeta (str): Carpeta de imágenes.
+
+    Returns:
+        list: Rutas relativas a la carpeta, con "/" como separador (como las
+        guarda la tabla en todos los sistemas), ordenadas.
+    """
+    archivos = []
+    for raiz, carpetas, nombres in os.walk(carpeta):
+        carpetas[:] = sorted(c for c in carpetas if not c.startswith("."))
+        relativa = os.path.relpath(raiz, carpeta)
+        for nombre in sorted(nombres):
+            if nombre.startswith(".") or not nombre.lower().endswith(EXTENSIONES):
+                continue
+            ruta = nombre if relativa == "." else os.path.join(relativa, nombre)
+            archivos.append(ruta.replace(os.sep, "/"))
+    return archivos
+
+
+class IntegridadReferencial:
+    """
+    Bajas que respetan las referencias entre las tres tablas.
+
+    Los índices inversos de los gestores (diagnósticos por paciente, imágenes
+    por diagnóstico y por archivo) dan los registros dependientes sin
+    recorrer las tablas. Cada baja toma los cerrojos de las tablas que toca,
+    siempre en el orden pacientes, diagnósticos, imágenes, y escribe cada
+    tabla una sola vez, empezando por las dependientes: si se interrumpe a
+    mitad de camino no deja registros que apunten a otros ya borrados.
+    """
+
+    def __init__(self, gestor_pacientes, gestor_diagnosticos, gestor_imagenes):
+        """
+        Inicializa el servicio sobre gestores que comparten repositorio.
+
+        Args:
+            gestor_pacientes (GestorPacientes): Gestor de pacientes.
+            gestor_diagnosticos (GestorDiagnosticos): Gestor de diagnósticos.
+            gestor_imagenes (GestorImagenes): Gestor de imágenes.
+        """
+        self.gestor_pacientes = gestor_pacientes
+        self.gestor_diagnosticos = gestor_diagnosticos
+        self.gestor_imagenes = gestor_imagenes
+        self.repositorio = gestor_pacientes.repositorio
+
+    @contextlib.contextmanager
+    def transaccion(self, *gestores):
+        """
+        Abre una transacción sobre las tablas de varios gestores a la vez.
+        Los cerrojos se toman siempre en el mismo orden, así dos procesos
+        que hacen bajas en cascada no se bloquean mutuamente.
+
+        Args:
+            *gestores: Gestores cuyas tablas se van a escribir.
+        """
+        orden = (self.gestor_pacientes, self.gestor_diagnosticos, self.gestor_imagenes)
+        with contextlib.ExitStack() as pila:
+            for gestor in orden:
+                if gestor in gestores:
+                    pila.enter_context(self.repositorio.transaccion(gestor.ruta_db))
+            yield
+
+    def _eliminar_diagnosticos(self, ids: list) -> tuple:
+        """
+        Elimina diagnósticos y sus imágenes; debe llamarse dentro de una
+        transacción sobre ambas tablas.
+
+        Returns:
+            tuple: (IDs de diagnósticos eliminados, IDs de imágenes eliminadas).
+        """
+        gestor_imagenes = self.gestor_imagenes
+        imagenes = [
+            id_imagen
+            for id_diagnostico in ids
+            for id_imagen in gestor_imagenes.indices.iterar("id_diagnostico", id_diagnostico)
+        ]
+        imagenes = gestor_imagenes.eliminar_imagenes_batch(imagenes)
+        return self.gestor_diagnosticos.eliminar_diagnosticos_batch(ids), imagenes
+
+    def eliminar_paciente(self, id_paciente: str):
+        """
+        Elimina un paciente junto con sus diagnósticos, los registros de sus
+        imágenes y los archivos que ya no usa ningún otro registro.
+
+        Args:
+            id_paciente (str): ID del paciente a eliminar.
+
+        Returns:
+            dict or None: IDs eliminados por tabla ("diagnosticos",
+            "imagenes"), o None si el paciente no existe.
+        """
+        with self.transaccion(self.gestor_pacientes, self.gestor_diagnosticos, self.gestor_imagenes):
+            if id_paciente not in self.gestor_pacientes.db:
+                print("❌ El paciente no existe.")
+                return None
+            diagnosticos, imagenes = self._eliminar_diagnosticos(
+                self.gestor_diagnosticos.indices.buscar("id_paciente", id_paciente)
+            )
+            self.gestor_pacientes.eliminar_paciente(id_paciente)
+        if diagnosticos:
+            print(f"🗑️ También se eliminaron {len(diagnosticos)} diagnósticos y {len(imagenes)} imágenes.")
+        return {"diagnosticos": diagnosticos, "imagenes": imagenes}
+
+    def eliminar_diagnostico(self, id_diagnostico: str):
+        """
+        Elimina un diagnóstico junto con sus imágenes.
+
+        Args:
+            id_diagnostico (str): ID del diagnóstico a eliminar.
+
+        Returns:
+            list or None: IDs de las imágenes eliminadas, o None si el
+            diagnóstico no existe.
+        """
+        with self.transaccion(self.gestor_diagnosticos, self.gestor_imagenes):
+            if id_diagnostico not in self.gestor_diagnosticos.db:
+                print("❌ El diagnóstico no existe.")
+                return None
+            _, imagenes = self._eliminar_diagnosticos([id_diagnostico])
+        print(f"🗑️ Diagnóstico {id_diagnostico} eliminado junto con {len(imagenes)} imágenes.")
+        return imagenes
+
+    def eliminar_pacientes(self, ids) -> dict:
+        """
+        Elimina varios pacientes con sus diagnósticos e imágenes, con una
+        sola escritura por tabla.
+
+        Args:
+            ids (iterable): IDs de los pacientes a eliminar.
+
+        Returns:
+            dict: IDs eliminados por tabla ("pacientes", "diagnosticos",
+            "imagenes"); se omiten los pacientes que no existían.
+        """
+        with self.transaccion(self.gestor_pacientes, self.gestor_diagnosticos, self.gestor_imagenes):
+            pacientes = [id_paciente for id_paciente in dict.fromkeys(ids)
+                         if id_paciente in self.gestor_pacientes.db]
+            diagnosticos, imagenes = self._eliminar_diagnosticos([
+                id_diagnostico
+                for id_paciente in pacientes
+                for id_diagnostico in self.gestor_diagnosticos.indices.iterar("id_paciente", id_paciente)
+            ])
+            self.gestor_pacientes.eliminar_pacientes_batch(pacientes)
+        return {"pacientes": pacientes, "diagnosticos": diagnosticos, "imagenes": imagenes}
+
+    def eliminar_diagnosticos(self, ids) -> dict:
+        """
+        Elimina varios diagnósticos con sus imágenes, con una sola escritura
+        por tabla.
+
+        Args:
+            ids (iterable): IDs de los diagnósticos a eliminar.
+
+        Returns:
+            dict: IDs eliminados por tabla ("diagnosticos", "imagenes"); se
+            omiten los diagnósticos que no existían.
+        """
+        with self.transaccion(self.gestor_diagnosticos, self.gestor_imagenes):
+            existentes = [id_diagnostico for id_diagnostico in dict.fromkeys(ids)
+                          if id_diagnostico in self.gestor_diagnosticos.db]
+            diagnosticos, imagenes = self._eliminar_diagnosticos(existentes)
+        return {"diagnosticos": diagnosticos, "imagenes": imagenes}
+
+
+class BarredorHuerfanos:
+    """
+    Busca y reclama, de a tandas, los datos que quedaron colgados: los
+    diagnósticos de pacientes inexistentes, las imágenes de diagnósticos
+    inexistentes y los archivos de ``imagenes/`` que ningún registro usa.
+
+    Cada llamada a ``paso`` revisa a lo sumo ``lote`` elementos de una fase
+    y termina, así puede intercalarse con el resto del trabajo sin frenarlo;
+    al llegar al final de una fase sigue con la próxima y, después de los
+    archivos, vuelve a empezar. ``iniciar`` corre los pasos en un hilo.
+    """
+
+    FASES = ("diagnosticos", "imagenes", "archivos")
+
+    def __init__(self, integridad: IntegridadReferencial, lote: int = 500,
+                 antiguedad_minima: float = ANTIGUEDAD_MINIMA, simular: bool = False):
+        """
+        Inicializa el barrido, sin empezarlo.
+
+        Args:
+            integridad (IntegridadReferencial): Servicio de bajas a usar.
+            lote (int): Elementos revisados por paso.
+            antiguedad_minima (float): Segundos que debe tener un archivo sin
+                registro para reclamarlo.
+            simular (bool): Si es True solo se cuentan los huérfanos, sin
+                eliminar nada.
+        """
+        self.integridad = integridad
+        self.lote = lote
+        self.antiguedad_minima = antiguedad_minima
+        self.simular = simular
+        self.vueltas = 0
+        self.encontrados = {fase: 0 for fase in self.FASES}
+        self.bytes_reclamados = 0
+        self._fase = 0
+        self._pendientes = None
+        self._posicion = 0
+        self._hilo = None
+        self._fin = threading.Event()
+
+    def _candidatos(self, fase: str) -> list:
+        """
+        Fotografía los elementos a revisar en una vuelta de la fase. Los que
+        se agreguen mientras tanto se revisan en la vuelta siguiente.
+        """
+        if fase == "diagnosticos":
+            return list(self.integridad.gestor_diagnosticos.db)
+        if fase == "imagenes":
+            return list(self.integridad.gestor_imagenes.db)
+        return listar_archivos(self.integridad.gestor_imagenes.carpeta_imagenes)
+
+    def paso(self) -> dict:
+        """
+        Revisa la próxima tanda de la fase actual y reclama los huérfanos.
+
+        Returns:
+            dict: "fase", "revisados" y "huerfanos" de este paso.
+        """
+        fase = self.FASES[self._fase]
+        if self._pendientes is None:
+            self._pendientes = self._candidatos(fase)
+            self._posicion = 0
+        tanda = self._pendientes[self._posicion:self._posicion + self.lote]
+        self._posicion += len(tanda)
+
+        huerfanos = self.reclamar(fase, tanda) if tanda else 0
+
+        if self._posicion >= len(self._pendientes):
+            self._pendientes = None
+            self._fase = (self._fase + 1) % len(self.FASES)
+            if self._fase == 0:
+                self.vueltas += 1
+        return {"fase": fase, "revisados": len(tanda), "huerfanos": huerfanos}
+
+    def barrer_todo(self) -> dict:
+        """
+        Da pasos hasta completar una vuelta entera por las tres fases.
+
+        Returns:
+            dict: Huérfanos encontrados por fase y bytes reclamados, solo de
+            esta vuelta.
+        """
+        antes = dict(self.encontrados, bytes=self.bytes_reclamados)
+        vuelta = self.vueltas
+        while self.vueltas == vuelta:
+            self.paso()
+        despues = dict(self.encontrados, bytes=self.bytes_reclamados)
+        return {clave: despues[clave] - antes[clave] for clave in despues}
+
+    def reclamar(self, fase: str, tanda: list) -> int:
+        """
+        Revisa elementos puntuales de una fase y reclama los que sean
+        huérfanos; cada uno se vuelve a comprobar con el cerrojo tomado.
+
+        Args:
+            fase (str): Una de ``FASES``.
+            tanda (list): IDs de diagnósticos o imágenes, o rutas de archivos
+                relativas a la carpeta de imágenes.
+
+        Returns:
+            int: Huérfanos encontrados (y eliminados, salvo que se simule).
+        """
+        huerfanos = getattr(self, f"_barrer_{fase}")(tanda)
+        self.encontrados[fase] += huerfanos
+        return huerfanos
+
+    def _barrer_diagnosticos(self, tanda: list) -> int:
+        integridad = self.integridad
+        # Se toman los tres cerrojos, en orden, aunque pacientes solo se lea
+        with integridad.transaccion(integridad.gestor_pacientes, integridad.gestor_diagnosticos,
+                                    integridad.gestor_imagenes):
+            pacientes = integridad.gestor_pacientes.db
+            diagnosticos = integridad.gestor_diagnosticos.db
+            huerfanos = [
+                id_diagnostico for id_diagnostico in tanda
+                if id_diagnostico in diagnosticos
+                and diagnosticos[id_diagnostico].id_paciente not in pacientes
+            ]
+            if huerfanos and not self.simular:
+                _, imagenes = integridad._eliminar_diagnosticos(huerfanos)
+                # Sus imágenes también eran huérfanas, aunque su fase no las vea
+                self.encontrados["imagenes"] += len(imagenes)
+        return len(huerfanos)
+
+    def _barrer_imagenes(self, tanda: list) -> int:
+        integridad = self.integridad
+        with integridad.transaccion(integridad.gestor_diagnosticos, integridad.gestor_imagenes):
+            diagnosticos = integridad.gestor_diagnosticos.db
+            imagenes = integridad.gestor_imagenes.db
+            huerfanas = [
+                id_imagen for id_imagen in tanda
+                if id_imagen in imagenes and imagenes[id_imagen].id_diagnostico not in diagnosticos
+            ]
+            if huerfanas and not self.simular:
+                integridad.gestor_imagenes.eliminar_imagenes_batch(huerfanas)
+        return len(huerfanas)
+
+    def _barrer_archivos(self, tanda: list) -> int:
+        gestor = self.integridad.gestor_imagenes
+        limite = time.time() - self.antiguedad_minima
+        candidatos = []
+        for relativa in tanda:
+            if gestor.indices.contar("archivo", relativa):
+                continue
+            ruta = os.path.join(gestor.carpeta_imagenes, relativa)
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                continue
+            # copystat conserva la fecha de modificación del original: la de
+            # cambio de estado dice cuándo llegó el archivo a la carpeta
+            if max(estado.st_mtime, estado.st_ctime) <= limite:
+                candidatos.append((relativa, ruta, estado.st_size))
+        if not candidatos or self.simular:
+            return len(candidatos)
+
+        huerfanos = 0
+        with gestor.repositorio.transaccion(gestor.ruta_db):
+            for relativa, ruta, tamano in candidatos:
+                # Se vuelve a mirar con la tabla al día y el cerrojo tomado
+                if gestor.indices.contar("archivo", relativa):
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(ruta)
+                    huerfanos += 1
+                    self.bytes_reclamados += tamano
+        return huerfanos
+
+    def iniciar(self, intervalo: float = 60.0):
+        """
+        Corre un paso cada ``intervalo`` segundos en un hilo aparte. Quien lo
+        use no debe leer las tablas desde otro hilo mientras tanto.
+
+        Args:
+            intervalo (float): Segundos entre pasos.
+        """
+        if self._hilo is not None:
+            return
+        self._fin.clear()
+        self._hilo = threading.Thread(target=self._correr, args=(intervalo,),
+                                      name="barrido-huerfanos", daemon=True)
+        self._hilo.start()
+
+    def _correr(self, intervalo: float):
+        while not self._fin.wait(intervalo):
+            self.paso()
+
+    def detener(self):
+        """
+        Detiene el hilo del barrido, esperando a que termine el paso en curso.
+        """
+        hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            self._fin.set()
+            hilo.join()
@@ -0,0 +1,149 @@
+"""
+Lectura de metadatos de capturas JPEG sin decodificar los píxeles: se
+recorren solo los marcadores del archivo hasta el comienzo de los datos
+comprimidos (SOS), y del bloque EXIF solo las etiquetas de fecha.
+"""
+import datetime
+import os
+import struct
+
+# Marcadores SOF (Start Of Frame) que traen el tamaño de la imagen; C4, C8 y
+# CC tienen números parecidos pero son tablas, no cuadros
+MARCADORES_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                  0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Marcadores sin segmento (no llevan largo)
+MARCADORES_SUELTOS = {0x01} | set(range(0xD0, 0xD8))
+MARCADOR_SOS = 0xDA
+MARCADOR_EOI = 0xD9
+MARCADOR_APP1 = 0xE1
+
+ETIQUETA_FECHA = 0x0132
+ETIQUETA_EXIF = 0x8769
+# Fecha de la toma y, si falta, la de digitalización
+ETIQUETAS_FECHA_EXIF = (0x9003, 0x9004)
+
+
+def leer_metadatos(ruta: str) -> dict:
+    """
+    Lee el tamaño en píxeles y la fecha EXIF de una captura JPEG,
+    validando su estructura.
+
+    Args:
+        ruta (str): Ruta del archivo.
+
+    Returns:
+        dict: "ancho" y "alto" en píxeles, "tamano_bytes" y "fecha_exif"
+        ("YYYY-MM-DD", o "" si el archivo no la trae).
+
+    Raises:
+        ValueError: Si el archivo no es un JPEG o está truncado o dañado.
+        OSError: Si el archivo no se puede leer.
+    """
+    tamano = os.path.getsize(ruta)
+    ancho = alto = None
+    fecha = ""
+    with open(ruta, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            raise ValueError("El archivo no es un JPEG (falta el marcador de inicio).")
+        while True:
+            if f.read(1) != b"\xff":
+                raise ValueError("El JPEG está dañado (marcador inválido).")
+            marcador = f.read(1)
+            # Los 0xFF repetidos son relleno entre segmentos
+            while marcador == b"\xff":
+                marcador = f.read(1)
+            if not marcador:
+                raise ValueError("El JPEG está truncado.")
+            marcador = marcador[0]
+            if marcador in MARCADORES_SUELTOS:
+                continue
+            if marcador == MARCADOR_EOI:
+                raise ValueError("El JPEG no tiene datos de imagen.")
+
+            largo = f.read(2)
+            if len(largo) < 2 or int.from_bytes(largo, "big") < 2:
+                raise ValueError("El JPEG está dañado (segmento inválido).")
+            largo = int.from_bytes(largo, "big") - 2
+            if f.tell() + largo > tamano:
+                raise ValueError("El JPEG está truncado.")
+
+            if marcador == MARCADOR_SOS:
+                break
+            if marcador in MARCADORES_SOF:
+                if largo < 6:
+                    raise ValueError("El JPEG está dañado (cuadro inválido).")
+                alto, ancho = struct.unpack(">xHH", f.read(5))
+                f.seek(largo - 5, os.SEEK_CUR)
+            elif marcador == MARCADOR_APP1 and not fecha:
+                fecha = _fecha_exif(f.read(largo))
+            else:
+                f.seek(largo, os.SEEK_CUR)
+
+        if not ancho or not alto:
+            raise ValueError("El JPEG no indica el tamaño de la imagen.")
+        # Los datos comprimidos no se leen: alcanza con que el archivo
+        # termine con el marcador EOI (algunas cámaras agregan relleno)
+        f.seek(max(f.tell(), tamano - 1024))
+        if b"\xff\xd9" not in f.read():
+            raise ValueError("El JPEG está truncado (falta el marcador de fin).")
+    return {"ancho": ancho, "alto": alto, "tamano_bytes": tamano, "fecha_exif": fecha}
+
+
+def _fecha_exif(segmento: bytes) -> str:
+    """
+    Busca la fecha de captura en un segmento APP1 con datos EXIF. Un bloque
+    EXIF dañado no invalida la imagen: simplemente no aporta fecha.
+
+    Returns:
+        str: Fecha "YYYY-MM-DD", o "" si no hay una válida.
+    """
+    if not segmento.startswith(b"Exif\x00\x00"):
+        return ""
+    tiff = segmento[6:]
+    orden = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if orden is None:
+        return ""
+    try:
+        principal = _leer_ifd(tiff, struct.unpack_from(orden + "I", tiff, 4)[0], orden)
+        exif = {}
+        if ETIQUETA_EXIF in principal:
+            desplazamiento = struct.unpack_from(orden + "I", principal[ETIQUETA_EXIF][2])[0]
+            exif = _leer_ifd(tiff, desplazamiento, orden)
+        for etiquetas, ifd in ((ETIQUETAS_FECHA_EXIF, exif), ((ETIQUETA_FECHA,), principal)):
+            for etiqueta in etiquetas:
+                if etiqueta in ifd:
+                    fecha = _texto_fecha(tiff, ifd[etiqueta], orden)
+                    if fecha:
+                        return fecha
+    except struct.error:
+        pass
+    return ""
+
+
+def _leer_ifd(tiff: bytes, desplazamiento: int, orden: str) -> dict:
+    """
+    Lee las entradas de un directorio (IFD) TIFF.
+
+    Returns:
+        dict: Para cada etiqueta, (tipo, cantidad, 4 bytes de valor o
+        desplazamiento).
+    """
+    cantidad = struct.unpack_from(orden + "H", tiff, desplazamiento)[0]
+    entradas = {}
+    for inicio in range(desplazamiento + 2, desplazamiento + 2 + 12 * cantidad, 12):
+        etiqueta, tipo, cuenta = struct.unpack_from(orden + "HHI", tiff, inicio)
+        entradas[etiqueta] = (tipo, cuenta, tiff[inicio + 8:inicio + 12])
+    return entradas
+
+
+def _texto_fecha(tiff: bytes, entrada: tuple, orden: str) -> str:
+    tipo, cuenta, valor = entrada
+    if tipo != 2 or cuenta < 10:  # 2 = ASCII
+        return ""
+    inicio = struct.unpack_from(orden + "I", valor)[0]
+    texto = tiff[inicio:inicio + 10].decode("ascii", "replace")
+    try:
+        # "YYYY:MM:DD HH:MM:SS"; las cámaras sin reloj escriben ceros
+        return datetime.datetime.strptime(texto, "%Y:%m:%d").strftime("%Y-%m-%d")
+    except ValueError:
+        return ""
@@ -0,0 +1,438 @@
+"""
+Instrumentación opcional de los gestores y de la persistencia.
+
+Mientras está desactivada no agrega ningún costo: los métodos son los
+originales. ``activar`` reemplaza los de los gestores, y los de carga,
+recarga y guardado del repositorio y de los almacenes, por versiones que
+cuentan llamadas y errores, arman un histograma de tiempos y suman los bytes
+leídos y escritos en disco por cada método; ``desactivar`` deja todo como
+estaba. Así la lectura de una tabla o su recarga tras la escritura de otro
+proceso aparecen con su propia clave ("AlmacenJSON.cargar",
+"Repositorio._refrescar") y no solo dentro del método del gestor que la
+provocó.
+
+Uso:
+    from gestor import metricas
+    metricas.activar(ruta_volcado="metricas.json", intervalo=30)
+    ...
+    print(metricas.instantanea())
+"""
+import functools
+import json
+import mmap
+import os
+import shutil
+import sys
+import threading
+import time
+import types
+
+# Límites superiores de los intervalos del histograma, en milisegundos
+LIMITES_MS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# Módulos cuyas lecturas y escrituras de archivos se cuentan
+MODULOS_ES = ("gestor.almacenamiento", "gestor.binario", "gestor.contenido", "gestor.importacion",
+              "gestor.ingesta", "gestor.repositorio")
+# Módulos cuyas lecturas con mmap se cuentan
+MODULOS_MMAP = ("gestor.binario",)
+
+_cerrojo = threading.Lock()
+_estadisticas = {}
+_pila = threading.local()
+_originales = []
+_volcador = None
+
+
+class _Estadistica:
+    """
+    Contadores de un método instrumentado.
+    """
+
+    __slots__ = ("llamadas", "errores", "total", "minimo", "maximo", "histograma",
+                 "bytes_leidos", "bytes_escritos")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.errores = 0
+        self.total = 0.0
+        self.minimo = None
+        self.maximo = 0.0
+        self.histograma = [0] * (len(LIMITES_MS) + 1)
+        self.bytes_leidos = 0
+        self.bytes_escritos = 0
+
+    def registrar(self, segundos: float, error: bool):
+        """
+        Suma una llamada terminada. Debe llamarse con el cerrojo tomado.
+
+        Args:
+            segundos (float): Duración de la llamada.
+            error (bool): True si la llamada terminó con una excepción.
+        """
+        self.llamadas += 1
+        self.errores += error
+        self.total += segundos
+        self.minimo = segundos if self.minimo is None else min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+        milisegundos = segundos * 1000
+        for i, limite in enumerate(LIMITES_MS):
+            if milisegundos <= limite:
+                self.histograma[i] += 1
+                break
+        else:
+            self.histograma[-1] += 1
+
+    def a_dict(self) -> dict:
+        """
+        Convierte los contadores a un diccionario serializable.
+
+        Returns:
+            dict: Contadores, tiempos en milisegundos e histograma.
+        """
+        etiquetas = [f"<={limite}ms" for limite in LIMITES_MS] + [f">{LIMITES_MS[-1]}ms"]
+        return {
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "total_ms": round(self.total * 1000, 3),
+            "media_ms": round(self.total * 1000 / self.llamadas, 3) if self.llamadas else None,
+            "min_ms": round(self.minimo * 1000, 3) if self.minimo is not None else None,
+            "max_ms": round(self.maximo * 1000, 3),
+            "histograma": dict(zip(etiquetas, self.histograma)),
+            "bytes_leidos": self.bytes_leidos,
+            "bytes_escritos": self.bytes_escritos,
+        }
+
+
+def _activos() -> list:
+    """
+    Métodos instrumentados en curso en el hilo actual (el más interno al
+    final).
+    """
+    pila = getattr(_pila, "metodos", None)
+    if pila is None:
+        pila = _pila.metodos = []
+    return pila
+
+
+def _sumar_bytes(leidos: int = 0, escritos: int = 0):
+    """
+    Atribuye bytes de E/S a todos los métodos en curso del hilo actual, de
+    modo que cada método incluye lo que hacen los que llama.
+    """
+    pila = _activos()
+    if not pila:
+        return
+    with _cerrojo:
+        for nombre in set(pila):
+            estadistica = _estadisticas[nombre]
+            estadistica.bytes_leidos += leidos
+            estadistica.bytes_escritos += escritos
+
+
+def _largo(datos) -> int:
+    return len(datos.encode("utf-8")) if isinstance(datos, str) else len(datos)
+
+
+class _ArchivoMedido:
+    """
+    Envoltorio de un archivo abierto que cuenta los bytes leídos y escritos.
+    """
+
+    def __init__(self, archivo):
+        self._archivo = archivo
+
+    def __getattr__(self, nombre):
+        return getattr(self._archivo, nombre)
+
+    def __enter__(self):
+        self._archivo.__enter__()
+        return self
+
+    def __exit__(self, *excepcion):
+        return self._archivo.__exit__(*excepcion)
+
+    def __iter__(self):
+        for linea in self._archivo:
+            _sumar_bytes(leidos=_largo(linea))
+            yield linea
+
+    def read(self, *args):
+        datos = self._archivo.read(*args)
+        _sumar_bytes(leidos=_largo(datos))
+        return datos
+
+    def readline(self, *args):
+        datos = self._archivo.readline(*args)
+        _sumar_bytes(leidos=_largo(datos))
+        return datos
+
+    def write(self, datos):
+        _sumar_bytes(escritos=_largo(datos))
+        return self._archivo.write(datos)
+
+
+class _MapaMedido:
+    """
+    Envoltorio de un ``mmap`` que cuenta los bytes leídos con cada corte.
+    """
+
+    def __init__(self, mapa):
+        self._mapa = mapa
+
+    def __getattr__(self, nombre):
+        return getattr(self._mapa, nombre)
+
+    def __len__(self):
+        return len(self._mapa)
+
+    def __getitem__(self, indice):
+        datos = self._mapa[indice]
+        _sumar_bytes(leidos=len(datos) if isinstance(datos, bytes) else 1)
+        return datos
+
+
+# Reemplazo del módulo mmap en los módulos de MODULOS_MMAP
+_mmap_medido = types.SimpleNamespace(
+    mmap=lambda *args, **kwargs: _MapaMedido(mmap.mmap(*args, **kwargs)),
+    ACCESS_READ=mmap.ACCESS_READ,
+)
+
+
+def _open_medido(*args, **kwargs):
+    return _ArchivoMedido(open(*args, **kwargs))
+
+
+_copy2_original = shutil.copy2
+
+
+def _copy2_medido(origen, destino, *args, **kwargs):
+    resultado = _copy2_original(origen, destino, *args, **kwargs)
+    tamano = os.path.getsize(resultado)
+    _sumar_bytes(leidos=tamano, escritos=tamano)
+    return resultado
+
+
+def _medir_generador(nombre: str, generador):
+    """
+    Mide el recorrido completo de un generador devuelto por un método de
+    consulta, en lugar de solo su creación.
+    """
+    pila = _activos()
+    inicio = time.perf_counter()
+    error = False
+    try:
+        while True:
+            pila.append(nombre)
+            try:
+                elemento = next(generador)
+            except StopIteration:
+                return
+            finally:
+                pila.pop()
+            yield elemento
+    except GeneratorExit:
+        # Quien consume dejó de recorrer antes del final: no es un error
+        raise
+    except BaseException:
+        error = True
+        raise
+    finally:
+        with _cerrojo:
+            _estadisticas[nombre].registrar(time.perf_counter() - inicio, error)
+
+
+def _instrumentar(nombre: str, funcion):
+    """
+    Crea la versión medida de un método.
+
+    Args:
+        nombre (str): Clave de las métricas ("Clase.metodo").
+        funcion (callable): Método original.
+
+    Returns:
+        callable: Método que mide cada llamada y delega en el original.
+    """
+    _estadisticas.setdefault(nombre, _Estadistica())
+
+    @functools.wraps(funcion)
+    def medido(*args, **kwargs):
+        pila = _activos()
+        pila.append(nombre)
+        inicio = time.perf_counter()
+        error = False
+        try:
+            resultado = funcion(*args, **kwargs)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            pila.pop()
+            if error or not isinstance(resultado, types.GeneratorType):
+                with _cerrojo:
+                    _estadisticas[nombre].registrar(segundos, error)
+        if isinstance(resultado, types.GeneratorType):
+            return _medir_generador(nombre, resultado)
+        return resultado
+
+    return medido
+
+
+def _clases_gestores() -> list:
+    from gestor.gestor_diagnosticos import GestorDiagnosticos
+    from gestor.gestor_imagenes import GestorImagenes
+    from gestor.gestor_pacientes import GestorPacientes
+    return [GestorPacientes, GestorDiagnosticos, GestorImagenes]
+
+
+def _metodos_persistencia() -> list:
+    """
+    Métodos de carga, recarga y guardado de las tablas.
+
+    Returns:
+        list: Pares (clase, nombres de métodos).
+    """
+    from gestor.almacenamiento import AlmacenBinario, AlmacenDiario, AlmacenJSON, AlmacenSQLite
+    from gestor.repositorio import Repositorio, _Tabla
+    almacen = ("cargar", "refrescar", "guardar", "confirmar")
+    return [
+        (Repositorio, ("_recargar", "_refrescar", "_fusionar", "guardar", "_confirmar")),
+        (_Tabla, ("cargar",)),
+        (AlmacenJSON, almacen),
+        (AlmacenDiario, almacen + ("compactar",)),
+        (AlmacenBinario, almacen),
+        (AlmacenSQLite, almacen),
+    ]
+
+
+def activar(ruta_volcado: str = None, intervalo: float = 60.0, clases=None):
+    """
+    Activa la instrumentación. Llamarla de nuevo no hace nada si ya está
+    activa.
+
+    Args:
+        ruta_volcado (str, opcional): Archivo JSON donde volcar las métricas
+            periódicamente (y al desactivar).
+        intervalo (float): Segundos entre volcados.
+        clases (list, opcional): Clases a instrumentar (todos sus métodos);
+            por defecto los tres gestores más la carga y el guardado del
+            repositorio y de los almacenes.
+    """
+    global _volcador
+    if _originales:
+        return
+    objetivos = [
+        (clase, [nombre for nombre, funcion in vars(clase).items()
+                 if isinstance(funcion, types.FunctionType) and not nombre.startswith("__")])
+        for clase in clases or _clases_gestores()
+    ]
+    if clases is None:
+        objetivos += _metodos_persistencia()
+    # Se resuelven todos antes de reemplazar ninguno: un método heredado
+    # (AlmacenBinario.guardar) se mide en la subclase con su propia clave y
+    # sin pasar también por la versión medida de la clase base
+    metodos = [(clase, nombre, getattr(clase, nombre), nombre in vars(clase))
+               for clase, nombres in objetivos for nombre in nombres]
+    for clase, nombre, funcion, propio in metodos:
+        _originales.append((clase, nombre, funcion if propio else None))
+        setattr(clase, nombre, _instrumentar(f"{clase.__name__}.{nombre}", funcion))
+    for modulo in MODULOS_ES:
+        if modulo in sys.modules:
+            _originales.append((sys.modules[modulo], "open", None))
+            sys.modules[modulo].open = _open_medido
+    for modulo in MODULOS_MMAP:
+        if modulo in sys.modules:
+            _originales.append((sys.modules[modulo], "mmap", mmap))
+            sys.modules[modulo].mmap = _mmap_medido
+    _originales.append((shutil, "copy2", _copy2_original))
+    shutil.copy2 = _copy2_medido
+
+    if ruta_volcado:
+        _volcador = _Volcador(ruta_volcado, intervalo)
+        _volcador.start()
+
+
+def desactivar():
+    """
+    Restaura los métodos originales y hace un último volcado. Las métricas
+    acumuladas se conservan hasta ``reiniciar``.
+    """
+    global _volcador
+    if _volcador is not None:
+        _volcador.detener()
+        _volcador = None
+    while _originales:
+        objeto, nombre, original = _originales.pop()
+        if original is None:
+            delattr(objeto, nombre)
+        else:
+            setattr(objeto, nombre, original)
+
+
+def activa() -> bool:
+    """
+    Indica si la instrumentación está activa.
+
+    Returns:
+        bool: True si los métodos están instrumentados.
+    """
+    return bool(_originales)
+
+
+def instantanea() -> dict:
+    """
+    Devuelve una copia de las métricas acumuladas.
+
+    Returns:
+        dict: "Clase.metodo" -> contadores (ver ``_Estadistica.a_dict``).
+    """
+    with _cerrojo:
+        return {
+            nombre: estadistica.a_dict()
+            for nombre, estadistica in sorted(_estadisticas.items())
+            if estadistica.llamadas
+        }
+
+
+def reiniciar():
+    """
+    Pone en cero todas las métricas.
+    """
+    with _cerrojo:
+        for nombre in _estadisticas:
+            _estadisticas[nombre] = _Estadistica()
+
+
+def volcar(ruta: str):
+    """
+    Escribe las métricas en un archivo JSON, reemplazándolo de forma atómica.
+
+    Args:
+        ruta (str): Archivo de destino.
+    """
+    datos = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "metodos": instantanea()}
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=4)
+    os.replace(temporal, ruta)
+
+
+class _Volcador(threading.Thread):
+    """
+    Hilo que vuelca las métricas a un archivo cada cierto intervalo.
+    """
+
+    def __init__(self, ruta: str, intervalo: float):
+        super().__init__(name="volcado-metricas", daemon=True)
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._fin = threading.Event()
+
+    def run(self):
+        while not self._fin.wait(self.intervalo):
+            volcar(self.ruta)
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+        volcar(self.ruta)
@@ -0,0 +1,100 @@
+import argparse
+import os
+
+from gestor.almacenamiento import AlmacenBinario, AlmacenDiario, AlmacenJSON, AlmacenSQLite
+
+ARCHIVOS_TABLAS = ("db_pacientes.json", "db_diagnostico.json", "db_imagen.json")
+
+
+def migrar_a_sqlite(rutas_json) -> dict:
+    """
+    Importa las tablas JSON a la base SQLite ubicada en la misma carpeta.
+
+    Se leen con el almacén de diario, de modo que también se incorporan los
+    cambios pendientes en ``.wal`` si los hubiera. Las tablas SQLite de
+    destino se reemplazan completas, así que la migración puede repetirse.
+
+    Args:
+        rutas_json (iterable): Rutas de los archivos ``db_*.json``.
+
+    Returns:
+        dict: Cantidad de registros migrados por archivo.
+    """
+    migrados = {}
+    for ruta in rutas_json:
+        origen = AlmacenDiario(ruta, en_segundo_plano=False)
+        db = origen.cargar()
+        origen.cerrar()
+        destino = AlmacenSQLite(ruta)
+        destino.guardar(db)
+        destino.cerrar()
+        migrados[ruta] = len(db)
+    return migrados
+
+
+def migrar_a_binario(rutas_json) -> dict:
+    """
+    Convierte las tablas JSON a instantáneas binarias (``db_*.bin``) en la
+    misma carpeta, incorporando los cambios pendientes en ``.wal``. Los
+    JSON no se modifican.
+
+    Args:
+        rutas_json (iterable): Rutas de los archivos ``db_*.json``.
+
+    Returns:
+        dict: Cantidad de registros migrados por archivo.
+    """
+    migrados = {}
+    for ruta in rutas_json:
+        origen = AlmacenDiario(ruta, en_segundo_plano=False)
+        db = origen.cargar()
+        origen.cerrar()
+        destino = AlmacenBinario(ruta)
+        destino.guardar(db)
+        destino.cerrar()
+        migrados[ruta] = len(db)
+    return migrados
+
+
+def migrar_a_json(rutas_json) -> dict:
+    """
+    Vuelve a escribir los JSON a partir de las instantáneas binarias, para
+    dejar el modo binario. Las tablas sin ``.bin`` se dejan como están.
+
+    Args:
+        rutas_json (iterable): Rutas de los archivos ``db_*.json``.
+
+    Returns:
+        dict: Cantidad de registros migrados por archivo.
+    """
+    migrados = {}
+    for ruta in rutas_json:
+        origen = AlmacenBinario(ruta)
+        if not os.path.exists(origen.ruta_binaria):
+            origen.cerrar()
+            continue
+        db = origen.cargar()
+        origen.cerrar()
+        destino = AlmacenJSON(ruta)
+        destino.guardar(db)
+        destino.cerrar()
+        migrados[ruta] = len(db)
+    return migrados
+
+
+MIGRACIONES = {
+    "sqlite": migrar_a_sqlite,
+    "binario": migrar_a_binario,
+    "json": migrar_a_json,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte las tablas a otro formato de almacenamiento.")
+    parser.add_argument("carpeta", nargs="?", default="data", help="Carpeta de las tablas (por defecto data).")
+    parser.add_argument("--formato", choices=sorted(MIGRACIONES), default="sqlite",
+                        help="Formato de destino: sqlite o binario desde los JSON, json desde los .bin.")
+    args = parser.parse_args()
+    rutas = [os.path.join(args.carpeta, nombre) for nombre in ARCHIVOS_TABLAS]
+    for ruta, cantidad in MIGRACIONES[args.formato](rutas).items():
+        print(f"✅ {ruta}: {cantidad} registros migrados")
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él no hay vistas previas
+    Image = None
+
+TAMANOS = (128, 256, 512)
+PRESUPUESTO_BYTES = 64 * 1024 * 1024
+
+
+class CacheMiniaturas:
+    """
+    Caché en disco de vistas previas reducidas de las imágenes.
+
+    Las vistas previas se generan la primera vez que se piden, en uno de los
+    tamaños fijos de ``TAMANOS``. La clave incluye la ruta, la fecha de
+    modificación y el tamaño del original, así que una imagen reemplazada
+    nunca devuelve una vista vieja. Cuando la caché supera su presupuesto se
+    eliminan las vistas usadas hace más tiempo (LRU).
+    """
+
+    def __init__(self, carpeta: str, presupuesto_bytes: int = PRESUPUESTO_BYTES,
+                 tamanos: tuple = TAMANOS):
+        """
+        Inicializa la caché.
+
+        Args:
+            carpeta (str): Carpeta donde se guardan las vistas previas.
+            presupuesto_bytes (int): Tamaño máximo total de la caché.
+            tamanos (tuple): Lados máximos permitidos, en píxeles.
+        """
+        self.carpeta = carpeta
+        self.presupuesto_bytes = presupuesto_bytes
+        self.tamanos = tamanos
+        self._cerrojo = threading.Lock()
+        self._entradas = None
+        self._total = 0
+
+    @staticmethod
+    def disponible() -> bool:
+        """
+        Indica si se pueden generar vistas previas (requiere Pillow).
+
+        Returns:
+            bool: True si Pillow está instalado.
+        """
+        return Image is not None
+
+    def _cargar_entradas(self):
+        """
+        Reconstruye el orden LRU a partir de los archivos en disco; la fecha
+        de modificación de cada vista previa registra su último uso.
+        """
+        os.makedirs(self.carpeta, exist_ok=True)
+        archivos = [e for e in os.scandir(self.carpeta) if e.name.endswith(".jpg")]
+        archivos.sort(key=lambda e: e.stat().st_mtime_ns)
+        self._entradas = OrderedDict((e.name, e.stat().st_size) for e in archivos)
+        self._total = sum(self._entradas.values())
+
+    def _clave(self, ruta_origen: str, tamano: int) -> str:
+        """
+        Calcula el nombre de archivo de una vista previa.
+
+        Args:
+            ruta_origen (str): Imagen original.
+            tamano (int): Lado máximo de la vista previa.
+
+        Returns:
+            str: Nombre del archivo en la caché.
+        """
+        st = os.stat(ruta_origen)
+        firma = f"{os.path.abspath(ruta_origen)}|{st.st_mtime_ns}|{st.st_size}"
+        return f"{hashlib.sha1(firma.encode('utf-8')).hexdigest()}_{tamano}.jpg"
+
+    def obtener(self, ruta_origen: str, tamano: int = 256) -> str:
+        """
+        Devuelve la ruta de la vista previa de una imagen, generándola si
+        todavía no está en la caché.
+
+        Args:
+            ruta_origen (str): Imagen original.
+            tamano (int): Lado máximo de la vista previa; debe ser uno de
+                los tamaños configurados.
+
+        Returns:
+            str: Ruta de la vista previa.
+        """
+        if tamano not in self.tamanos:
+            raise ValueError(f"Tamaño de vista previa no soportado: {tamano}")
+        if Image is None:
+            raise RuntimeError("Las vistas previas requieren Pillow (pip install pillow).")
+
+        nombre = self._clave(ruta_origen, tamano)
+        ruta = os.path.join(self.carpeta, nombre)
+        with self._cerrojo:
+            if self._entradas is None:
+                self._cargar_entradas()
+            if nombre in self._entradas and os.path.exists(ruta):
+                self._entradas.move_to_end(nombre)
+                os.utime(ruta)
+                return ruta
+
+        self._generar(ruta_origen, ruta, tamano)
+        with self._cerrojo:
+            self._total -= self._entradas.pop(nombre, 0)
+            self._entradas[nombre] = os.path.getsize(ruta)
+            self._total += self._entradas[nombre]
+            self._desalojar(conservar=nombre)
+        return ruta
+
+    def _generar(self, ruta_origen: str, ruta: str, tamano: int):
+        """
+        Genera una vista previa reducida.
+
+        Args:
+            ruta_origen (str): Imagen original.
+            ruta (str): Ruta de la vista previa.
+            tamano (int): Lado máximo en píxeles.
+        """
+        with Image.open(ruta_origen) as imagen:
+            # draft() permite al decodificador JPEG reducir la escala al
+            # decodificar, sin procesar la imagen a resolución completa
+            imagen.draft("RGB", (tamano, tamano))
+            imagen = imagen.convert("RGB")
+            imagen.thumbnail((tamano, tamano))
+            # El PID evita choques con otros procesos que usan la misma carpeta
+            temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                imagen.save(temporal, "JPEG", quality=85)
+                os.replace(temporal, ruta)
+            except BaseException:
+                # Un temporal no entra en el presupuesto ni se desaloja nunca
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                raise
+
+    def _desalojar(self, conservar: str = None):
+        """
+        Elimina las vistas previas menos usadas hasta respetar el presupuesto.
+        Debe llamarse con el cerrojo tomado.
+
+        Args:
+            conservar (str, opcional): Entrada que no debe eliminarse.
+        """
+        while self._total > self.presupuesto_bytes and len(self._entradas) > 1:
+            nombre, tamano = next(iter(self._entradas.items()))
+            if nombre == conservar:
+                break
+            del self._entradas[nombre]
+            self._total -= tamano
+            ruta = os.path.join(self.carpeta, nombre)
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    def precalentar(self, rutas, trabajadores: int = 4, tamanos: tuple = None) -> int:
+        """
+        Genera en paralelo las vistas previas de varias imágenes.
+
+        Args:
+            rutas (iterable): Imágenes originales.
+            trabajadores (int): Hilos a utilizar.
+            tamanos (tuple, opcional): Tamaños a generar; por defecto todos.
+
+        Returns:
+            int: Cantidad de vistas previas disponibles al terminar.
+        """
+        tareas = [(ruta, tamano) for ruta in rutas for tamano in (tamanos or self.tamanos)]
+        generadas = 0
+        with ThreadPoolExecutor(max_workers=trabajadores) as pool:
+            futuros = [pool.submit(self.obtener, ruta, tamano) for ruta, tamano in tareas]
+            for futuro in futuros:
+                try:
+                    futuro.result()
+                    generadas += 1
+                except (OSError, ValueError):
+                    pass
+        return generadas
@@ -0,0 +1,438 @@
+import contextlib
+import json
+import os
+
+from gestor.almacenamiento import crear_almacen
+
+
+def _maximo_id(ids) -> int:
+    """
+    Obtiene el mayor ID numérico de una colección de IDs.
+
+    Args:
+        ids (iterable): IDs (cadenas numéricas).
+
+    Returns:
+        int: Mayor ID, 0 si no hay ninguno numérico.
+    """
+    return max((int(i) for i in ids if str(i).isdigit()), default=0)
+
+
+class _Tabla:
+    """
+    Estado en memoria de una tabla compartida. Los registros se leen de
+    disco recién cuando alguien los pide (``db`` es None hasta entonces).
+    """
+
+    def __init__(self, almacen, ruta_db: str):
+        self.almacen = almacen
+        self.ruta_manifiesto = ruta_db + ".manifiesto"
+        self.db = None
+        self.oyentes = []
+        self.version = 0
+        self.ultimo_id = 0
+
+    def leer_manifiesto(self, firma):
+        """
+        Lee el manifiesto de la tabla si corresponde a la firma indicada.
+
+        El manifiesto es un archivo pequeño con el último ID usado y la
+        cantidad de registros. Guarda además la firma de los archivos de la
+        tabla al escribirse: si la tabla cambió después (otro proceso, una
+        compactación), se descarta.
+
+        Args:
+            firma: Firma actual del almacén.
+
+        Returns:
+            dict or None: Manifiesto válido, o None.
+        """
+        try:
+            with open(self.ruta_manifiesto, "r", encoding="utf-8") as f:
+                manifiesto = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifiesto.get("firma") != json.loads(json.dumps(firma)):
+            return None
+        return manifiesto
+
+    def escribir_manifiesto(self, registros: int):
+        """
+        Persiste el manifiesto con la firma actual del almacén. Es solo una
+        optimización: si no se puede escribir, se recalcula en la próxima carga.
+
+        Args:
+            registros (int): Cantidad de registros de la tabla.
+        """
+        manifiesto = {
+            "ultimo_id": self.ultimo_id,
+            "registros": registros,
+            "firma": self.almacen.firma(),
+        }
+        temporal = f"{self.ruta_manifiesto}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(manifiesto, f)
+            os.replace(temporal, self.ruta_manifiesto)
+        except OSError:
+            pass
+
+    def cargar(self) -> dict:
+        """
+        Lee los registros del almacén y actualiza el último ID, usando el
+        manifiesto si sigue vigente para no recorrer todas las claves.
+
+        Returns:
+            dict: Registros leídos.
+        """
+        firma = self.almacen.firma()
+        datos = self.almacen.cargar()
+        manifiesto = self.leer_manifiesto(firma)
+        if manifiesto is not None and manifiesto.get("registros") == len(datos):
+            self.ultimo_id = max(self.ultimo_id, manifiesto["ultimo_id"])
+            return datos
+        self.ultimo_id = max(self.ultimo_id, _maximo_id(datos))
+        self.escribir_manifiesto(len(datos))
+        return datos
+
+
+class Repositorio:
+    """
+    Capa compartida por los gestores. Mantiene en memoria una única copia de
+    cada tabla, de modo que las verificaciones referenciales (por ejemplo,
+    si existe un paciente al registrar un diagnóstico) no vuelven a leer el
+    archivo JSON. Si otro proceso modifica un archivo, el cambio se detecta
+    por su fecha de modificación y tamaño y la tabla se recarga.
+
+    Varios procesos pueden trabajar sobre la misma carpeta: las escrituras
+    toman el cerrojo de archivo de la tabla y, si otro proceso la modificó,
+    primero incorporan sus cambios (ver ``transaccion`` y ``guardar``).
+    """
+
+    def __init__(self, modo_almacen: str = "json", sincronizar: bool = False):
+        """
+        Inicializa el repositorio.
+
+        Args:
+            modo_almacen (str): Modo de persistencia de las tablas que se
+                abran sin un almacén explícito ("json", "diario", "binario" o
+                "sqlite").
+            sincronizar (bool): Si es True cada escritura se fuerza a disco
+                con ``fsync`` antes de darse por terminada.
+        """
+        self.modo_almacen = modo_almacen
+        self.sincronizar = sincronizar
+        self._tablas = {}
+        self._modelos = {}
+        # Tabla -> IDs por escribir (None: la tabla completa) mientras hay
+        # un bloque ``escrituras_diferidas`` abierto
+        self._diferidas = None
+
+    def declarar(self, ruta_db: str, modelo):
+        """
+        Indica la clase de los registros de una tabla, sin cargarla todavía.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            modelo (type): Clase con ``from_dict``/``to_dict``.
+        """
+        self._modelos.setdefault(ruta_db, modelo)
+
+    def abrir(self, ruta_db: str, modelo) -> dict:
+        """
+        Declara el modelo de una tabla y devuelve sus registros en memoria.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            modelo (type): Clase con ``from_dict``/``to_dict``.
+
+        Returns:
+            dict: Registros de la tabla, indexados por ID.
+        """
+        self.declarar(ruta_db, modelo)
+        return self.tabla(ruta_db)
+
+    def registrar(self, ruta_db: str, almacen):
+        """
+        Asocia un almacén concreto a una tabla antes de abrirla.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            almacen (AlmacenJSON): Almacén a utilizar.
+        """
+        self._tablas[ruta_db] = _Tabla(almacen, ruta_db)
+
+    def _obtener_tabla(self, ruta_db: str, cargar: bool = True) -> _Tabla:
+        """
+        Devuelve la tabla, abriéndola o recargándola si hace falta.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            cargar (bool): Si es False no se leen los registros; sirve para
+                operaciones que no los necesitan (registrar oyentes).
+
+        Returns:
+            _Tabla: Estado de la tabla.
+        """
+        tabla = self._tablas.get(ruta_db)
+        if tabla is None:
+            almacen = crear_almacen(ruta_db, self.modo_almacen, self._modelos.get(ruta_db),
+                                    self.sincronizar)
+            tabla = _Tabla(almacen, ruta_db)
+            self._tablas[ruta_db] = tabla
+        if tabla.db is None:
+            if cargar:
+                tabla.db = tabla.cargar()
+        elif tabla.almacen.modificado_externamente():
+            with tabla.almacen.cerrojo.compartido():
+                # Otro hilo pudo haberla puesto al día mientras se esperaba
+                if tabla.almacen.modificado_externamente():
+                    self._refrescar(tabla)
+        return tabla
+
+    def _refrescar(self, tabla: _Tabla):
+        """
+        Incorpora los cambios que otros procesos hicieron en disco. Si el
+        almacén puede aplicar solo lo nuevo (modo diario), se avisa a los
+        oyentes qué registros cambiaron; si no, se recarga la tabla.
+
+        Args:
+            tabla (_Tabla): Tabla a poner al día.
+        """
+        cambios = tabla.almacen.refrescar(tabla.db)
+        if cambios is None:
+            self._recargar(tabla)
+            return
+        tabla.version += 1
+        tabla.ultimo_id = max(tabla.ultimo_id, _maximo_id(id_registro for id_registro, _ in cambios))
+        for oyente in tabla.oyentes:
+            oyente(cambios)
+
+    def _recargar(self, tabla: _Tabla):
+        """
+        Relee la tabla desde disco conservando el mismo diccionario, para que
+        las referencias que tienen los gestores sigan siendo válidas.
+
+        Args:
+            tabla (_Tabla): Tabla a recargar.
+        """
+        datos = tabla.cargar()
+        tabla.db.clear()
+        tabla.db.update(datos)
+        tabla.version += 1
+        for oyente in tabla.oyentes:
+            oyente()
+
+    def _fusionar(self, tabla: _Tabla, ids):
+        """
+        Pone la tabla al día con el disco sin perder los cambios propios
+        todavía no guardados: se apartan los registros modificados, se
+        incorporan los de otros procesos y se vuelven a aplicar encima.
+
+        Args:
+            tabla (_Tabla): Tabla a fusionar.
+            ids (iterable): IDs modificados en memoria.
+        """
+        propios = {id_registro: tabla.db.get(id_registro) for id_registro in ids}
+        self._refrescar(tabla)
+        cambios = [(id_registro, tabla.db.get(id_registro)) for id_registro in propios]
+        for id_registro, registro in propios.items():
+            if registro is None:
+                tabla.db.pop(id_registro, None)
+            else:
+                tabla.db[id_registro] = registro
+        for oyente in tabla.oyentes:
+            oyente(cambios)
+
+    @contextlib.contextmanager
+    def transaccion(self, ruta_db: str):
+        """
+        Agrupa una lectura y las escrituras que dependen de ella (por
+        ejemplo, generar un ID y guardar el alta) para que ningún otro
+        proceso escriba la tabla en el medio.
+
+        Al entrar se toma el cerrojo exclusivo de la tabla y se incorporan
+        los cambios de otros procesos; al salir se libera el cerrojo y se
+        confirma lo escrito. Las transacciones se pueden anidar.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+
+        Yields:
+            dict: Registros de la tabla, al día con el disco.
+        """
+        tabla = self._obtener_tabla(ruta_db, cargar=False)
+        try:
+            with tabla.almacen.cerrojo.exclusivo():
+                yield self._obtener_tabla(ruta_db).db
+        finally:
+            self._confirmar(tabla)
+
+    def _confirmar(self, tabla: _Tabla):
+        """
+        Completa las escrituras de una tabla (``fsync`` agrupado,
+        compactación) una vez que el hilo soltó su cerrojo.
+
+        Args:
+            tabla (_Tabla): Tabla escrita.
+        """
+        if not tabla.almacen.cerrojo.retenido():
+            tabla.almacen.confirmar(tabla.db)
+
+    def tabla(self, ruta_db: str) -> dict:
+        """
+        Obtiene el diccionario en memoria de una tabla.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+
+        Returns:
+            dict: Registros de la tabla, indexados por ID.
+        """
+        return self._obtener_tabla(ruta_db).db
+
+    def existe(self, ruta_db: str, id_registro: str) -> bool:
+        """
+        Verifica si un registro existe en una tabla.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            id_registro (str): ID buscado.
+
+        Returns:
+            bool: True si el registro existe.
+        """
+        return id_registro in self._obtener_tabla(ruta_db).db
+
+    def obtener(self, ruta_db: str, id_registro: str):
+        """
+        Obtiene un registro de una tabla.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            id_registro (str): ID buscado.
+
+        Returns:
+            object or None: Registro (objeto del modelo), None si no existe.
+        """
+        return self._obtener_tabla(ruta_db).db.get(id_registro)
+
+    def guardar(self, ruta_db: str, ids=()):
+        """
+        Persiste los cambios de una tabla. Si otro proceso la modificó desde
+        la última lectura, sus cambios se incorporan antes de escribir, así
+        no se pisan (ver ``_fusionar``).
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            ids (iterable): IDs modificados.
+        """
+        tabla = self._tablas[ruta_db]
+        if self._diferidas is not None:
+            if not ids:
+                self._diferidas[ruta_db] = None
+            elif self._diferidas.get(ruta_db, {}) is not None:
+                self._diferidas.setdefault(ruta_db, {}).update(dict.fromkeys(ids))
+            tabla.version += 1
+            tabla.ultimo_id = max(tabla.ultimo_id, _maximo_id(ids) if ids else _maximo_id(tabla.db))
+            return
+        with tabla.almacen.cerrojo.exclusivo():
+            if ids and tabla.almacen.modificado_externamente():
+                self._fusionar(tabla, ids)
+            tabla.almacen.guardar(tabla.db, ids)
+            tabla.version += 1
+            tabla.ultimo_id = max(tabla.ultimo_id, _maximo_id(ids) if ids else _maximo_id(tabla.db))
+            tabla.escribir_manifiesto(len(tabla.db))
+        self._confirmar(tabla)
+
+    @contextlib.contextmanager
+    def escrituras_diferidas(self):
+        """
+        Agrupa las escrituras de un bloque: dentro de él ``guardar`` solo
+        anota los IDs modificados, y al salir cada tabla se escribe una sola
+        vez (con los IDs de todas las operaciones del bloque). Los bloques
+        se pueden anidar; escribe el de más afuera.
+
+        Hasta la salida los cambios solo están en memoria, así que conviene
+        abrirlo dentro de una transacción sobre las tablas que se van a
+        modificar, para que ningún otro proceso escriba en el medio.
+        """
+        if self._diferidas is not None:
+            yield
+            return
+        self._diferidas = {}
+        try:
+            yield
+        finally:
+            pendientes, self._diferidas = self._diferidas, None
+            for ruta_db, ids in pendientes.items():
+                self.guardar(ruta_db, () if ids is None else list(ids))
+
+    def ultimo_id(self, ruta_db: str) -> int:
+        """
+        Obtiene el último ID numérico usado en una tabla.
+
+        Si la tabla todavía no se cargó y su manifiesto está vigente, el
+        valor sale del manifiesto sin leer los registros; si no, se carga la
+        tabla (lo que también regenera el manifiesto).
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+
+        Returns:
+            int: Último ID usado, 0 si la tabla está vacía.
+        """
+        tabla = self._obtener_tabla(ruta_db, cargar=False)
+        if tabla.db is None:
+            manifiesto = tabla.leer_manifiesto(tabla.almacen.firma())
+            if manifiesto is not None:
+                return max(tabla.ultimo_id, manifiesto["ultimo_id"])
+            self._obtener_tabla(ruta_db)
+        return tabla.ultimo_id
+
+    def cargada(self, ruta_db: str) -> bool:
+        """
+        Indica si los registros de una tabla ya están en memoria.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+
+        Returns:
+            bool: True si la tabla ya se leyó de disco.
+        """
+        tabla = self._tablas.get(ruta_db)
+        return tabla is not None and tabla.db is not None
+
+    def version(self, ruta_db: str) -> int:
+        """
+        Obtiene un contador que aumenta cada vez que la tabla cambia, ya sea
+        por una escritura propia o por una recarga desde disco. Sirve para
+        invalidar datos derivados (cachés, columnas de análisis).
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+
+        Returns:
+            int: Versión actual de la tabla en memoria.
+        """
+        return self._obtener_tabla(ruta_db).version
+
+    def al_recargar(self, ruta_db: str, oyente):
+        """
+        Registra una función que se llama cada vez que la tabla se recarga
+        desde disco.
+
+        Args:
+            ruta_db (str): Ruta de la tabla.
+            oyente (callable): Sin argumentos si se recargó la tabla completa;
+                si solo cambiaron algunos registros, recibe la lista de pares
+                (ID, registro anterior o None).
+        """
+        self._obtener_tabla(ruta_db, cargar=False).oyentes.append(oyente)
+
+    def cerrar(self):
+        """
+        Espera a que terminen las escrituras pendientes de todas las tablas.
+        """
+        for tabla in self._tablas.values():
+            tabla.almacen.cerrar()
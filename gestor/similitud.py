@@ -0,0 +1,394 @@
+"""
+Búsqueda de capturas casi duplicadas por huella perceptual.
+
+La huella de una imagen es un dHash de 256 bits: cada bit indica si un
+píxel de la imagen reducida a 17x16 en escala de grises es más brillante
+que su vecino de la derecha. Recomprimir, reescalar o retocar levemente
+una captura cambia pocos bits, así que dos capturas de la misma toma
+quedan a poca distancia de Hamming. Las huellas se indexan en un árbol BK,
+que descarta ramas enteras sin compararlas.
+
+Con huellas tan largas las distancias entre capturas distintas se
+concentran alrededor de la mitad de los bits y un único árbol terminaría
+recorriendo casi todos sus nodos. Por eso la huella se parte en
+``SEGMENTOS`` trozos con un árbol cada uno: si dos huellas difieren en a
+lo sumo ``d`` bits, algún trozo difiere en a lo sumo ``d // SEGMENTOS``
+(principio del palomar), y buscar con ese radio tan chico en cada árbol
+visita muy pocos nodos.
+"""
+import json
+import os
+import threading
+
+from gestor.bloqueo import CerrojoArchivo
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él no se calculan huellas
+    Image = None
+
+LADO_HUELLA = 16
+BITS_HUELLA = LADO_HUELLA * LADO_HUELLA
+# Distancia hasta la cual dos capturas se consideran posibles duplicados
+# (con 256 bits, capturas distintas quedan a más de 25)
+DISTANCIA_DUPLICADO = 16
+SEGMENTOS = 8
+BITS_SEGMENTO = BITS_HUELLA // SEGMENTOS
+# Orden de los píxeles comparados en la huella: cada segmento reúne
+# diagonales de la cuadrícula, así todos mezclan bits del borde negro (casi
+# iguales en todas las capturas) con bits del centro de la retina
+_ORDEN = sorted(
+    ((fila + columna) % LADO_HUELLA % SEGMENTOS, fila * (LADO_HUELLA + 1) + columna)
+    for fila in range(LADO_HUELLA) for columna in range(LADO_HUELLA)
+)
+
+
+def disponible() -> bool:
+    """
+    Indica si se pueden calcular huellas (requiere Pillow).
+
+    Returns:
+        bool: True si Pillow está instalado.
+    """
+    return Image is not None
+
+
+def huella_perceptual(ruta: str) -> int:
+    """
+    Calcula la huella perceptual (dHash) de una imagen.
+
+    Args:
+        ruta (str): Ruta del archivo de imagen.
+
+    Returns:
+        int: Huella de ``BITS_HUELLA`` bits.
+
+    Raises:
+        OSError: Si el archivo no se puede leer o no es una imagen.
+    """
+    with Image.open(ruta) as imagen:
+        # El decodificador JPEG reduce la escala mientras lee
+        imagen.draft("L", (LADO_HUELLA * 8, LADO_HUELLA * 8))
+        pixeles = imagen.convert("L").resize((LADO_HUELLA + 1, LADO_HUELLA), Image.BOX).tobytes()
+    huella = 0
+    for _, pixel in _ORDEN:
+        huella = (huella << 1) | (pixeles[pixel] > pixeles[pixel + 1])
+    return huella
+
+
+def distancia(huella_a: int, huella_b: int) -> int:
+    """
+    Distancia de Hamming entre dos huellas (bits distintos).
+    """
+    return bin(huella_a ^ huella_b).count("1")
+
+
+def segmentos(huella: int) -> list:
+    """
+    Parte una huella en los ``SEGMENTOS`` trozos que se indexan por separado.
+
+    Returns:
+        list: Un entero por segmento.
+    """
+    mascara = (1 << BITS_SEGMENTO) - 1
+    return [(huella >> (BITS_SEGMENTO * segmento)) & mascara for segmento in range(SEGMENTOS)]
+
+
+class _ArbolBK:
+    """
+    Árbol BK en memoria sobre los valores de un segmento. Los nodos se
+    guardan en listas paralelas y se identifican por su posición.
+    """
+
+    def __init__(self):
+        self.valores = []
+        self.hijos = []
+        self.miembros = []
+        self.nodo_de = {}
+
+    def crear(self, valor: int, padre: int, distancia_padre: int) -> int:
+        nodo = len(self.valores)
+        self.valores.append(valor)
+        self.hijos.append({})
+        self.miembros.append(set())
+        self.nodo_de[valor] = nodo
+        if padre >= 0:
+            self.hijos[padre][distancia_padre] = nodo
+        return nodo
+
+    def ubicar(self, valor: int):
+        """
+        Busca dónde colgar un valor que todavía no está en el árbol.
+
+        Returns:
+            tuple: (padre, distancia al padre); (-1, 0) si el árbol está vacío.
+        """
+        if not self.valores:
+            return -1, 0
+        nodo = 0
+        while True:
+            distancia_nodo = distancia(valor, self.valores[nodo])
+            hijo = self.hijos[nodo].get(distancia_nodo)
+            if hijo is None:
+                return nodo, distancia_nodo
+            nodo = hijo
+
+    def buscar(self, valor: int, radio: int):
+        """
+        Recorre los nodos a distancia ``radio`` o menos de un valor.
+
+        Yields:
+            int: Nodos encontrados.
+        """
+        pendientes = [0] if self.valores else []
+        while pendientes:
+            nodo = pendientes.pop()
+            distancia_nodo = distancia(valor, self.valores[nodo])
+            if distancia_nodo <= radio:
+                yield nodo
+            for distancia_hijo, hijo in self.hijos[nodo].items():
+                if abs(distancia_hijo - distancia_nodo) <= radio:
+                    pendientes.append(hijo)
+
+
+class IndiceHuellas:
+    """
+    Índice persistente de huellas perceptuales por ID de imagen, organizado
+    como un árbol BK por segmento de la huella.
+
+    Cada nodo de un árbol es un valor distinto del segmento (varias
+    imágenes pueden compartirlo) y sus hijos cuelgan según su distancia al
+    nodo. Para buscar a distancia ``d`` de un valor que está a ``x`` de un
+    nodo, por la desigualdad triangular solo hay que bajar a los hijos cuya
+    distancia esté entre ``x - d`` y ``x + d``. Las candidatas que aparecen
+    en algún árbol se comparan después con la huella completa.
+
+    Los árboles se guardan como un diario JSON de líneas que solo crece:
+    altas de imágenes (con el padre y la distancia de los nodos que crearon)
+    y bajas. Al abrirlo se reconstruyen sin calcular ninguna distancia, y
+    lo que agregan otros procesos se incorpora leyendo solo el final del
+    archivo. Cuando las bajas acumuladas superan a las imágenes vigentes,
+    el diario se reescribe con árboles nuevos.
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Inicializa el índice sin leerlo.
+
+        Args:
+            ruta (str): Archivo del diario del índice.
+        """
+        self.ruta = ruta
+        self.cerrojo = CerrojoArchivo(ruta + ".lock")
+        self._cerrojo = threading.Lock()
+        self._vaciar()
+        self._inodo = None
+
+    @staticmethod
+    def disponible() -> bool:
+        """
+        Indica si se pueden calcular huellas (requiere Pillow).
+
+        Returns:
+            bool: True si Pillow está instalado.
+        """
+        return disponible()
+
+    def _vaciar(self):
+        self._arboles = [_ArbolBK() for _ in range(SEGMENTOS)]
+        self._huellas = {}
+        self._bajas = 0
+        self._leido = 0
+
+    def _aplicar(self, linea: list):
+        """
+        Aplica una línea del diario a los árboles en memoria.
+        """
+        if linea[0] == "+":
+            _, id_imagen, huella, nodos_nuevos = linea
+            self._quitar_id(id_imagen)
+            huella = int(huella, 16)
+            self._huellas[id_imagen] = huella
+            valores = segmentos(huella)
+            for segmento, padre, distancia_padre in nodos_nuevos:
+                self._arboles[segmento].crear(valores[segmento], padre, distancia_padre)
+            for arbol, valor in zip(self._arboles, valores):
+                arbol.miembros[arbol.nodo_de[valor]].add(id_imagen)
+        elif self._quitar_id(linea[1]):
+            self._bajas += 1
+
+    def _quitar_id(self, id_imagen: str) -> bool:
+        huella = self._huellas.pop(id_imagen, None)
+        if huella is None:
+            return False
+        for arbol, valor in zip(self._arboles, segmentos(huella)):
+            arbol.miembros[arbol.nodo_de[valor]].discard(id_imagen)
+        return True
+
+    def _alta(self, id_imagen: str, huella: int) -> list:
+        """
+        Aplica en memoria el alta de una huella, ubicando los nodos que
+        falten en cada árbol.
+
+        Returns:
+            list: Línea del diario a persistir.
+        """
+        nodos_nuevos = []
+        for segmento, (arbol, valor) in enumerate(zip(self._arboles, segmentos(huella))):
+            if valor not in arbol.nodo_de:
+                nodos_nuevos.append([segmento, *arbol.ubicar(valor)])
+        linea = ["+", id_imagen, f"{huella:x}", nodos_nuevos]
+        self._aplicar(linea)
+        return linea
+
+    def _refrescar(self):
+        """
+        Incorpora las líneas que se agregaron al diario desde la última
+        lectura; si el archivo se reemplazó al compactarlo, se relee entero.
+        Debe llamarse con ``_cerrojo`` tomado.
+        """
+        try:
+            estado = os.stat(self.ruta)
+        except FileNotFoundError:
+            self._vaciar()
+            self._inodo = None
+            return
+        if estado.st_ino != self._inodo or estado.st_size < self._leido:
+            self._vaciar()
+            self._inodo = estado.st_ino
+        if estado.st_size == self._leido:
+            return
+        with open(self.ruta, "rb") as f:
+            f.seek(self._leido)
+            datos = f.read()
+        # Una línea a medio escribir (proceso interrumpido) se ignora
+        completos = datos.rfind(b"\n") + 1
+        for linea in datos[:completos].splitlines():
+            self._aplicar(json.loads(linea))
+        self._leido += completos
+
+    def _escribir(self, lineas: list):
+        """
+        Agrega líneas al diario. Debe llamarse con ambos cerrojos tomados y
+        el índice recién refrescado, así el final del archivo es ``_leido``.
+        """
+        if not lineas:
+            return
+        datos = _serializar(lineas)
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        with open(self.ruta, "ab") as f:
+            f.write(datos)
+        if self._inodo is None:
+            self._inodo = os.stat(self.ruta).st_ino
+        self._leido += len(datos)
+
+    def __len__(self) -> int:
+        with self._cerrojo:
+            self._refrescar()
+            return len(self._huellas)
+
+    def ids(self) -> set:
+        """
+        IDs de las imágenes que tienen huella en el índice.
+
+        Returns:
+            set: IDs indexados.
+        """
+        with self._cerrojo:
+            self._refrescar()
+            return set(self._huellas)
+
+    def huella(self, id_imagen: str):
+        """
+        Obtiene la huella indexada de una imagen.
+
+        Args:
+            id_imagen (str): ID de la imagen.
+
+        Returns:
+            int or None: Huella, o None si la imagen no está indexada.
+        """
+        with self._cerrojo:
+            self._refrescar()
+            return self._huellas.get(id_imagen)
+
+    def agregar(self, huellas):
+        """
+        Indexa huellas de imágenes; si una imagen ya estaba, se reemplaza.
+
+        Args:
+            huellas (iterable): Pares (ID de la imagen, huella).
+        """
+        with self.cerrojo.exclusivo(), self._cerrojo:
+            self._refrescar()
+            lineas = []
+            for id_imagen, huella in huellas:
+                if self._huellas.get(id_imagen) != huella:
+                    lineas.append(self._alta(id_imagen, huella))
+            self._escribir(lineas)
+
+    def quitar(self, ids):
+        """
+        Quita imágenes del índice; las que no estaban se ignoran.
+
+        Args:
+            ids (iterable): IDs de las imágenes.
+        """
+        with self.cerrojo.exclusivo(), self._cerrojo:
+            self._refrescar()
+            lineas = []
+            for id_imagen in dict.fromkeys(ids):
+                if id_imagen in self._huellas:
+                    lineas.append(["-", id_imagen])
+                    self._aplicar(lineas[-1])
+            self._escribir(lineas)
+            if self._bajas > max(1000, len(self._huellas)):
+                self._compactar()
+
+    def _compactar(self):
+        """
+        Reescribe el diario con árboles construidos solo con las huellas
+        vigentes. Debe llamarse con ambos cerrojos tomados.
+        """
+        vigentes = sorted(self._huellas.items())
+        self._vaciar()
+        lineas = []
+        for id_imagen, huella in vigentes:
+            lineas.append(self._alta(id_imagen, huella))
+        temporal = f"{self.ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(_serializar(lineas))
+        os.replace(temporal, self.ruta)
+        estado = os.stat(self.ruta)
+        self._inodo, self._leido = estado.st_ino, estado.st_size
+
+    def buscar(self, huella: int, distancia_maxima: int = DISTANCIA_DUPLICADO) -> list:
+        """
+        Busca las imágenes cuya huella está a una distancia de Hamming
+        acotada.
+
+        Args:
+            huella (int): Huella de referencia.
+            distancia_maxima (int): Distancia máxima, en bits.
+
+        Returns:
+            list: Pares (distancia, ID de la imagen), de la más parecida a la
+            menos.
+        """
+        radio = distancia_maxima // SEGMENTOS
+        with self._cerrojo:
+            self._refrescar()
+            candidatas = set()
+            for arbol, valor in zip(self._arboles, segmentos(huella)):
+                for nodo in arbol.buscar(valor, radio):
+                    candidatas.update(arbol.miembros[nodo])
+            encontradas = []
+            for id_imagen in candidatas:
+                distancia_imagen = distancia(huella, self._huellas[id_imagen])
+                if distancia_imagen <= distancia_maxima:
+                    encontradas.append((distancia_imagen, id_imagen))
+        return sorted(encontradas)
+
+
+def _serializar(lineas: list) -> bytes:
+    return "".join(json.dumps(linea, separators=(",", ":")) + "\n" for linea in lineas).encode("utf-8")
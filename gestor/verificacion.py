@@ -0,0 +1,286 @@
+"""
+Verificación de integridad (al estilo de ``fsck``) entre las tres tablas y
+la carpeta de imágenes.
+
+Se revisa que cada diagnóstico tenga paciente, que cada imagen tenga
+diagnóstico y archivo, que el archivo conserve el tamaño y el SHA-256
+registrados, y que no haya archivos sin registro. Un manifiesto con el
+tamaño, la fecha de modificación y el hash de cada archivo evita volver a
+leer los que no cambiaron desde la verificación anterior.
+
+Uso:
+    python -m gestor.verificacion [--reparar] [--completo] [--salida informe.json]
+        [--trabajadores 8] [--modo json] [--imagenes-por-contenido]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+from gestor.contenido import calcular_sha256
+from gestor.ingesta import procesar_en_paralelo
+from gestor.integridad import ANTIGUEDAD_MINIMA, BarredorHuerfanos, listar_archivos
+
+VERSION_MANIFIESTO = 1
+
+# Problemas que el modo de reparación sabe corregir; los cambios de
+# contenido no se tocan, porque no hay forma de saber cuál es el correcto
+REPARABLES = ("diagnostico_sin_paciente", "imagen_sin_diagnostico", "archivo_faltante",
+              "archivo_sin_registro")
+
+
+class VerificadorIntegridad:
+    """
+    Verificación completa de las tablas y los archivos de imágenes.
+
+    Los archivos se examinan en paralelo (``stat`` y, si cambiaron, el
+    hash), y lo examinado se guarda en ``imagenes/.verificacion.json``: en
+    la próxima pasada, un archivo con el mismo tamaño y la misma fecha de
+    modificación no se vuelve a leer.
+    """
+
+    def __init__(self, integridad, trabajadores: int = 8, completo: bool = False,
+                 antiguedad_minima: float = ANTIGUEDAD_MINIMA):
+        """
+        Inicializa el verificador.
+
+        Args:
+            integridad (IntegridadReferencial): Gestores a verificar.
+            trabajadores (int): Hilos para examinar archivos.
+            completo (bool): Si es True se vuelven a calcular todos los
+                hashes, aunque el manifiesto diga que no cambiaron (para
+                detectar corrupción silenciosa del disco).
+            antiguedad_minima (float): Segundos que debe tener un archivo sin
+                registro para informarlo (las altas copian el archivo antes
+                de guardar el registro).
+        """
+        self.integridad = integridad
+        self.trabajadores = trabajadores
+        self.completo = completo
+        self.antiguedad_minima = antiguedad_minima
+        self.carpeta = integridad.gestor_imagenes.carpeta_imagenes
+        self.ruta_manifiesto = os.path.join(self.carpeta, ".verificacion.json")
+
+    def _leer_manifiesto(self) -> dict:
+        """
+        Lee el manifiesto de la verificación anterior.
+
+        Returns:
+            dict: Para cada ruta relativa, [tamaño, mtime en ns, sha256];
+            vacío si no hay manifiesto o no es legible.
+        """
+        try:
+            with open(self.ruta_manifiesto, encoding="utf-8") as f:
+                manifiesto = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifiesto.get("version") != VERSION_MANIFIESTO:
+            return {}
+        return manifiesto["archivos"]
+
+    def _guardar_manifiesto(self, archivos: dict):
+        temporal = f"{self.ruta_manifiesto}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION_MANIFIESTO, "archivos": archivos}, f, separators=(",", ":"))
+        os.replace(temporal, self.ruta_manifiesto)
+
+    def _examinar(self, tarea: tuple):
+        """
+        Obtiene el tamaño, la fecha y el hash de un archivo, leyéndolo solo
+        si cambió respecto del manifiesto. Se ejecuta en los hilos del pool.
+
+        Args:
+            tarea (tuple): (ruta relativa, entrada anterior del manifiesto o None).
+
+        Returns:
+            tuple or None: ([tamaño, mtime en ns, sha256], True si se leyó el
+            archivo), o None si el archivo no existe.
+        """
+        relativa, anterior = tarea
+        try:
+            estado = os.stat(os.path.join(self.carpeta, relativa))
+        except FileNotFoundError:
+            return None
+        if not self.completo and anterior and anterior[:2] == [estado.st_size, estado.st_mtime_ns]:
+            return anterior, False
+        sha256, tamano = calcular_sha256(os.path.join(self.carpeta, relativa))
+        return [tamano, estado.st_mtime_ns, sha256], True
+
+    def verificar(self, reparar: bool = False, progreso=None) -> dict:
+        """
+        Verifica tablas y archivos y, opcionalmente, repara lo que se pueda.
+
+        Args:
+            reparar (bool): Si es True se eliminan los registros huérfanos,
+                los de archivos faltantes y los archivos sin registro.
+            progreso (callable, opcional): Recibe (archivos examinados, total).
+
+        Returns:
+            dict: Informe con "fecha", "segundos", "registros" (por tabla),
+            "archivos" (examinados, leídos y bytes leídos), "problemas" (una
+            entrada por problema, con su "tipo"), "resumen" (problemas por
+            tipo) y, si se reparó, "reparados" (por tipo).
+        """
+        inicio = time.perf_counter()
+        integridad = self.integridad
+        pacientes = integridad.gestor_pacientes.db
+        diagnosticos = integridad.gestor_diagnosticos.db
+        imagenes = integridad.gestor_imagenes.db
+        problemas = []
+
+        for diagnostico in diagnosticos.values():
+            if diagnostico.id_paciente not in pacientes:
+                problemas.append({"tipo": "diagnostico_sin_paciente", "id": diagnostico.id,
+                                  "id_paciente": diagnostico.id_paciente})
+        por_archivo = {}
+        for imagen in imagenes.values():
+            if imagen.id_diagnostico not in diagnosticos:
+                problemas.append({"tipo": "imagen_sin_diagnostico", "id": imagen.id,
+                                  "id_diagnostico": imagen.id_diagnostico})
+            por_archivo.setdefault(imagen.archivo, []).append(imagen)
+
+        # Los archivos usados por varios registros se examinan una sola vez
+        anterior = self._leer_manifiesto()
+        manifiesto = {}
+        leidos = bytes_leidos = 0
+        for (archivo, _), resultado, error in procesar_en_paralelo(
+                self._examinar, [(archivo, anterior.get(archivo)) for archivo in por_archivo],
+                self.trabajadores, progreso=progreso):
+            if error is not None:
+                problemas.append({"tipo": "archivo_ilegible", "archivo": archivo, "error": str(error)})
+                continue
+            if resultado is None:
+                for imagen in por_archivo[archivo]:
+                    problemas.append({"tipo": "archivo_faltante", "id": imagen.id, "archivo": archivo})
+                continue
+            entrada, leido = resultado
+            manifiesto[archivo] = entrada
+            if leido:
+                leidos += 1
+                bytes_leidos += entrada[0]
+            tamano, _, sha256 = entrada
+            for imagen in por_archivo[archivo]:
+                if imagen.sha256 and imagen.sha256 != sha256:
+                    problemas.append({"tipo": "contenido_distinto", "id": imagen.id, "archivo": archivo,
+                                      "esperado": imagen.sha256, "actual": sha256})
+                elif imagen.tamano_bytes and imagen.tamano_bytes != tamano:
+                    problemas.append({"tipo": "tamano_distinto", "id": imagen.id, "archivo": archivo,
+                                      "esperado": imagen.tamano_bytes, "actual": tamano})
+        self._guardar_manifiesto(manifiesto)
+
+        limite = time.time() - self.antiguedad_minima
+        for archivo in listar_archivos(self.carpeta):
+            if archivo in por_archivo:
+                continue
+            try:
+                estado = os.stat(os.path.join(self.carpeta, archivo))
+            except FileNotFoundError:
+                continue
+            if max(estado.st_mtime, estado.st_ctime) <= limite:
+                problemas.append({"tipo": "archivo_sin_registro", "archivo": archivo,
+                                  "bytes": estado.st_size})
+
+        informe = {
+            "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+            "registros": {"pacientes": len(pacientes), "diagnosticos": len(diagnosticos),
+                          "imagenes": len(imagenes)},
+            "archivos": {"examinados": len(por_archivo), "leidos": leidos, "bytes_leidos": bytes_leidos},
+            "problemas": problemas,
+            "resumen": _contar(problemas),
+        }
+        if reparar:
+            informe["reparados"] = self.reparar(problemas)
+        informe["segundos"] = round(time.perf_counter() - inicio, 3)
+        return informe
+
+    def reparar(self, problemas: list) -> dict:
+        """
+        Corrige los problemas reparables de un informe. Cada uno se vuelve a
+        comprobar con los cerrojos de las tablas tomados, por si cambió
+        desde la verificación.
+
+        Args:
+            problemas (list): Entradas "problemas" de ``verificar``.
+
+        Returns:
+            dict: Problemas corregidos por tipo.
+        """
+        reparados = dict.fromkeys(REPARABLES, 0)
+        barredor = BarredorHuerfanos(self.integridad, antiguedad_minima=self.antiguedad_minima)
+        fases = {"diagnostico_sin_paciente": ("diagnosticos", "id"),
+                 "imagen_sin_diagnostico": ("imagenes", "id"),
+                 "archivo_sin_registro": ("archivos", "archivo")}
+        for tipo, (fase, clave) in fases.items():
+            elementos = [problema[clave] for problema in problemas if problema["tipo"] == tipo]
+            if elementos:
+                reparados[tipo] = barredor.reclamar(fase, elementos)
+
+        faltantes = [problema["id"] for problema in problemas if problema["tipo"] == "archivo_faltante"]
+        if faltantes:
+            gestor = self.integridad.gestor_imagenes
+            with gestor.repositorio.transaccion(gestor.ruta_db):
+                faltantes = [
+                    id_imagen for id_imagen in faltantes
+                    if id_imagen in gestor.db
+                    and not os.path.exists(os.path.join(self.carpeta, gestor.db[id_imagen].archivo))
+                ]
+                reparados["archivo_faltante"] = len(gestor.eliminar_imagenes_batch(faltantes))
+        return {tipo: cantidad for tipo, cantidad in reparados.items() if cantidad}
+
+
+def _contar(problemas: list) -> dict:
+    resumen = {}
+    for problema in problemas:
+        resumen[problema["tipo"]] = resumen.get(problema["tipo"], 0) + 1
+    return resumen
+
+
+def main(argumentos=None) -> int:
+    """
+    Punto de entrada de ``python -m gestor.verificacion``. Imprime el
+    informe como JSON (o lo guarda en ``--salida`` e imprime el resumen).
+
+    Args:
+        argumentos (list, opcional): Argumentos de línea de comandos.
+
+    Returns:
+        int: 0 si no quedan problemas sin reparar, 1 si quedan.
+    """
+    parser = argparse.ArgumentParser(description="Verifica la integridad de data/ e imagenes/.")
+    parser.add_argument("--reparar", action="store_true",
+                        help="Elimina registros huérfanos o sin archivo y archivos sin registro.")
+    parser.add_argument("--completo", action="store_true",
+                        help="Vuelve a calcular todos los hashes, sin usar el manifiesto.")
+    parser.add_argument("--salida", help="Archivo donde guardar el informe JSON.")
+    parser.add_argument("--trabajadores", type=int, default=8, help="Hilos para examinar archivos.")
+    parser.add_argument("--modo", default="json", help="Modo de almacenamiento: json, diario, binario o sqlite.")
+    parser.add_argument("--imagenes-por-contenido", action="store_true",
+                        help="Las imágenes se guardan deduplicadas por su SHA-256.")
+    args = parser.parse_args(argumentos)
+
+    from menu.menu import MenuSistema
+    sistema = MenuSistema(args.modo, args.imagenes_por_contenido)
+    try:
+        informe = VerificadorIntegridad(sistema.integridad, args.trabajadores,
+                                        args.completo).verificar(args.reparar)
+    finally:
+        sistema.cerrar()
+
+    texto = json.dumps(informe, indent=4, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+        if informe["problemas"]:
+            print(f"❌ {len(informe['problemas'])} problemas: {informe['resumen']}")
+        else:
+            print("✅ Sin problemas de integridad.")
+    else:
+        print(texto)
+    pendientes = len(informe["problemas"]) - sum(informe.get("reparados", {}).values())
+    return 1 if pendientes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,30 @@
+import os
+import sys
+from gestor import metricas
+from menu import comandos
 from menu.menu import MenuSistema
 
 if __name__ == "__main__":
-    sistema = MenuSistema()
-    sistema.menu_principal()
\ No newline at end of file
+    # PAPILAS_METRICAS=archivo.json activa la instrumentación de los gestores
+    # y vuelca las métricas a ese archivo cada PAPILAS_METRICAS_INTERVALO s
+    if os.environ.get("PAPILAS_METRICAS"):
+        metricas.activar(os.environ["PAPILAS_METRICAS"],
+                         float(os.environ.get("PAPILAS_METRICAS_INTERVALO", "60")))
+    # PAPILAS_ALMACEN=diario activa el modo write-ahead log,
+    # PAPILAS_IMAGENES=contenido el almacén de imágenes deduplicado y
+    # PAPILAS_SINCRONIZAR=1 el fsync de cada escritura
+    sistema = MenuSistema(
+        os.environ.get("PAPILAS_ALMACEN", "json"),
+        os.environ.get("PAPILAS_IMAGENES") == "contenido",
+        os.environ.get("PAPILAS_SINCRONIZAR") == "1"
+    )
+    # Con argumentos se ejecuta un subcomando o el modo lote (ver
+    # menu/comandos.py) en lugar del menú interactivo
+    codigo = 0
+    if len(sys.argv) > 1:
+        codigo = comandos.main(sistema, sys.argv[1:])
+        sistema.cerrar()
+    else:
+        sistema.menu_principal()
+    metricas.desactivar()
+    sys.exit(codigo)
\ No newline at end of file
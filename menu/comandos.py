@@ -0,0 +1,384 @@
+"""
+Uso del sistema sin el menú interactivo, para tareas automáticas.
+
+Subcomandos (cada uno imprime su resultado como un objeto JSON):
+
+    python main.py pacientes agregar --nombre "Ana Gómez" --edad 40 --genero F
+    python main.py diagnosticos listar --id-paciente 001 --limite 20
+    python main.py imagenes obtener 014
+    python main.py pacientes eliminar 003
+    python main.py diagnosticos importar diagnosticos.csv
+    python main.py imagenes exportar --salida imagenes.jsonl
+
+Modo lote: ``python main.py lote < comandos.jsonl`` lee un comando JSON por
+línea, con las mismas acciones:
+
+    {"accion": "agregar", "recurso": "pacientes", "datos": {"nombre": "Ana", "edad": 40, "genero": "F"}}
+    {"accion": "listar", "recurso": "diagnosticos", "filtros": {"id_paciente": "001"}, "limite": 20}
+    {"accion": "eliminar", "recurso": "imagenes", "id": "014"}
+
+y escribe un resultado JSON por línea, en el mismo orden, con el número de
+línea del comando en "fila". Las tablas se cargan una sola vez y los
+comandos se aplican de a tandas de ``--lote`` líneas, con una sola
+escritura por tabla al final de cada tanda; los resultados de una tanda se
+escriben recién cuando sus cambios están en disco (con ``--lote 1``, uno por
+comando).
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+from itertools import islice
+
+from gestor.importacion import escribir_filas, importar_archivo, resultado_error, resultado_ok
+
+# En modo json cada tanda reescribe completas las tablas que modifica
+TAMANO_LOTE = 20000
+LIMITE_POR_DEFECTO = 100
+
+RECURSOS = {
+    # recurso: (gestor del menú, campos del alta, filtros del listado)
+    "pacientes": ("gestor_pacientes", ("nombre", "edad", "genero"), ("id_desde", "id_hasta", "genero")),
+    "diagnosticos": ("gestor_diagnosticos",
+                     ("id_paciente", "fecha", "dioptria_1", "dioptria_2", "astigmatismo", "tipo"),
+                     ("id_paciente", "tipo", "fecha_desde", "fecha_hasta", "id_desde", "id_hasta")),
+    "imagenes": ("gestor_imagenes",
+                 ("id_diagnostico", "ruta_origen", "descripcion", "tipo_ojo", "fecha_captura"),
+                 ("id_diagnostico", "tipo_ojo", "fecha_desde", "fecha_hasta", "id_desde", "id_hasta")),
+}
+
+# Acciones y el campo obligatorio de cada una
+ACCIONES = {
+    "agregar": "datos",
+    "obtener": "id",
+    "listar": None,
+    "eliminar": "id",
+    "importar": "archivo",
+    "exportar": "archivo",
+}
+
+
+def _ok(fila: int, **datos) -> dict:
+    return dict({"fila": fila, "estado": "ok"}, **datos)
+
+
+class EjecutorComandos:
+    """
+    Aplica comandos (dict con "accion" y "recurso", ver el docstring del
+    módulo) sobre los gestores de un ``MenuSistema``.
+
+    Cada tanda de comandos corre con los cerrojos de las tres tablas tomados
+    y con las escrituras diferidas (ver
+    ``Repositorio.escrituras_diferidas``), así que cada tabla se escribe una
+    vez por tanda. Dentro de la tanda, las altas y bajas consecutivas de un
+    mismo recurso se agrupan además en una llamada a ``registrar_*_batch``
+    o a la baja en cascada por lotes, como hace el servicio HTTP con las
+    peticiones que llegan juntas.
+    """
+
+    def __init__(self, sistema, tamano_lote: int = TAMANO_LOTE, trabajadores: int = 4):
+        """
+        Inicializa el ejecutor.
+
+        Args:
+            sistema (MenuSistema): Sistema con los gestores.
+            tamano_lote (int): Comandos por tanda (por escritura de cada tabla).
+            trabajadores (int): Hilos para copiar las imágenes de un lote.
+        """
+        self.sistema = sistema
+        self.tamano_lote = tamano_lote
+        self._altas = {
+            "pacientes": lambda filas: sistema.gestor_pacientes.registrar_pacientes_batch(filas),
+            "diagnosticos": lambda filas: sistema.gestor_diagnosticos.registrar_diagnosticos_batch(filas),
+            "imagenes": lambda filas: sistema.gestor_imagenes.registrar_imagenes_batch(filas, trabajadores),
+        }
+        self._bajas = {
+            "pacientes": lambda ids: sistema.integridad.eliminar_pacientes(ids)["pacientes"],
+            "diagnosticos": lambda ids: sistema.integridad.eliminar_diagnosticos(ids)["diagnosticos"],
+            "imagenes": lambda ids: sistema.gestor_imagenes.eliminar_imagenes_batch(ids),
+        }
+
+    def _gestor(self, recurso: str):
+        return getattr(self.sistema, RECURSOS[recurso][0])
+
+    @staticmethod
+    def _interpretar(comando):
+        """
+        Decodifica (si es texto) y valida un comando.
+
+        Args:
+            comando (dict or str): Comando, o una línea JSON.
+
+        Returns:
+            tuple: (comando, None) o (None, mensaje de error).
+        """
+        if isinstance(comando, str):
+            try:
+                comando = json.loads(comando)
+            except ValueError as e:
+                return None, f"JSON inválido: {e}"
+        if not isinstance(comando, dict):
+            return None, "El comando debe ser un objeto JSON."
+        accion = comando.get("accion")
+        if accion not in ACCIONES:
+            return None, f"Acción desconocida: {accion}. Se admite: {', '.join(ACCIONES)}."
+        if comando.get("recurso") not in RECURSOS:
+            return None, f"Recurso desconocido: {comando.get('recurso')}. Se admite: {', '.join(RECURSOS)}."
+        campo = ACCIONES[accion]
+        if campo is not None and comando.get(campo) in (None, ""):
+            return None, f"Falta el campo '{campo}'."
+        if accion == "agregar" and not isinstance(comando["datos"], dict):
+            return None, "Los datos del alta deben ser un objeto JSON."
+        return comando, None
+
+    def ejecutar(self, comandos):
+        """
+        Ejecuta comandos en orden, de a tandas de ``tamano_lote``.
+
+        Args:
+            comandos (iterable): Pares (número de fila, comando o línea JSON).
+
+        Yields:
+            dict: Un resultado por comando, en el mismo orden: "fila",
+            "estado" ("ok" o "error") y los datos de la acción o "error".
+            Los de cada tanda se entregan después de escribirla.
+        """
+        comandos = iter(comandos)
+        sistema = self.sistema
+        while True:
+            tanda = list(islice(comandos, self.tamano_lote))
+            if not tanda:
+                return
+            with sistema.integridad.transaccion(sistema.gestor_pacientes, sistema.gestor_diagnosticos,
+                                                sistema.gestor_imagenes), \
+                    sistema.repositorio.escrituras_diferidas():
+                resultados = list(self._ejecutar_tanda(tanda))
+            yield from resultados
+
+    def _ejecutar_tanda(self, comandos: list):
+        """
+        Ejecuta una tanda de comandos, agrupando las altas y las bajas
+        consecutivas de un mismo recurso.
+
+        Args:
+            comandos (list): Pares (número de fila, comando o línea JSON).
+
+        Yields:
+            dict: Un resultado por comando.
+        """
+        grupo = []
+        clase = None
+        for fila, comando in comandos:
+            comando, error = self._interpretar(comando)
+            actual = None
+            if error is None and comando["accion"] in ("agregar", "eliminar"):
+                actual = (comando["accion"], comando["recurso"])
+            if grupo and actual != clase:
+                yield from self._ejecutar_grupo(clase, grupo)
+                grupo = []
+            if error is not None:
+                yield resultado_error(fila, error)
+            elif actual is None:
+                yield self._ejecutar_uno(fila, comando)
+            else:
+                clase = actual
+                grupo.append((fila, comando))
+        if grupo:
+            yield from self._ejecutar_grupo(clase, grupo)
+
+    def _ejecutar_grupo(self, clase: tuple, grupo: list):
+        """
+        Ejecuta juntas varias altas o bajas de un mismo recurso.
+
+        Args:
+            clase (tuple): (acción, recurso).
+            grupo (list): Pares (fila, comando).
+
+        Yields:
+            dict: Un resultado por comando.
+        """
+        accion, recurso = clase
+        try:
+            if accion == "agregar":
+                reporte = self._altas[recurso]([comando["datos"] for _, comando in grupo])
+            else:
+                ids = [str(comando["id"]) for _, comando in grupo]
+                eliminados = set(self._bajas[recurso](ids))
+        except (OSError, ValueError) as e:
+            for fila, _ in grupo:
+                yield resultado_error(fila, str(e))
+            return
+
+        if accion == "agregar":
+            # El reporte viene ordenado por fila, 1..n dentro del grupo
+            for (fila, _), entrada in zip(grupo, reporte):
+                entrada["fila"] = fila
+                yield entrada
+            return
+        for (fila, _), id_registro in zip(grupo, ids):
+            if id_registro in eliminados:
+                # Un ID repetido en el grupo solo se elimina la primera vez
+                eliminados.discard(id_registro)
+                yield resultado_ok(fila, id_registro)
+            else:
+                yield resultado_error(fila, "Registro no encontrado.")
+
+    def _ejecutar_uno(self, fila: int, comando: dict) -> dict:
+        """
+        Ejecuta una consulta, importación o exportación.
+
+        Args:
+            fila (int): Número de fila del comando.
+            comando (dict): Comando validado.
+
+        Returns:
+            dict: Resultado.
+        """
+        accion, recurso = comando["accion"], comando["recurso"]
+        gestor = self._gestor(recurso)
+        try:
+            if accion == "obtener":
+                registro = gestor.db.get(str(comando["id"]))
+                if registro is None:
+                    return resultado_error(fila, "Registro no encontrado.")
+                return _ok(fila, registro=registro.to_dict())
+
+            if accion == "listar":
+                filtros = comando.get("filtros") or {}
+                if not isinstance(filtros, dict):
+                    return resultado_error(fila, "Los filtros deben ser un objeto JSON.")
+                desconocidos = set(filtros) - set(RECURSOS[recurso][2])
+                if desconocidos:
+                    return resultado_error(fila, f"Filtros desconocidos: {', '.join(sorted(desconocidos))}.")
+                limite = int(comando.get("limite", LIMITE_POR_DEFECTO))
+                if limite < 1:
+                    return resultado_error(fila, "El límite debe ser mayor que cero.")
+                consultar = getattr(gestor, f"consultar_{recurso}")
+                registros = [registro.to_dict()
+                             for registro in consultar(limite=limite, cursor=comando.get("cursor"), **filtros)]
+                siguiente = registros[-1]["id"] if len(registros) == limite else None
+                return _ok(fila, **{recurso: registros, "siguiente": siguiente})
+
+            if accion == "importar":
+                reporte = importar_archivo(self._altas[recurso], comando["archivo"])
+                errores = [entrada for entrada in reporte if entrada["estado"] == "error"]
+                return _ok(fila, registradas=len(reporte) - len(errores), rechazadas=len(errores),
+                           errores=errores)
+
+            cantidad = escribir_filas(comando["archivo"], (registro.to_dict() for registro in gestor.db.values()))
+            return _ok(fila, archivo=comando["archivo"], registros=cantidad)
+        except (OSError, ValueError, TypeError) as e:
+            return resultado_error(fila, str(e))
+
+
+def leer_comandos(archivo):
+    """
+    Lee comandos JSONL de un archivo abierto, de a uno.
+
+    Args:
+        archivo (file): Archivo de texto (por ejemplo ``sys.stdin``).
+
+    Yields:
+        tuple: (número de línea, línea); se omiten las líneas vacías.
+    """
+    for numero, linea in enumerate(archivo, start=1):
+        if linea.strip():
+            yield numero, linea
+
+
+def _comando(args) -> dict:
+    """
+    Arma el comando equivalente a un subcomando de la línea de comandos.
+    """
+    comando = {"accion": args.accion, "recurso": args.recurso}
+    _, campos, filtros = RECURSOS[args.recurso]
+    if args.accion == "agregar":
+        comando["datos"] = {campo: getattr(args, campo) for campo in campos if getattr(args, campo) is not None}
+    elif args.accion == "listar":
+        comando["filtros"] = {filtro: getattr(args, filtro) for filtro in filtros
+                              if getattr(args, filtro) is not None}
+        comando["limite"] = args.limite
+        comando["cursor"] = args.cursor
+    elif args.accion in ("obtener", "eliminar"):
+        comando["id"] = args.id
+    else:
+        comando["archivo"] = args.archivo
+    return comando
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    """
+    Arma el parser de los subcomandos.
+
+    Returns:
+        argparse.ArgumentParser: Parser de ``python main.py``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Sistema de diagnóstico de papilas. Sin argumentos abre el menú interactivo."
+    )
+    recursos = parser.add_subparsers(dest="recurso", required=True)
+    lote = recursos.add_parser("lote", help="Ejecuta los comandos JSONL de la entrada estándar.")
+    lote.add_argument("--lote", type=int, default=TAMANO_LOTE,
+                      help=f"Comandos por escritura de las tablas (por defecto {TAMANO_LOTE}).")
+    lote.add_argument("--trabajadores", type=int, default=4, help="Hilos para copiar imágenes.")
+
+    for recurso, (_, campos, filtros) in RECURSOS.items():
+        acciones = recursos.add_parser(recurso, help=f"Agrega, lista, elimina, importa o exporta {recurso}.")
+        acciones = acciones.add_subparsers(dest="accion", required=True)
+        agregar = acciones.add_parser("agregar", help="Registra uno.")
+        for campo in campos:
+            agregar.add_argument("--" + campo.replace("_", "-"), dest=campo)
+        listar = acciones.add_parser("listar", help="Lista con filtros, de a páginas.")
+        for filtro in filtros:
+            listar.add_argument("--" + filtro.replace("_", "-"), dest=filtro)
+        listar.add_argument("--limite", type=int, default=LIMITE_POR_DEFECTO,
+                            help=f"Registros por página (por defecto {LIMITE_POR_DEFECTO}).")
+        listar.add_argument("--cursor", help="Campo 'siguiente' de la página anterior.")
+        acciones.add_parser("obtener", help="Muestra uno por ID.").add_argument("id")
+        acciones.add_parser("eliminar", help="Elimina uno por ID (en cascada).").add_argument("id")
+        acciones.add_parser("importar", help="Registra las filas de un CSV o JSONL.").add_argument("archivo")
+        exportar = acciones.add_parser("exportar", help="Escribe todos los registros.")
+        exportar.add_argument("--salida", dest="archivo",
+                              help="Archivo CSV o JSONL; por defecto JSONL por la salida estándar.")
+    return parser
+
+
+def main(sistema, argumentos=None) -> int:
+    """
+    Ejecuta un subcomando o el modo lote sobre un sistema ya creado.
+
+    Args:
+        sistema (MenuSistema): Sistema con los gestores.
+        argumentos (list, opcional): Argumentos de línea de comandos.
+
+    Returns:
+        int: Código de salida: 0 si todos los comandos terminaron bien, 1 si
+        alguno falló.
+    """
+    args = crear_parser().parse_args(argumentos)
+    salida = sys.stdout
+    # Los mensajes de los gestores no se mezclan con los resultados JSON
+    with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+        if args.recurso == "lote":
+            ejecutor = EjecutorComandos(sistema, args.lote, args.trabajadores)
+            codigo = 0
+            for resultado in ejecutor.ejecutar(leer_comandos(sys.stdin)):
+                if resultado["estado"] == "error":
+                    codigo = 1
+                salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            salida.flush()
+            return codigo
+
+        if args.accion == "exportar" and args.archivo is None:
+            gestor = getattr(sistema, RECURSOS[args.recurso][0])
+            for registro in gestor.db.values():
+                salida.write(json.dumps(registro.to_dict(), ensure_ascii=False) + "\n")
+            salida.flush()
+            return 0
+
+        resultado = next(EjecutorComandos(sistema).ejecutar([(1, _comando(args))]))
+    del resultado["fila"]
+    salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    return 0 if resultado["estado"] == "ok" else 1
@@ -1,4 +1,9 @@
 import os
+from gestor.analitica import DIMENSIONES, AnaliticaDiagnosticos
+from gestor.caracteristicas import CacheCaracteristicas
+from gestor.importacion import importar_archivo, leer_filas, resumir
+from gestor.integridad import BarredorHuerfanos, IntegridadReferencial
+from gestor.repositorio import Repositorio
 from gestor.gestor_pacientes import GestorPacientes
 from gestor.gestor_diagnosticos import GestorDiagnosticos
 from gestor.gestor_imagenes import GestorImagenes
@@ -9,24 +14,219 @@ class MenuSistema:
     Clase que implementa el menú del sistema de gestión de pacientes, diagnósticos e imágenes.
     """
 
-    def __init__(self):
+    def __init__(self, modo_almacen: str = "json", imagenes_por_contenido: bool = False,
+                 sincronizar: bool = False):
         """
         Inicializa las rutas de los archivos y las instancias de los gestores de pacientes, diagnósticos e imágenes.
+
+        Args:
+            modo_almacen (str): Modo de persistencia de las tablas: "json"
+                (reescritura completa), "diario" (write-ahead log), "binario" o "sqlite".
+            imagenes_por_contenido (bool): Si es True las imágenes se guardan
+                deduplicadas por su SHA-256.
+            sincronizar (bool): Si es True cada escritura se fuerza a disco
+                (``fsync``) antes de confirmarse al usuario.
         """
         self.db_pacientes_path = os.path.join("data", "db_pacientes.json")
         self.db_diagnosticos_path = os.path.join("data", "db_diagnostico.json")
         self.db_imagenes_path = os.path.join("data", "db_imagen.json")
         self.carpeta_imagenes = os.path.join("imagenes")
 
-        # Inicialización de los gestores
-        self.gestor_pacientes = GestorPacientes(self.db_pacientes_path)
-        self.gestor_diagnosticos = GestorDiagnosticos(
-            self.db_diagnosticos_path, self.db_pacientes_path
-        )
-        self.gestor_imagenes = GestorImagenes(
-            self.db_imagenes_path, self.carpeta_imagenes,
-            self.db_diagnosticos_path, self.db_pacientes_path
-        )
+        # Repositorio compartido: cada tabla se carga una sola vez y los
+        # gestores consultan las tablas ajenas desde memoria
+        self.repositorio = Repositorio(modo_almacen, sincronizar)
+        self.imagenes_por_contenido = imagenes_por_contenido
+
+        # Los gestores se crean recién cuando se usan, para que el menú
+        # aparezca enseguida aunque las bases de datos sean grandes
+        self._gestor_pacientes = None
+        self._gestor_diagnosticos = None
+        self._gestor_imagenes = None
+        self._analitica = None
+        self._integridad = None
+
+    @property
+    def gestor_pacientes(self) -> GestorPacientes:
+        """
+        Gestor de pacientes, creado en el primer uso.
+        """
+        if self._gestor_pacientes is None:
+            self._gestor_pacientes = GestorPacientes(self.db_pacientes_path, self.repositorio)
+        return self._gestor_pacientes
+
+    @property
+    def gestor_diagnosticos(self) -> GestorDiagnosticos:
+        """
+        Gestor de diagnósticos, creado en el primer uso.
+        """
+        if self._gestor_diagnosticos is None:
+            self._gestor_diagnosticos = GestorDiagnosticos(
+                self.db_diagnosticos_path, self.db_pacientes_path, self.repositorio
+            )
+        return self._gestor_diagnosticos
+
+    @property
+    def gestor_imagenes(self) -> GestorImagenes:
+        """
+        Gestor de imágenes, creado en el primer uso.
+        """
+        if self._gestor_imagenes is None:
+            self._gestor_imagenes = GestorImagenes(
+                self.db_imagenes_path, self.carpeta_imagenes,
+                self.db_diagnosticos_path, self.db_pacientes_path, self.repositorio,
+                por_contenido=self.imagenes_por_contenido
+            )
+        return self._gestor_imagenes
+
+    @property
+    def analitica(self) -> AnaliticaDiagnosticos:
+        """
+        Motor de estadísticas, creado en el primer uso.
+        """
+        if self._analitica is None:
+            self._analitica = AnaliticaDiagnosticos(self.gestor_diagnosticos, self.gestor_pacientes)
+        return self._analitica
+
+    @property
+    def integridad(self) -> IntegridadReferencial:
+        """
+        Bajas en cascada entre las tres tablas, creadas en el primer uso.
+        """
+        if self._integridad is None:
+            self._integridad = IntegridadReferencial(
+                self.gestor_pacientes, self.gestor_diagnosticos, self.gestor_imagenes
+            )
+        return self._integridad
+
+    def limpiar_huerfanos(self):
+        """
+        Busca y elimina los diagnósticos, imágenes y archivos que quedaron
+        sin el registro al que pertenecían.
+        """
+        resultado = BarredorHuerfanos(self.integridad).barrer_todo()
+        if not any(resultado[fase] for fase in BarredorHuerfanos.FASES):
+            print("✅ No se encontraron datos huérfanos.")
+            return
+        print(f"🗑️ Se eliminaron {resultado['diagnosticos']} diagnósticos, "
+              f"{resultado['imagenes']} imágenes y {resultado['archivos']} archivos huérfanos "
+              f"({resultado['bytes'] / 2 ** 20:.1f} MiB).")
+
+    def cerrar(self):
+        """
+        Espera a que terminen las escrituras pendientes de los gestores.
+        """
+        self.repositorio.cerrar()
+
+    def importar(self, registrar_lote):
+        """
+        Pide la ruta de un archivo CSV o JSONL y lo importa por lotes.
+
+        Args:
+            registrar_lote (callable): Método ``registrar_*_batch`` del gestor.
+        """
+        ruta = input("Ruta del archivo (.csv o .jsonl): ")
+        if not os.path.exists(ruta):
+            print("❌ El archivo no existe.")
+            return
+        try:
+            reporte = importar_archivo(registrar_lote, ruta)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        for entrada in reporte:
+            if entrada["estado"] == "error":
+                print(f"❌ Fila {entrada['fila']}: {entrada['error']}")
+            elif entrada.get("duplicados"):
+                print(f"⚠️ Fila {entrada['fila']}: posible duplicado de {', '.join(entrada['duplicados'])}")
+        print(f"✅ Importación terminada: {resumir(reporte)}")
+
+    def importar_carpeta(self):
+        """
+        Importa en paralelo las capturas de una carpeta, usando un archivo
+        CSV/JSONL que indica los datos de cada imagen (columna "archivo").
+        """
+        carpeta = input("Carpeta con las capturas: ")
+        ruta_mapeo = input("Archivo de mapeo (.csv o .jsonl, columna 'archivo'): ")
+        if not os.path.isdir(carpeta) or not os.path.exists(ruta_mapeo):
+            print("❌ La carpeta o el archivo de mapeo no existen.")
+            return
+        try:
+            mapeo = {fila["archivo"]: fila for fila in leer_filas(ruta_mapeo)}
+        except (KeyError, ValueError) as e:
+            print(f"❌ Archivo de mapeo inválido: {e}")
+            return
+
+        def mostrar_progreso(hechas, total):
+            print(f"\r⏳ {hechas}/{total} imágenes procesadas", end="", flush=True)
+
+        reporte = self.gestor_imagenes.importar_carpeta(carpeta, mapeo, progreso=mostrar_progreso)
+        print()
+        for entrada in reporte:
+            if entrada["estado"] == "error":
+                print(f"❌ {entrada['archivo']}: {entrada['error']}")
+            elif entrada.get("duplicados"):
+                print(f"⚠️ {entrada['archivo']}: posible duplicado de {', '.join(entrada['duplicados'])}")
+        print(f"✅ Importación terminada: {resumir(reporte)}")
+
+    def extraer_caracteristicas(self):
+        """
+        Analiza las imágenes nuevas o modificadas y muestra el resumen.
+        """
+        if not CacheCaracteristicas.disponible():
+            print("❌ Para analizar imágenes hace falta instalar Pillow y numpy.")
+            return
+
+        def mostrar_progreso(hechas, total):
+            print(f"\r🔬 {hechas}/{total} imágenes analizadas", end="", flush=True)
+
+        resumen = self.gestor_imagenes.extraer_caracteristicas(progreso=mostrar_progreso)
+        print()
+        print(f"✅ {resumen['calculados']} imágenes analizadas, {resumen['en_cache']} ya estaban "
+              f"en caché, {resumen['errores']} con errores.")
+        for archivo in resumen["fallidos"]:
+            print(f"❌ No se pudo analizar: {archivo}")
+
+    def mostrar_caracteristicas(self, caracteristicas):
+        """
+        Muestra las características de una imagen, sin los histogramas.
+
+        Args:
+            caracteristicas (dict or None): Lo que devuelve
+                ``GestorImagenes.obtener_caracteristicas``.
+        """
+        if caracteristicas is None:
+            return
+        print("\n🔬 Características de la imagen")
+        print(f"  Tamaño: {caracteristicas['ancho']}x{caracteristicas['alto']}")
+        print(f"  Disco óptico: centro ({caracteristicas['disco_x']:.3f}, {caracteristicas['disco_y']:.3f}), "
+              f"radio {caracteristicas['disco_radio']:.3f}")
+        for medida in ("nitidez", "contraste", "brillo", "saturacion", "cobertura"):
+            print(f"  {medida.capitalize()}: {caracteristicas[medida]:.3f}")
+
+    def mostrar_estadisticas(self):
+        """
+        Pide las dimensiones de agrupamiento y muestra las estadísticas de
+        refracción de cada grupo.
+        """
+        if not self.analitica.disponible():
+            print("❌ Las estadísticas requieren NumPy (pip install numpy).")
+            return
+        texto = input(f"Agrupar por ({', '.join(DIMENSIONES)}; varias separadas por coma): ")
+        por = tuple(d.strip().lower() for d in texto.split(",") if d.strip()) or ("tipo",)
+        try:
+            resultado = self.analitica.agrupar(por)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        if not resultado:
+            print("No hay diagnósticos con medidas registradas.")
+            return
+        for grupo in sorted(resultado):
+            nombre = " / ".join(grupo) if isinstance(grupo, tuple) else grupo
+            print(f"\n📊 {nombre}")
+            for medida, r in resultado[grupo].items():
+                print(f"  {medida}: n={r['n']}, media={r['media']:.2f}, desvío={r['desvio']:.2f}, "
+                      f"p25={r['p25']:.2f}, p50={r['p50']:.2f}, p75={r['p75']:.2f}")
 
     def menu_pacientes(self):
         """
@@ -36,9 +236,11 @@ class MenuSistema:
             print("\n--- MENÚ PACIENTES ---")
             print("1. Registrar paciente")
             print("2. Modificar paciente")
-            print("3. Eliminar paciente")
+            print("3. Eliminar paciente (con sus diagnósticos e imágenes)")
             print("4. Listar pacientes")
-            print("5. Volver al menú principal")
+            print("5. Importar pacientes (CSV/JSONL)")
+            print("6. Buscar paciente por nombre")
+            print("7. Volver al menú principal")
 
             # Captura de la opción seleccionada
             opcion = input("Seleccione una opción: ")
@@ -64,12 +266,24 @@ class MenuSistema:
 
             elif opcion == "3":
                 pid = input("ID del paciente a eliminar: ")
-                self.gestor_pacientes.eliminar_paciente(pid)
+                self.integridad.eliminar_paciente(pid)
 
             elif opcion == "4":
                 self.gestor_pacientes.listar_pacientes()
 
             elif opcion == "5":
+                self.importar(self.gestor_pacientes.registrar_pacientes_batch)
+
+            elif opcion == "6":
+                texto = input("Nombre (o el comienzo de cada palabra): ")
+                encontrados = self.gestor_pacientes.buscar_pacientes(texto)
+                if not encontrados:
+                    print("📭 No se encontraron pacientes.")
+                for paciente in encontrados:
+                    print(f"ID: {paciente.id} | Nombre: {paciente.nombre} | Edad: {paciente.edad} | "
+                          f"Género: {paciente.genero}")
+
+            elif opcion == "7":
                 break
             else:
                 print("Opción inválida.")
@@ -81,10 +295,13 @@ class MenuSistema:
         while True:
             print("\n--- MENÚ DIAGNÓSTICOS ---")
             print("1. Registrar diagnóstico")
-            print("2. Eliminar diagnóstico")
+            print("2. Eliminar diagnóstico (con sus imágenes)")
             print("3. Listar todos los diagnósticos")
             print("4. Listar por ID de paciente")
-            print("5. Volver al menú principal")
+            print("5. Importar diagnósticos (CSV/JSONL)")
+            print("6. Estadísticas de refracción")
+            print("7. Historia clínica por fechas")
+            print("8. Volver al menú principal")
 
             # Captura de la opción seleccionada
             opcion = input("Seleccione una opción: ")
@@ -104,7 +321,7 @@ class MenuSistema:
 
             elif opcion == "2":
                 id_diag = input("ID del diagnóstico a eliminar: ")
-                self.gestor_diagnosticos.eliminar_diagnostico(id_diag)
+                self.integridad.eliminar_diagnostico(id_diag)
 
             elif opcion == "3":
                 self.gestor_diagnosticos.listar_diagnosticos()
@@ -114,10 +331,47 @@ class MenuSistema:
                 self.gestor_diagnosticos.listar_diagnosticos(pid)
 
             elif opcion == "5":
+                self.importar(self.gestor_diagnosticos.registrar_diagnosticos_batch)
+
+            elif opcion == "6":
+                self.mostrar_estadisticas()
+
+            elif opcion == "7":
+                self.mostrar_historia()
+
+            elif opcion == "8":
                 break
             else:
                 print("Opción inválida.")
 
+    def mostrar_historia(self):
+        """
+        Muestra en orden cronológico los diagnósticos y las capturas de un
+        rango de fechas, de un paciente o de todos.
+        """
+        id_paciente = input("ID del paciente (Enter = todos): ").strip() or None
+        desde = input("Desde (YYYY-MM-DD, Enter = sin límite): ").strip() or None
+        hasta = input("Hasta (YYYY-MM-DD, Enter = sin límite): ").strip() or None
+        eventos = [
+            (diagnostico.fecha, 0, diagnostico.id,
+             f"Diagnóstico {diagnostico.id} | Paciente: {diagnostico.id_paciente} | "
+             f"D1: {diagnostico.dioptria_1} | D2: {diagnostico.dioptria_2} | "
+             f"Astigmatismo: {diagnostico.astigmatismo} | Tipo: {diagnostico.tipo}")
+            for diagnostico in self.gestor_diagnosticos.consultar_por_fecha(desde, hasta, id_paciente)
+        ]
+        eventos += [
+            (imagen.fecha_captura, 1, imagen.id,
+             f"Imagen {imagen.id} | Diagnóstico: {imagen.id_diagnostico} | "
+             f"Archivo: {imagen.archivo} | Tipo Ojo: {imagen.tipo_ojo}")
+            for imagen in self.gestor_imagenes.consultar_por_fecha(desde, hasta, id_paciente)
+        ]
+        if not eventos:
+            print("📭 No hay diagnósticos ni imágenes en ese rango.")
+            return
+        print("\n📋 Historia clínica:")
+        for fecha, _, _, texto in sorted(eventos, key=lambda evento: evento[:2] + (int(evento[2]),)):
+            print(f"{fecha} | {texto}")
+
     def menu_imagenes(self):
         """
         Muestra las opciones del menú de gestión de imágenes de papilas.
@@ -128,7 +382,14 @@ class MenuSistema:
             print("2. Eliminar imagen")
             print("3. Listar todas las imágenes")
             print("4. Listar imágenes por diagnóstico")
-            print("5. Volver al menú principal")
+            print("5. Importar imágenes (CSV/JSONL)")
+            print("6. Importar carpeta de capturas")
+            print("7. Ver vista previa de una imagen")
+            print("8. Generar todas las vistas previas")
+            print("9. Calcular características de las imágenes")
+            print("10. Ver características de una imagen")
+            print("11. Buscar imágenes parecidas")
+            print("12. Volver al menú principal")
 
             # Captura de la opción seleccionada
             opcion = input("Seleccione una opción: ")
@@ -140,7 +401,7 @@ class MenuSistema:
                 while tipo_ojo not in ["OD", "OS"]:
                     print("Opción inválida. Debe ser 'OD' o 'OS'.")
                     tipo_ojo = input("Tipo de ojo (OD/OS): ").upper()
-                fecha_captura = input("Fecha de captura (YYYY-MM-DD): ")
+                fecha_captura = input("Fecha de captura (YYYY-MM-DD, Enter = la del archivo): ")
                 ruta = input("Ruta completa de la imagen. Ej (C:\FundusImages\IMG2025.jpg) : ")
                 desc = input("Descripción (opcional): ")
                 self.gestor_imagenes.registrar_imagen(id_diag, ruta, desc, tipo_ojo, fecha_captura)
@@ -157,6 +418,39 @@ class MenuSistema:
                 self.gestor_imagenes.listar_imagenes(id_diag)
 
             elif opcion == "5":
+                self.importar(self.gestor_imagenes.registrar_imagenes_batch)
+
+            elif opcion == "6":
+                self.importar_carpeta()
+
+            elif opcion == "7":
+                id_img = input("ID de la imagen: ")
+                tamano = input("Tamaño (128/256/512, Enter = 256): ")
+                ruta = self.gestor_imagenes.vista_previa(id_img, int(tamano) if tamano else 256)
+                if ruta:
+                    print(f"🖼️ Vista previa: {ruta}")
+
+            elif opcion == "8":
+                total = self.gestor_imagenes.precalentar_vistas_previas()
+                print(f"✅ {total} vistas previas disponibles.")
+
+            elif opcion == "9":
+                self.extraer_caracteristicas()
+
+            elif opcion == "10":
+                id_img = input("ID de la imagen: ")
+                self.mostrar_caracteristicas(self.gestor_imagenes.obtener_caracteristicas(id_img))
+
+            elif opcion == "11":
+                id_img = input("ID de la imagen: ")
+                similares = self.gestor_imagenes.buscar_similares(id_img)
+                if similares == []:
+                    print("📭 No hay imágenes parecidas.")
+                for similar in similares or []:
+                    print(f"🔎 Imagen {similar['id']} (diagnóstico {similar['id_diagnostico']}, "
+                          f"ojo {similar['tipo_ojo']}), distancia {similar['distancia']}")
+
+            elif opcion == "12":
                 break
             else:
                 print("Opción inválida.")
@@ -170,7 +464,8 @@ class MenuSistema:
             print("1. Gestión de Pacientes")
             print("2. Gestión de Diagnósticos")
             print("3. Gestión de Imágenes")
-            print("4. Salir")
+            print("4. Limpiar datos huérfanos")
+            print("5. Salir")
 
             # Captura de la opción seleccionada
             opcion = input("Elige una opción: ")
@@ -183,5 +478,8 @@ class MenuSistema:
             elif opcion == "3":
                 self.menu_imagenes()
             elif opcion == "4":
+                self.limpiar_huerfanos()
+            elif opcion == "5":
+                self.cerrar()
                 print("Saliendo del sistema...")
                 break
@@ -1,5 +1,7 @@
 from typing import Dict
 
+from modelos.valores import compartir, internar
+
 class Diagnostico:
     """
     Clase que representa un diagnóstico oftalmológico realizado a un paciente.
@@ -14,6 +16,8 @@ class Diagnostico:
         tipo (str): Tipo de ojo ('OD' = Ojo Derecho, 'OS' = Ojo Izquierdo).
     """
 
+    __slots__ = ("id", "id_paciente", "fecha", "dioptria_1", "dioptria_2", "astigmatismo", "tipo")
+
     def __init__(
         self,
         id_: str,
@@ -28,12 +32,12 @@ class Diagnostico:
             raise ValueError("El tipo debe ser 'OD' o 'OS'.")
 
         self.id = id_
-        self.id_paciente = id_paciente
-        self.fecha = fecha
-        self.dioptria_1 = dioptria_1
-        self.dioptria_2 = dioptria_2
-        self.astigmatismo = astigmatismo
-        self.tipo = tipo
+        self.id_paciente = internar(id_paciente)
+        self.fecha = internar(fecha)
+        self.dioptria_1 = compartir(dioptria_1)
+        self.dioptria_2 = compartir(dioptria_2)
+        self.astigmatismo = compartir(astigmatismo)
+        self.tipo = internar(tipo)
 
     def to_dict(self) -> Dict:
         return {
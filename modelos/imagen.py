@@ -1,5 +1,7 @@
 from typing import Dict
 
+from modelos.valores import internar
+
 class ImagenPapila:
     """
     Clase que representa una imagen de papila ocular asociada a un diagnóstico.
@@ -11,16 +13,31 @@ class ImagenPapila:
         descripcion (str): Descripción opcional de la imagen.
         tipo_ojo (str): Indica si la imagen corresponde al ojo derecho (OD) o izquierdo (OS).
         fecha_captura (str): Fecha en que se capturó la imagen (formato YYYY-MM-DD).
+        sha256 (str): Hash SHA-256 del contenido del archivo.
+        tamano_bytes (int): Tamaño del archivo en bytes.
+        ancho (int): Ancho de la imagen en píxeles (0 si no se conoce).
+        alto (int): Alto de la imagen en píxeles (0 si no se conoce).
+        fecha_exif (str): Fecha de captura según los metadatos EXIF del
+            archivo (formato YYYY-MM-DD), o "" si no la trae.
     """
 
+    __slots__ = ("id", "id_diagnostico", "archivo", "descripcion", "tipo_ojo", "fecha_captura",
+                 "sha256", "tamano_bytes", "ancho", "alto", "fecha_exif")
+
     def __init__(self, id_: str, id_diagnostico: str, archivo: str, descripcion: str = "",
-                 tipo_ojo: str = "OD", fecha_captura: str = ""):
+                 tipo_ojo: str = "OD", fecha_captura: str = "", sha256: str = "",
+                 tamano_bytes: int = 0, ancho: int = 0, alto: int = 0, fecha_exif: str = ""):
         self.id = id_
-        self.id_diagnostico = id_diagnostico
+        self.id_diagnostico = internar(id_diagnostico)
         self.archivo = archivo
         self.descripcion = descripcion
-        self.tipo_ojo = tipo_ojo
-        self.fecha_captura = fecha_captura
+        self.tipo_ojo = internar(tipo_ojo)
+        self.fecha_captura = internar(fecha_captura)
+        self.sha256 = sha256
+        self.tamano_bytes = tamano_bytes
+        self.ancho = ancho
+        self.alto = alto
+        self.fecha_exif = internar(fecha_exif)
 
     def to_dict(self) -> Dict:
         return {
@@ -29,7 +46,12 @@ class ImagenPapila:
             "archivo": self.archivo,
             "descripcion": self.descripcion,
             "tipo_ojo": self.tipo_ojo,
-            "fecha_captura": self.fecha_captura
+            "fecha_captura": self.fecha_captura,
+            "sha256": self.sha256,
+            "tamano_bytes": self.tamano_bytes,
+            "ancho": self.ancho,
+            "alto": self.alto,
+            "fecha_exif": self.fecha_exif
         }
 
     @staticmethod
@@ -40,5 +62,10 @@ class ImagenPapila:
             archivo=data["archivo"],
             descripcion=data.get("descripcion", ""),
             tipo_ojo=data.get("tipo_ojo", "OD"),
-            fecha_captura=data.get("fecha_captura", "")
+            fecha_captura=data.get("fecha_captura", ""),
+            sha256=data.get("sha256", ""),
+            tamano_bytes=data.get("tamano_bytes", 0),
+            ancho=data.get("ancho", 0),
+            alto=data.get("alto", 0),
+            fecha_exif=data.get("fecha_exif", "")
         )
@@ -1,5 +1,7 @@
 from typing import Dict
 
+from modelos.valores import compartir, internar
+
 class Paciente:
     """
     Clase que representa a un paciente.
@@ -11,6 +13,8 @@ class Paciente:
         genero (str): Género del paciente.
     """
 
+    __slots__ = ("id", "nombre", "edad", "genero")
+
     def __init__(self, id_: str, nombre: str, edad: int, genero: str):
         """
         Inicializa una nueva instancia de la clase Paciente.
@@ -23,8 +27,8 @@ class Paciente:
         """
         self.id = id_
         self.nombre = nombre
-        self.edad = edad
-        self.genero = genero
+        self.edad = compartir(edad)
+        self.genero = internar(genero)
 
     def to_dict(self) -> Dict:
         """
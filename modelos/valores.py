@@ -0,0 +1,44 @@
+import sys
+
+# Límite de valores numéricos distintos que se comparten; las dioptrías y el
+# astigmatismo toman pocos valores, pero se evita crecer sin control.
+MAX_NUMEROS_COMPARTIDOS = 65536
+
+_numeros = {}
+
+
+def internar(texto):
+    """
+    Devuelve una única instancia compartida de un texto que se repite mucho
+    (tipo de ojo, género, IDs foráneos).
+
+    Args:
+        texto (str): Texto a internar.
+
+    Returns:
+        str: El texto internado (o el valor recibido si no es str).
+    """
+    return sys.intern(texto) if type(texto) is str else texto
+
+
+def compartir(numero):
+    """
+    Devuelve una única instancia compartida de un valor numérico, para que
+    miles de registros con la misma dioptría apunten al mismo objeto.
+
+    Args:
+        numero (float or int): Valor a compartir.
+
+    Returns:
+        float or int: Instancia compartida del valor, del mismo tipo que
+        el recibido.
+    """
+    # La clave lleva el tipo: 3 == 3.0 con el mismo hash, y sin él una edad
+    # 3 volvería como la dioptría 3.0 ya compartida
+    clave = (type(numero), numero)
+    compartido = _numeros.get(clave)
+    if compartido is not None:
+        return compartido
+    if len(_numeros) < MAX_NUMEROS_COMPARTIDOS:
+        _numeros[clave] = numero
+    return numero